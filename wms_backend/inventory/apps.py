@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
+
+    def ready(self):
+        # Connects the signal handlers that keep the catalog cache, the API change generations and the sync feed current
+        from . import catalog, changefeed, generations  # noqa: F401
+        # Registers the system checks for deployment settings
+        from . import checks  # noqa: F401
@@ -0,0 +1,176 @@
+# Async versions of the hottest read endpoints, for the ASGI deployment (wms_backend/asgi.py).
+# DRF views are synchronous, so under ASGI each request holds a worker thread until it finishes. These
+# are plain Django async views on the async ORM: a request waiting on the database, or on a change for
+# the dashboard long-poll, costs a coroutine instead. Field names match the DRF endpoints they shadow.
+
+import asyncio
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, F, Sum
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from . import events, generations, stats
+from .models import Inventory, Order
+from .services import InventoryService
+
+
+def get_config():
+    return {'LOOKUP_LIMIT': 200, 'LONG_POLL_MAX_SECONDS': 30, 'LONG_POLL_INTERVAL': 1.0,
+            **getattr(settings, 'WMS_ASYNC_API', {})}
+
+
+@require_GET
+async def inventory_lookup(request):
+    # ?sku= and/or ?location= (exact), ?location_prefix= for a whole aisle
+    sku = request.GET.get('sku')
+    location = request.GET.get('location')
+    prefix = request.GET.get('location_prefix')
+    if not (sku or location or prefix):
+        return JsonResponse({'error': 'sku, location or location_prefix required'}, status=400)
+
+    queryset = Inventory.objects.all()
+    if sku:
+        queryset = queryset.filter(item__sku=sku)
+    if location:
+        queryset = queryset.filter(location_code=location)
+    if prefix:
+        queryset = queryset.filter(location_code__startswith=prefix)
+
+    limit = get_config()['LOOKUP_LIMIT']
+    rows = queryset.order_by('location_code', 'id').values(
+        'id', 'item_id', 'location_code', 'quantity', 'version', 'reserved_quantity',
+        item_sku=F('item__sku'), item_name=F('item__name'), item_attr=F('item__attributes'),
+    )[:limit + 1]
+
+    results = []
+    async for row in rows:
+        row['available_quantity'] = row['quantity'] - row['reserved_quantity']
+        results.append(row)
+    truncated = len(results) > limit
+    return JsonResponse({"results": results[:limit], "truncated": truncated})
+
+
+@require_GET
+async def order_status(request, pk):
+    order = await Order.objects.filter(id=pk).annotate(
+        line_count=Count('lines'),
+        ordered=Sum('lines__qty_ordered'),
+        allocated=Sum('lines__qty_allocated'),
+        picked=Sum('lines__qty_picked'),
+    ).values('id', 'order_number', 'status', 'line_count', 'ordered', 'allocated', 'picked').afirst()
+    if order is None:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+    for field in ('ordered', 'allocated', 'picked'):
+        order[field] = order[field] or 0
+    return JsonResponse(order)
+
+
+@require_GET
+async def putaway_suggestion(request):
+    sku = request.GET.get('sku')
+    if not sku:
+        return JsonResponse({'error': 'SKU parameter required'}, status=400)
+    try:
+        qty = max(1, int(request.GET.get('qty', 1)))
+    except ValueError:
+        return JsonResponse({'error': 'qty must be a number'}, status=400)
+
+    # In-memory once the free-slot index and catalog are warm; the first call loads them
+    result = await sync_to_async(InventoryService.suggest_putaway_location)(sku, qty)
+    return JsonResponse(result)
+
+
+def _stats_version(counters):
+    return hashlib.sha1(repr(sorted(counters.items())).encode()).hexdigest()[:16]
+
+
+@require_GET
+async def dashboard_stats(request):
+    """
+    Same numbers as the sync dashboard endpoint, plus a `version`.
+    Long-poll: ?since=<version>&timeout=<seconds> answers as soon as the numbers differ from
+    `since`, or with the unchanged numbers once the timeout passes. While waiting only the change
+    generations are checked; the counters are re-read when one of them moves.
+    """
+    config = get_config()
+    counters = await stats.aread()
+    since = request.GET.get('since')
+
+    if since:
+        try:
+            timeout = min(float(request.GET.get('timeout', config['LONG_POLL_MAX_SECONDS'])),
+                          config['LONG_POLL_MAX_SECONDS'])
+        except ValueError:
+            return JsonResponse({'error': 'timeout must be a number'}, status=400)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        # A process-local cache never sees other workers' bumps: re-read the counters every interval
+        shared = generations.is_shared()
+        generation = await generations.aread(('inventory', 'order'))
+        while _stats_version(counters) == since and loop.time() < deadline:
+            await asyncio.sleep(min(config['LONG_POLL_INTERVAL'], max(deadline - loop.time(), 0)))
+            current = await generations.aread(('inventory', 'order'))
+            if current != generation or not shared:
+                generation = current
+                counters = await stats.aread()
+
+    return JsonResponse({
+        "total_stock": counters['total_stock'],
+        "total_locations": counters['total_locations'],
+        "low_stock": counters['low_stock'],
+        "recent_moves": counters['transactions'],
+        "version": _stats_version(counters),
+    })
+
+
+def _sse(event):
+    if event["type"] == "lagged":
+        # Events were dropped for this client; it should re-fetch state, then carry on
+        return "event: lagged\ndata: {}\n\n"
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+@require_GET
+async def event_stream(request):
+    """
+    Server-sent events for stock and order changes made through InventoryService:
+    receive, pick, move, adjust, allocate, pack, ship. Filters: ?sku=, ?location_prefix=, ?order=,
+    ?types=pick,move. Reconnects resume after the Last-Event-ID the browser sends.
+    Needs ASGI: under WSGI a stream would hold a worker for as long as the client stays connected.
+    """
+    try:
+        event_filter = events.EventFilter.from_params(request.GET)
+        last_event_id = request.headers.get('Last-Event-ID')
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return JsonResponse({'error': 'order and Last-Event-ID must be numbers'}, status=400)
+    if event_filter.types and not event_filter.types <= set(events.TYPES):
+        return JsonResponse({'error': f"types must be among {', '.join(events.TYPES)}"}, status=400)
+
+    heartbeat = events.get_config()['HEARTBEAT_SECONDS']
+
+    async def stream():
+        # Subscribed on first iteration, so a response that is never streamed leaves nothing behind
+        subscription = events.get_broker().subscribe(event_filter, last_event_id)
+        try:
+            yield f"retry: {heartbeat * 1000}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse(event)
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
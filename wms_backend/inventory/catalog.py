@@ -0,0 +1,202 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Item
+
+CatalogItem = namedtuple('CatalogItem', ['id', 'sku', 'name', 'attributes'])
+
+GENERATION_KEY = 'wms:catalog:generation'
+_FIELDS = CatalogItem._fields
+# Keeps IN (...) lists under SQLite's bound-parameter limit
+_QUERY_BATCH = 500
+
+
+def get_config():
+    return {'MAX_ENTRIES': 20000, 'CHECK_SECONDS': 1.0, 'CACHE_ALIAS': 'default',
+            **getattr(settings, 'WMS_ITEM_CATALOG', {})}
+
+
+class ItemCatalog:
+    """
+    Bounded LRU of SKU <-> item lookups so scans don't round-trip to the database for catalog data.
+
+    Item saves and deletes in this process drop the entry at once (and again on commit) via signals,
+    and bump a generation counter in Django's cache backend. Other processes compare their generation
+    with it at most every CHECK_SECONDS and start over when it moved, so with a shared cache backend
+    the whole fleet converges within that window. Queryset .update()/.delete() on Item bypass signals;
+    call invalidate() after them. Misses are not cached, so a new SKU is usable immediately.
+    Attributes are shared between callers: treat them as read-only.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._by_sku = OrderedDict()
+        self._by_id = {}
+        self._generation = None
+        self._checked_at = None
+        self.reset_stats()
+
+    # --- STATS ---
+
+    def reset_stats(self):
+        with self._lock:
+            self._hits = self._misses = self._evictions = self._invalidations = 0
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._by_sku),
+                "max_entries": get_config()['MAX_ENTRIES'],
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else None,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "generation": self._generation,
+            }
+
+    # --- GENERATION ---
+
+    def _cache(self):
+        return caches[get_config()['CACHE_ALIAS']]
+
+    def _sync(self):
+        # At most one cache backend read per CHECK_SECONDS
+        now = time.monotonic()
+        checked_at = self._checked_at
+        if checked_at is not None and now - checked_at < get_config()['CHECK_SECONDS']:
+            return
+        self._checked_at = now
+        generation = self._cache().get(GENERATION_KEY, 0)
+        with self._lock:
+            if generation != self._generation:
+                self._by_sku.clear()
+                self._by_id.clear()
+                self._generation = generation
+
+    def _bump(self):
+        cache = self._cache()
+        try:
+            generation = cache.incr(GENERATION_KEY)
+        except ValueError:
+            # Key missing or evicted; add() loses to a concurrent writer, which is just as good
+            cache.add(GENERATION_KEY, 1, timeout=None)
+            generation = cache.get(GENERATION_KEY, 0)
+        with self._lock:
+            # Our own bump needs no full clear; anything else in between does
+            if self._generation is not None and generation == self._generation + 1:
+                self._generation = generation
+
+    # --- ENTRIES ---
+
+    def _remember(self, entry):
+        max_entries = get_config()['MAX_ENTRIES']
+        with self._lock:
+            stale = self._by_id.get(entry.id)
+            if stale is not None:
+                self._by_sku.pop(stale.sku, None)
+            self._by_sku[entry.sku] = entry
+            self._by_id[entry.id] = entry
+            while len(self._by_sku) > max_entries:
+                _, evicted = self._by_sku.popitem(last=False)
+                self._by_id.pop(evicted.id, None)
+                self._evictions += 1
+
+    def _load(self, field, keys):
+        for start in range(0, len(keys), _QUERY_BATCH):
+            rows = Item.objects.filter(**{f'{field}__in': keys[start:start + _QUERY_BATCH]}).values_list(*_FIELDS)
+            for row in rows:
+                entry = CatalogItem(*row)
+                self._remember(entry)
+                yield entry
+
+    def _lookup(self, field, keys):
+        self._sync()
+        index = self._by_sku if field == 'sku' else self._by_id
+        found, missing = {}, []
+        with self._lock:
+            for key in keys:
+                entry = index.get(key)
+                if entry is None:
+                    missing.append(key)
+                    continue
+                self._by_sku.move_to_end(entry.sku)
+                found[key] = entry
+            self._hits += len(found)
+            self._misses += len(missing)
+
+        if missing:
+            for entry in self._load(field, list(dict.fromkeys(missing))):
+                found[getattr(entry, field)] = entry
+        return found
+
+    def get(self, sku):
+        """CatalogItem for a SKU, or None when it is not in the catalog."""
+        return self._lookup('sku', [sku]).get(sku)
+
+    def get_by_id(self, item_id):
+        return self._lookup('id', [item_id]).get(item_id)
+
+    def get_many(self, skus):
+        """{sku: CatalogItem} for the SKUs that exist; misses are loaded in one query."""
+        return self._lookup('sku', list(skus))
+
+    def get_many_by_id(self, item_ids):
+        return self._lookup('id', list(item_ids))
+
+    def skus(self, item_ids):
+        """{item_id: sku}, for log snapshots and responses."""
+        return {item_id: entry.sku for item_id, entry in self.get_many_by_id(item_ids).items()}
+
+    # --- INVALIDATION ---
+
+    def forget(self, item_id=None, sku=None):
+        """Drops one item from this process only."""
+        with self._lock:
+            entry = self._by_id.pop(item_id, None)
+            if entry is not None:
+                self._by_sku.pop(entry.sku, None)
+            entry = self._by_sku.pop(sku, None)
+            if entry is not None:
+                self._by_id.pop(entry.id, None)
+            self._invalidations += 1
+
+    def invalidate(self, item_id=None, sku=None):
+        """Drops an item here and tells other processes to reload; with no arguments drops everything."""
+        if item_id is None and sku is None:
+            with self._lock:
+                self._by_sku.clear()
+                self._by_id.clear()
+                self._invalidations += 1
+        else:
+            self.forget(item_id, sku)
+        self._bump()
+
+    def clear(self):
+        """Local reset (tests, benchmarks); other processes are not told."""
+        with self._lock:
+            self._by_sku.clear()
+            self._by_id.clear()
+            self._generation = None
+            self._checked_at = None
+
+
+items = ItemCatalog()
+
+
+@receiver(post_save, sender=Item, dispatch_uid='catalog_item_saved')
+@receiver(post_delete, sender=Item, dispatch_uid='catalog_item_deleted')
+def _item_changed(sender, instance, **kwargs):
+    # Drop now so this transaction sees its own write, and again on commit in case a concurrent
+    # request re-cached the committed (old) row in between
+    items.invalidate(instance.id, instance.sku)
+    transaction.on_commit(partial(items.invalidate, instance.id, instance.sku), robust=True)
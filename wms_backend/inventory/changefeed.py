@@ -0,0 +1,131 @@
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db.models import Max, Min
+from django.db.models.signals import post_delete, post_save
+from django.utils import timezone
+
+from .models import CycleCountTask, Inventory, Item, Order, OrderLine, SyncChange
+
+# What a handheld mirrors: feed table -> (model, columns sent). Listed parents first, the order a
+# client applies upserts in (and deletes in reverse).
+TABLES = {
+    'item': (Item, ('id', 'sku', 'name', 'attributes')),
+    'inventory': (Inventory, ('id', 'item_id', 'location_code', 'quantity', 'reserved_quantity', 'version')),
+    'order': (Order, ('id', 'order_number', 'customer_name', 'status', 'created_at')),
+    'order_line': (OrderLine, ('id', 'order_id', 'item_id', 'qty_ordered', 'qty_allocated', 'qty_picked')),
+    'cycle_count_task': (CycleCountTask, ('id', 'session_id', 'inventory_id', 'expected_qty', 'counted_qty',
+                                          'variance', 'status')),
+}
+
+# Keeps IN (...) lists under SQLite's bound-parameter limit
+_QUERY_BATCH = 500
+
+
+def get_config():
+    return {'PAGE_SIZE': 5000, 'SETTLE_SECONDS': 10, 'RETENTION_DAYS': 14, **getattr(settings, 'WMS_SYNC', {})}
+
+
+def record(**changes):
+    """
+    Appends feed entries for rows that were created, changed or deleted, e.g.
+    record(inventory=[3, 4], order=[7]), in one INSERT. Runs inside the writing transaction, so the
+    entries commit or roll back with the change. Writes that skip model signals (raw/bulk/queryset
+    updates) must call this themselves.
+    """
+    now = timezone.now()
+    entries = []
+    for table, ids in changes.items():
+        if table not in TABLES:
+            raise ValueError(f"Unknown change feed table: {table}")
+        entries += [SyncChange(table=table, object_id=object_id, changed_at=now) for object_id in dict.fromkeys(ids)]
+    if entries:
+        SyncChange.objects.bulk_create(entries, batch_size=_QUERY_BATCH)
+
+
+def _settled_before():
+    # Entry ids are handed out at INSERT but become visible at COMMIT, so a slow transaction can commit
+    # an id below one a reader has already seen. Cursors only move past entries older than this.
+    return timezone.now() - timedelta(seconds=get_config()['SETTLE_SECONDS'])
+
+
+def head():
+    """Cursor to sync from after a full download: the newest settled entry."""
+    return SyncChange.objects.filter(changed_at__lte=_settled_before()).order_by('-id').values_list(
+        'id', flat=True).first() or 0
+
+
+def changes_since(cursor, limit=None):
+    """
+    What a device synced up to `cursor` is missing: current rows for everything changed since, ids
+    of rows deleted since, and the cursor to send next. Several changes to one row come back as one
+    row. Entries younger than SETTLE_SECONDS are included but the cursor stays before them, so they
+    are sent again next time; clients apply rows as upserts and deletes as idempotent removals.
+    Returns None when the entries after `cursor` were pruned (or it is from another database):
+    the device must download everything again.
+    """
+    limit = limit or get_config()['PAGE_SIZE']
+    bounds = SyncChange.objects.aggregate(oldest=Min('id'), newest=Max('id'))
+    if cursor > (bounds['newest'] or 0) or (bounds['oldest'] is not None and cursor < bounds['oldest'] - 1):
+        return None
+
+    entries = list(SyncChange.objects.filter(id__gt=cursor).order_by('id').values_list(
+        'id', 'table', 'object_id', 'changed_at')[:limit])
+
+    # 1. The cursor advances over the settled prefix of this page
+    settled = _settled_before()
+    next_cursor, waiting = cursor, False
+    ids_by_table = {}
+    for entry_id, table, object_id, changed_at in entries:
+        if waiting or changed_at > settled:
+            waiting = True
+        else:
+            next_cursor = entry_id
+        ids_by_table.setdefault(table, set()).add(object_id)
+
+    # 2. Current state per row; ids that no longer resolve were deleted
+    changed, deleted = {}, {}
+    for table, (model, fields) in TABLES.items():
+        ids = sorted(ids_by_table.get(table, ()))
+        rows = []
+        for start in range(0, len(ids), _QUERY_BATCH):
+            rows += model.objects.filter(id__in=ids[start:start + _QUERY_BATCH]).order_by('id').values(*fields)
+        found = {row['id'] for row in rows}
+        if rows:
+            changed[table] = rows
+        gone = [object_id for object_id in ids if object_id not in found]
+        if gone:
+            deleted[table] = gone
+
+    return {
+        "cursor": next_cursor,
+        # A full page that moved the cursor has more behind it; one that couldn't is waiting to settle
+        "more": len(entries) == limit and next_cursor > cursor,
+        "changed": changed,
+        "deleted": deleted,
+    }
+
+
+def prune(older_than=None):
+    """
+    Drops entries older than RETENTION_DAYS (or `older_than`); devices behind that resync fully.
+    The newest entry is always kept so a stale cursor can still be told apart from an empty feed.
+    """
+    older_than = older_than or timezone.now() - timedelta(days=get_config()['RETENTION_DAYS'])
+    newest = SyncChange.objects.order_by('-id').values_list('id', flat=True).first()
+    if newest is None:
+        return 0
+    deleted, _ = SyncChange.objects.filter(changed_at__lt=older_than, id__lt=newest).delete()
+    return deleted
+
+
+# ORM saves and deletes (viewset CRUD, order.save(), cascades) are covered by signals
+def _model_changed(table, instance, **kwargs):
+    record(**{table: [instance.pk]})
+
+
+for _table, (_model, _) in TABLES.items():
+    _handler = partial(_model_changed, _table)
+    post_save.connect(_handler, sender=_model, weak=False, dispatch_uid=f'changefeed_saved_{_table}')
+    post_delete.connect(_handler, sender=_model, weak=False, dispatch_uid=f'changefeed_deleted_{_table}')
@@ -0,0 +1,32 @@
+from django.core.checks import Tags, Warning, register
+
+from . import catalog, generations
+
+
+@register(Tags.caches)
+def shared_cache_check(app_configs, **kwargs):
+    # Generations only invalidate across workers through a cache they all share
+    messages = []
+    config = generations.get_config()
+    if not generations.is_shared(config['CACHE_ALIAS']):
+        if config['ALLOW_PROCESS_LOCAL']:
+            messages.append(Warning(
+                f"Conditional GET validates against the process-local cache '{config['CACHE_ALIAS']}'.",
+                hint="Only correct with a single worker process; other workers' writes never change this one's ETags.",
+                id='inventory.W001',
+            ))
+        else:
+            messages.append(Warning(
+                f"Conditional GET is disabled: cache '{config['CACHE_ALIAS']}' is process-local.",
+                hint="Set WMS_REDIS_URL or point WMS_CONDITIONAL_GET['CACHE_ALIAS'] at a shared backend.",
+                id='inventory.W002',
+            ))
+    catalog_alias = catalog.get_config()['CACHE_ALIAS']
+    if not generations.is_shared(catalog_alias):
+        messages.append(Warning(
+            f"The item catalog cache checks generations in the process-local cache '{catalog_alias}'.",
+            hint="Item edits made by other worker processes will not reach this one. Set WMS_REDIS_URL or point "
+                 "WMS_ITEM_CATALOG['CACHE_ALIAS'] at a shared backend.",
+            id='inventory.W003',
+        ))
+    return messages
@@ -0,0 +1,67 @@
+import hashlib
+
+from django.http import HttpResponse
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+
+from . import generations
+
+
+class ConditionalGetMixin:
+    """
+    ETag / If-None-Match for list and retrieve, validated against the change generations of
+    `etag_tables` (see generations.py).
+
+    The ETag hashes the full URL (query string included), the negotiated media type and those
+    generations, so checking it costs one cache read and no query. A matching If-None-Match gets
+    304; otherwise a rendered copy of the response stored under the same tag is served if there is
+    one, and only then does the view query and serialize. Generations are read before the query, so
+    a write landing in between can only make a stored copy newer than its tag, never older.
+    Only JSON responses take part; the browsable API embeds per-user markup. Off unless the cache is
+    shared between workers (or WMS_CONDITIONAL_GET['ALLOW_PROCESS_LOCAL'] is set).
+    """
+    etag_tables = ()
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(request, super().retrieve, *args, **kwargs)
+
+    def _etag(self, request):
+        # Sorted query so ?a=1&b=2 and ?b=2&a=1 share a tag; the host matters for pagination links
+        query = sorted(request.query_params.lists())
+        parts = [request.build_absolute_uri(request.path), repr(query), request.accepted_media_type,
+                 repr(generations.read(self.etag_tables))]
+        return '"%s"' % hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+    def _conditional(self, request, handler, *args, **kwargs):
+        if getattr(request.accepted_renderer, 'format', None) != 'json' or not generations.validators_enabled():
+            return handler(request, *args, **kwargs)
+
+        etag = self._etag(request)
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+            response = Response(status=304)
+        else:
+            cache_key = f'wms:response:{etag}'
+            cached = generations.get_cache().get(cache_key)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+            else:
+                response = handler(request, *args, **kwargs)
+                response._wms_cache_key = cache_key
+        response['ETag'] = etag
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        cache_key = getattr(response, '_wms_cache_key', None)
+        if cache_key and response.status_code == 200:
+            config = generations.get_config()
+            response.render()
+            if len(response.content) <= config['MAX_RESPONSE_BYTES']:
+                generations.get_cache().set(cache_key, (response.content, response['Content-Type']),
+                                            config['RESPONSE_TIMEOUT'])
+        return response
@@ -0,0 +1,159 @@
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, F, Max, Min, Q
+from django.utils import timezone
+
+from .models import Inventory, TransactionLog
+
+CLASSES = ('A', 'B', 'C')
+
+DEFAULTS = {
+    'ACTIVITY_DAYS': 90,                                # Pick history used for ABC ranking
+    'ABC_SPLIT': (0.8, 0.95),                           # Cumulative share of picks that ends class A, then B
+    'FREQUENCY_DAYS': {'A': 30, 'B': 90, 'C': 180},     # Max days between counts per class
+    'SAMPLE_WEIGHTS': {'A': 0.6, 'B': 0.3, 'C': 0.1},   # Spare capacity split once nothing is due
+}
+
+# Keeps IN (...) lists under SQLite's bound-parameter limit
+CHUNK = 500
+# Random id pivots per sample; each one is an index range scan
+SAMPLE_PROBES = 4
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'WMS_CYCLE_COUNT', {})}
+
+
+def _chunks(values):
+    values = list(values)
+    for start in range(0, len(values), CHUNK):
+        yield values[start:start + CHUNK]
+
+
+def classify_abc(now=None):
+    """
+    Ranks bins by PICK count over the activity window and stores A/B/C on Inventory.abc_class.
+    Classic Pareto split: the bins making up the first 80% of picks are A, the next 15% B, the rest
+    (including bins with no picks) C. Only rows whose class changes are written.
+    Scans the whole activity window, so it runs as a scheduled job (manage.py classify_abc), not
+    per planning request. Returns how many bins ended up in A and B.
+    """
+    config = get_config()
+    now = now or timezone.now()
+    since = now - timedelta(days=config['ACTIVITY_DAYS'])
+
+    activity = list(
+        TransactionLog.objects.filter(action='PICK', timestamp__gte=since)
+        .values_list('sku_snapshot', 'location_snapshot').annotate(picks=Count('id')).order_by('-picks')
+    )
+    total = sum(picks for _, _, picks in activity)
+    split_a, split_b = config['ABC_SPLIT']
+
+    ranked, running = {}, 0
+    for sku, location, picks in activity:
+        share = running / total
+        ranked[(sku, location)] = 'A' if share < split_a else 'B' if share < split_b else 'C'
+        running += picks
+
+    # Resolve (sku, location) to bin ids
+    wanted = {}
+    for skus in _chunks({sku for sku, _ in ranked}):
+        for inv_id, sku, location in Inventory.objects.filter(item__sku__in=skus).values_list('id', 'item__sku', 'location_code'):
+            cls = ranked.get((sku, location))
+            if cls and cls != 'C':
+                wanted[inv_id] = cls
+
+    current = dict(Inventory.objects.exclude(abc_class='C').values_list('id', 'abc_class'))
+    changes = {cls: [] for cls in CLASSES}
+    for inv_id, cls in wanted.items():
+        if current.get(inv_id) != cls:
+            changes[cls].append(inv_id)
+    changes['C'] = [inv_id for inv_id in current if inv_id not in wanted]
+
+    for cls, ids in changes.items():
+        for chunk in _chunks(ids):
+            Inventory.objects.filter(id__in=chunk).update(abc_class=cls)
+
+    counts = {'A': 0, 'B': 0}
+    for cls in wanted.values():
+        counts[cls] += 1
+    return counts
+
+
+def _sample(queryset, n, fields):
+    """
+    Up to n rows picked at random without ORDER BY RANDOM(), which sorts every candidate: a few
+    random id pivots, each taking the next rows in id order and wrapping around at the top.
+    """
+    if n <= 0:
+        return []
+    bounds = queryset.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return []
+
+    probes = min(n, SAMPLE_PROBES)
+    per_probe = -(-n // probes)
+    picked = {}
+    for pivot in sorted(random.randint(bounds['low'], bounds['high']) for _ in range(probes)):
+        rest = queryset.exclude(id__in=list(picked))
+        rows = list(rest.filter(id__gte=pivot).order_by('id').values(*fields)[:per_probe])
+        if len(rows) < per_probe:
+            rows += rest.filter(id__lt=pivot).order_by('id').values(*fields)[:per_probe - len(rows)]
+        for row in rows:
+            picked[row['id']] = row
+        if len(picked) >= n or not rows:
+            break
+    return list(picked.values())[:n]
+
+
+def plan(aisle_prefix=None, limit=10, stratify=True, now=None):
+    """
+    Chooses up to `limit` bins to count and returns them as [{"id", "quantity", "abc_class"}].
+
+    With stratify, bins past their class's count frequency come first (A, then B, then C; never
+    counted or longest ago first), and spare capacity is sampled across classes by SAMPLE_WEIGHTS.
+    Without it this is a plain random sample. Classes come from the last classify_abc run; planning
+    itself only reads. Selection and sampling happen in the database.
+    """
+    config = get_config()
+    now = now or timezone.now()
+
+    base = Inventory.objects.filter(quantity__gt=0).exclude(cyclecounttask__status='PENDING')
+    if aisle_prefix:
+        base = base.filter(location_code__startswith=aisle_prefix)
+    fields = ('id', 'quantity', 'abc_class')
+
+    if not stratify:
+        return _sample(base, limit, fields)
+
+    selected = []
+
+    # 1. Overdue bins, most important class first
+    for cls in CLASSES:
+        remaining = limit - len(selected)
+        if remaining <= 0:
+            return selected
+        cutoff = now - timedelta(days=config['FREQUENCY_DAYS'][cls])
+        selected += base.filter(abc_class=cls).filter(
+            Q(last_counted_at__isnull=True) | Q(last_counted_at__lt=cutoff)
+        ).order_by(F('last_counted_at').asc(nulls_first=True), 'id').values(*fields)[:remaining]
+
+    # 2. Spare capacity: weighted random sample per class
+    spare = limit - len(selected)
+    for cls in CLASSES:
+        remaining = limit - len(selected)
+        if remaining <= 0:
+            return selected
+        quota = min(remaining, round(spare * config['SAMPLE_WEIGHTS'].get(cls, 0)))
+        if quota:
+            taken = [row['id'] for row in selected]
+            selected += _sample(base.filter(abc_class=cls).exclude(id__in=taken), quota, fields)
+
+    # 3. Rounding or thin classes left a gap: fill from any class
+    remaining = limit - len(selected)
+    if remaining > 0:
+        taken = [row['id'] for row in selected]
+        selected += _sample(base.exclude(id__in=taken), remaining, fields)
+    return selected
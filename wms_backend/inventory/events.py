@@ -0,0 +1,189 @@
+import asyncio
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+TYPES = ('receive', 'pick', 'move', 'adjust', 'allocate', 'pack', 'ship')
+
+# Per-thread batch of events waiting for the current transaction to commit
+_local = threading.local()
+
+
+def get_config():
+    return {'BROKER': 'inventory.events.InProcessBroker', 'HISTORY': 1000, 'QUEUE_SIZE': 1000,
+            'HEARTBEAT_SECONDS': 15, **getattr(settings, 'WMS_EVENTS', {})}
+
+
+@lru_cache(maxsize=None)
+def _broker(path):
+    config = get_config()
+    return import_string(path)(history=config['HISTORY'], queue_size=config['QUEUE_SIZE'])
+
+
+def get_broker():
+    return _broker(get_config()['BROKER'])
+
+
+# --- PUBLISHING ---
+
+class _Batch:
+    def __init__(self):
+        self.events = []
+
+    def flush(self):
+        events, self.events = self.events, []
+        if not events:
+            return
+        # Runs after COMMIT: a broken broker must not look like a failed stock change
+        try:
+            get_broker().publish_many(events)
+        except Exception:
+            logger.exception("Dropped %d change events", len(events))
+
+
+def emit(event_type, **fields):
+    """
+    Queues a change event for subscribers, published once the current transaction commits, so
+    rolled-back changes are never announced. Fields used for filtering: sku / skus, location /
+    to_location, order_id.
+    """
+    event = {"type": event_type, "ts": time.time(), **fields}
+    conn = transaction.get_connection()
+    if not conn.in_atomic_block:
+        get_broker().publish_many([event])
+        return
+
+    batch = getattr(_local, 'batch', None)
+    # Same stale-batch check as txlog: a rolled-back transaction took its on_commit flush with it
+    if batch is None or not any(cb[1] == batch.flush for cb in conn.run_on_commit):
+        batch = _Batch()
+        _local.batch = batch
+        transaction.on_commit(batch.flush, robust=True)
+    batch.events.append(event)
+
+
+# --- SUBSCRIBING ---
+
+class EventFilter:
+    """Subscriber-side selection: every given criterion must match."""
+
+    def __init__(self, sku=None, location_prefix=None, order_id=None, types=None):
+        self.sku = sku
+        self.location_prefix = location_prefix
+        self.order_id = order_id
+        self.types = set(types) if types else None
+
+    @classmethod
+    def from_params(cls, params):
+        order_id = params.get('order')
+        types = params.get('types')
+        return cls(
+            sku=params.get('sku') or None,
+            location_prefix=params.get('location_prefix') or None,
+            order_id=int(order_id) if order_id else None,
+            types=types.split(',') if types else None,
+        )
+
+    def matches(self, event):
+        if self.types and event["type"] not in self.types:
+            return False
+        if self.sku and self.sku != event.get("sku") and self.sku not in event.get("skus", ()):
+            return False
+        if self.location_prefix:
+            locations = (event.get("location"), event.get("to_location"))
+            if not any(loc and loc.startswith(self.location_prefix) for loc in locations):
+                return False
+        if self.order_id is not None and event.get("order_id") != self.order_id:
+            return False
+        return True
+
+
+class Subscription:
+    def __init__(self, broker, event_filter, queue_size):
+        self.broker = broker
+        self.filter = event_filter
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.lagged = False
+
+    def _deliver(self, event):
+        # On the subscriber's loop. A reader too slow to keep up is told to resync instead of
+        # holding unbounded memory.
+        if self.lagged:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Dropped from here on; get() reports the lag once the queue has drained
+            self.lagged = True
+
+    async def get(self):
+        if self.lagged and self.queue.empty():
+            self.lagged = False
+            return {"type": "lagged"}
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class InProcessBroker:
+    """
+    Fans events out to subscribers in this process only, keeping the last HISTORY events so a client
+    reconnecting with Last-Event-ID misses nothing. Event ids are per process. Run the event stream
+    on a single ASGI worker, or point WMS_EVENTS['BROKER'] at a class with the same publish_many /
+    subscribe / unsubscribe interface backed by a shared broker.
+    """
+
+    def __init__(self, history=1000, queue_size=1000):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._queue_size = queue_size
+
+    def publish_many(self, events):
+        with self._lock:
+            stamped = [{"id": next(self._ids), **event} for event in events]
+            self._history.extend(stamped)
+            subscribers = list(self._subscribers)
+
+        for sub in subscribers:
+            wanted = [event for event in stamped if sub.filter.matches(event)]
+            for event in wanted:
+                try:
+                    sub.loop.call_soon_threadsafe(sub._deliver, event)
+                except RuntimeError:
+                    # Loop already closed: the connection is gone
+                    self.unsubscribe(sub)
+                    break
+
+    def subscribe(self, event_filter, last_event_id=None):
+        """
+        Must be called on the subscriber's event loop. With last_event_id, events after it that are
+        still in history are queued first; if it is older than the history, the client gets 'lagged'.
+        """
+        sub = Subscription(self, event_filter, self._queue_size)
+        with self._lock:
+            if last_event_id is not None:
+                oldest = self._history[0]["id"] if self._history else None
+                if oldest is not None and last_event_id < oldest - 1:
+                    sub.lagged = True
+                for event in self._history:
+                    if event["id"] > last_event_id and event_filter.matches(event):
+                        sub._deliver(event)
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
@@ -0,0 +1,127 @@
+import csv
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.http import Http404, StreamingHttpResponse
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.renderers import BaseRenderer
+
+# Rows per yielded chunk: big enough to keep syscalls down, small enough that the first byte leaves immediately
+ROWS_PER_CHUNK = 500
+
+
+class NDJSONRenderer(BaseRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+class CSVRenderer(BaseRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+class ExportContentNegotiation(BaseContentNegotiation):
+    """Picks the export format from ?format= only; Accept headers from browsers and BI tools are ignored."""
+
+    def select_parser(self, request, parsers):
+        return parsers[0] if parsers else None
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        fmt = format_suffix or request.query_params.get('format')
+        if not fmt:
+            return renderers[0], renderers[0].media_type
+        for renderer in renderers:
+            if renderer.format == fmt:
+                return renderer, renderer.media_type
+        raise Http404(f"Unsupported export format: {fmt}")
+
+
+class _Echo:
+    # csv.writer wants a file; handing back the line lets us stream it
+    def write(self, value):
+        return value
+
+
+def _values(queryset, columns):
+    plain = [name for name, lookup in columns if name == lookup]
+    aliased = {name: F(lookup) for name, lookup in columns if name != lookup}
+    chunk_size = getattr(settings, 'WMS_EXPORT_CHUNK_SIZE', 2000)
+    return queryset.values(*plain, **aliased).iterator(chunk_size=chunk_size)
+
+
+def _chunked(lines):
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= ROWS_PER_CHUNK:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def _csv_lines(rows, names):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(names)
+    for row in rows:
+        yield writer.writerow([row[name] for name in names])
+
+
+def _ndjson_lines(rows, names):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode({name: row[name] for name in names}) + '\n'
+
+
+def stream_export(queryset, columns, fmt, filename):
+    """
+    Streams a queryset as CSV or NDJSON.
+    columns is a list of (output name, ORM lookup); rows are built from values(), never from model instances.
+    """
+    names = [name for name, _ in columns]
+    lines = _csv_lines if fmt == 'csv' else _ndjson_lines
+    content_type = CSVRenderer.media_type if fmt == 'csv' else NDJSONRenderer.media_type
+
+    response = StreamingHttpResponse(_chunked(lines(_values(queryset, columns), names)), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
+
+
+INVENTORY_COLUMNS = [
+    ('id', 'id'),
+    ('sku', 'item__sku'),
+    ('item_name', 'item__name'),
+    ('location_code', 'location_code'),
+    ('quantity', 'quantity'),
+    ('reserved_quantity', 'reserved_quantity'),
+    ('version', 'version'),
+]
+
+ORDER_LINE_COLUMNS = [
+    ('order_id', 'order_id'),
+    ('order_number', 'order__order_number'),
+    ('customer_name', 'order__customer_name'),
+    ('status', 'order__status'),
+    ('created_at', 'order__created_at'),
+    ('line_id', 'id'),
+    ('sku', 'item__sku'),
+    ('qty_ordered', 'qty_ordered'),
+    ('qty_allocated', 'qty_allocated'),
+    ('qty_picked', 'qty_picked'),
+]
+
+TRANSACTION_LOG_COLUMNS = [
+    ('id', 'id'),
+    ('timestamp', 'timestamp'),
+    ('action', 'action'),
+    ('sku', 'sku_snapshot'),
+    ('location', 'location_snapshot'),
+    ('quantity_change', 'quantity_change'),
+]
@@ -0,0 +1,15 @@
+import django_filters
+
+from .models import TransactionLog
+
+
+class TransactionLogFilter(django_filters.FilterSet):
+    sku = django_filters.CharFilter(field_name='sku_snapshot')
+    location = django_filters.CharFilter(field_name='location_snapshot')
+    location_prefix = django_filters.CharFilter(field_name='location_snapshot', lookup_expr='startswith')
+    since = django_filters.IsoDateTimeFilter(field_name='timestamp', lookup_expr='gte')
+    until = django_filters.IsoDateTimeFilter(field_name='timestamp', lookup_expr='lt')
+
+    class Meta:
+        model = TransactionLog
+        fields = ['action', 'sku', 'location', 'location_prefix', 'since', 'until']
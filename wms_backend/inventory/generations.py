@@ -0,0 +1,93 @@
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import Inventory, Item, Order, OrderLine
+
+def get_config():
+    return {'CACHE_ALIAS': 'default', 'RESPONSE_TIMEOUT': 300, 'MAX_RESPONSE_BYTES': 2 * 1024 * 1024,
+            'ALLOW_PROCESS_LOCAL': False, **getattr(settings, 'WMS_CONDITIONAL_GET', {})}
+
+
+def get_cache():
+    return caches[get_config()['CACHE_ALIAS']]
+
+
+def is_shared(alias=None):
+    """False for cache backends that live inside one process, where other workers' bumps never arrive."""
+    return not isinstance(caches[alias or get_config()['CACHE_ALIAS']], (LocMemCache, DummyCache))
+
+
+def validators_enabled():
+    # A worker that can't see other workers' writes would keep answering 304 with stale stock
+    config = get_config()
+    return config['ALLOW_PROCESS_LOCAL'] or is_shared(config['CACHE_ALIAS'])
+
+
+def _key(table):
+    return f'wms:generation:{table}'
+
+
+def _bump(tables):
+    cache = get_cache()
+    for table in tables:
+        try:
+            cache.incr(_key(table))
+        except ValueError:
+            # Never set or evicted: restart from the clock so old validators can't match again
+            cache.add(_key(table), time.time_ns(), timeout=None)
+            cache.incr(_key(table))
+
+
+def touch(*tables):
+    """
+    Marks tables as changed, now and again when the current transaction commits: a reader that
+    cached pre-commit rows under the first bump is moved off them by the second.
+    Writes that skip model signals (raw/bulk/queryset updates) must call this themselves.
+    """
+    _bump(tables)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(partial(_bump, tables), robust=True)
+
+
+def read(tables):
+    """Current generation per table, from a single cache round trip; never touches the database."""
+    cache = get_cache()
+    keys = [_key(table) for table in tables]
+    found = cache.get_many(keys)
+    if len(found) < len(keys):
+        for key in keys:
+            if key not in found:
+                cache.add(key, time.time_ns(), timeout=None)
+        found = cache.get_many(keys)
+    return tuple(found.get(key) for key in keys)
+
+
+async def aread(tables):
+    """read() for async views."""
+    cache = get_cache()
+    keys = [_key(table) for table in tables]
+    found = await cache.aget_many(keys)
+    if len(found) < len(keys):
+        for key in keys:
+            if key not in found:
+                await cache.aadd(key, time.time_ns(), timeout=None)
+        found = await cache.aget_many(keys)
+    return tuple(found.get(key) for key in keys)
+
+
+# ORM saves and deletes (viewset CRUD, order.save(), cascades) are covered by signals
+def _model_changed(table, **kwargs):
+    touch(table)
+
+
+for _model, _table in ((Inventory, 'inventory'), (Item, 'item'), (Order, 'order'), (OrderLine, 'order')):
+    _handler = partial(_model_changed, _table)
+    post_save.connect(_handler, sender=_model, weak=False, dispatch_uid=f'generations_saved_{_model.__name__}')
+    post_delete.connect(_handler, sender=_model, weak=False, dispatch_uid=f'generations_deleted_{_model.__name__}')
@@ -0,0 +1,199 @@
+import socket
+import string
+from functools import lru_cache
+
+from django.conf import settings
+from django.db.models import Count
+from django.http import StreamingHttpResponse
+
+from .models import Order
+
+# Labels per yielded chunk / socket write
+LABELS_PER_CHUNK = 200
+
+TEMPLATES = {
+    'bin': """^XA
+^FO50,50^ADN,36,20^FD{name}^FS
+^FO50,100^ADN,18,10^FDSKU: {sku}^FS
+^FO50,130^ADN,18,10^FDLOC: {location}^FS
+^FO50,180^BY2,2,100^BCN,100,Y,N,N^FD{sku}^FS
+^XZ
+""",
+    'shipping': """^XA
+^FX Top section
+^CF0,60
+^FO50,50^GB100,100,100^FS
+^FO75,75^FR^GB100,100,100^FS
+^FO93,93^GB40,40,40^FS
+^FO220,50^FDIntershipping, Inc.^FS
+^CF0,30
+^FO220,115^FD1000 Shipping Lane^FS
+^FO220,155^FDShelbyville TN 38102^FS
+^FO220,195^FDUnited States (USA)^FS
+^FO50,250^GB700,3,3^FS
+^FX Recipient
+^CF0,30
+^FO50,300^FD{customer}^FS
+^FO50,340^FD{address}^FS
+^FO50,380^FD{city}, {state} {zip}^FS
+^CFA,30
+^FO50,430^FDOrder #: {order_number}^FS
+^FO50,470^FDSKU Count: {sku_count}^FS
+^FO50,530^GB700,3,3^FS
+^FX Barcode
+^BY5,2,270
+^FO100,580^BC^FD{order_number}^FS
+^XZ
+""",
+    'pick': """^XA
+^CF0,40
+^FO50,40^FDSTOP {stop}  {location}^FS
+^CF0,30
+^FO50,100^FDSKU: {sku}^FS
+^FO50,140^FDQTY: {qty}^FS
+^FO50,180^FDORDERS: {orders}^FS
+^FO50,230^BY2,2,80^BCN,80,Y,N,N^FD{sku}^FS
+^XZ
+""",
+}
+
+# ^ and ~ start ZPL commands; inside field data they would end the field early
+_UNSAFE = str.maketrans({'^': ' ', '~': ' '})
+
+
+@lru_cache(maxsize=None)
+def _compile(text):
+    return tuple(string.Formatter().parse(text))
+
+
+def get_template(name):
+    """Compiled template: WMS_LABEL_TEMPLATES overrides the built-ins. Parsed once per distinct text."""
+    text = getattr(settings, 'WMS_LABEL_TEMPLATES', {}).get(name) or TEMPLATES[name]
+    return _compile(text)
+
+
+def render(template, context):
+    parts = []
+    for literal, field, _, _ in template:
+        parts.append(literal)
+        if field is not None:
+            parts.append(str(context[field]).translate(_UNSAFE))
+    return ''.join(parts)
+
+
+def render_all(name, contexts):
+    template = get_template(name)
+    for context in contexts:
+        yield render(template, context)
+
+
+# --- CONTEXTS ---
+
+def bin_context(item_name, sku, location):
+    return {"name": item_name[:25], "sku": sku, "location": location}
+
+
+def shipping_context(order, sku_count):
+    return {
+        "customer": order.customer_name,
+        "address": order.customer_address or "No Address Provided",
+        "city": order.customer_city or "Unknown City",
+        "state": order.customer_state or "XX",
+        "zip": order.customer_zip or "00000",
+        "order_number": order.order_number,
+        "sku_count": sku_count,
+    }
+
+
+def bin_contexts(queryset):
+    """One query: bins in location order with their item fields."""
+    rows = queryset.order_by('location_code', 'id').values_list('item__name', 'item__sku', 'location_code')
+    for name, sku, location in rows.iterator(chunk_size=getattr(settings, 'WMS_EXPORT_CHUNK_SIZE', 2000)):
+        yield bin_context(name, sku, location)
+
+
+def shipping_contexts(order_ids):
+    """
+    One query: PACKED/SHIPPED orders with their line count annotated, in the order the ids were given.
+    Returns (contexts, skipped ids): ids of unknown orders or orders not yet packed are skipped.
+    """
+    order_ids = [int(order_id) for order_id in order_ids]
+    orders = Order.objects.filter(id__in=order_ids, status__in=['PACKED', 'SHIPPED']).annotate(sku_count=Count('lines'))
+    by_id = {order.id: order for order in orders}
+    contexts = [shipping_context(by_id[order_id], by_id[order_id].sku_count) for order_id in order_ids if order_id in by_id]
+    return contexts, [order_id for order_id in order_ids if order_id not in by_id]
+
+
+def pick_contexts(wave_plan):
+    """Pick tickets from a generate_wave_plan result: one per bin visit, in route order."""
+    stops = {location: n for n, location in enumerate(wave_plan["route"], 1)}
+    tickets = []
+    for entry in wave_plan["pick_list"]:
+        for b in entry["bins"]:
+            tickets.append({
+                "stop": stops[b["location"]],
+                "location": b["location"],
+                "sku": entry["sku"],
+                "qty": b["qty"],
+                "orders": ", ".join(entry["orders"])[:60],
+            })
+    tickets.sort(key=lambda t: t["stop"])
+    return tickets
+
+
+# --- OUTPUT ---
+
+def chunked(labels):
+    buffer = []
+    for label in labels:
+        buffer.append(label)
+        if len(buffer) >= LABELS_PER_CHUNK:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_labels(labels, filename):
+    """Single concatenated ZPL job, streamed as it renders."""
+    response = StreamingHttpResponse(chunked(labels), content_type='text/plain')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.zpl"'
+    return response
+
+
+class PrinterError(Exception):
+    pass
+
+
+def get_printer(name):
+    """(host, port) for a configured printer name from WMS_LABEL_PRINTERS."""
+    printers = getattr(settings, 'WMS_LABEL_PRINTERS', {})
+    if name not in printers:
+        raise PrinterError(f"Unknown printer: {name}")
+    host, port = printers[name]
+    return host, int(port)
+
+
+def spool(host, port, labels, timeout=None):
+    """
+    Sends a ZPL job to a network printer over raw TCP (port 9100 on most Zebras), streaming chunks as
+    they render. Returns (labels sent, bytes sent). Raises PrinterError if the printer can't be reached.
+    """
+    timeout = timeout or getattr(settings, 'WMS_LABEL_PRINTER_TIMEOUT', 10)
+    count = sent = 0
+
+    def counted():
+        nonlocal count
+        for label in labels:
+            count += 1
+            yield label
+
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as conn:
+            for chunk in chunked(counted()):
+                data = chunk.encode('utf-8')
+                conn.sendall(data)
+                sent += len(data)
+    except OSError as exc:
+        raise PrinterError(f"Printer {host}:{port} unreachable after {count} labels: {exc}")
+    return count, sent
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+
+from inventory import stats
+from inventory.management.commands.benchmark_services import percentile
+from inventory.models import Inventory, Item
+
+
+class ThreadSampler:
+    # Peak live threads while a scenario runs: what each deployment spends on held connections
+    def __init__(self):
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, threading.active_count() - 1)
+            time.sleep(0.005)
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares concurrent-connection capacity of the sync read API on a fixed WSGI worker pool against "
+        "the async read API under ASGI. Opens --connections long-polling dashboards, then measures how long "
+        "--lookups inventory lookups issued at the same time take. Runs in a throwaway SQLite database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=64, help="Dashboards held open at once.")
+        parser.add_argument('--hold', type=float, default=1.0, help="Seconds each dashboard waits for a change.")
+        parser.add_argument('--interval', type=float, default=0.25, help="Change checks per held dashboard.")
+        parser.add_argument('--lookups', type=int, default=200, help="Inventory lookups issued alongside.")
+        parser.add_argument('--workers', type=int, default=16, help="WSGI worker threads (e.g. gunicorn --threads).")
+        parser.add_argument('--skus', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help="Write the JSON results to this file.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        old_name = connection.settings_dict['NAME']
+        tmp_dir = None
+
+        if connection.vendor == 'sqlite':
+            # A file, so the async ORM's thread and the WSGI workers all see the same database
+            tmp_dir = tempfile.TemporaryDirectory()
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(tmp_dir.name, 'bench.sqlite3')
+
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            skus = self.seed(options)
+            # Requests go through the real WSGI/ASGI handlers via the test clients, which call themselves testserver
+            with override_settings(WMS_ASYNC_API={'LONG_POLL_INTERVAL': options['interval']},
+                                   ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                results = {
+                    'wsgi': self.run_wsgi(options, skus),
+                    'asgi': asyncio.run(self.run_asgi(options, skus)),
+                }
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            if tmp_dir:
+                tmp_dir.cleanup()
+
+        self.stdout.write(
+            f"{options['connections']} dashboards held {options['hold']}s, {options['lookups']} lookups, "
+            f"{options['workers']} WSGI workers"
+        )
+        self.stdout.write(f"{'mode':>6}{'lookup p50':>12}{'p95':>9}{'max':>9}{'lookups/s':>11}{'wall s':>8}{'threads':>9}")
+        for mode, r in results.items():
+            self.stdout.write(
+                f"{mode:>6}{r['lookup_p50_ms']:>12}{r['lookup_p95_ms']:>9}{r['lookup_max_ms']:>9}"
+                f"{r['lookups_per_sec']:>11}{r['wall_s']:>8}{r['peak_threads']:>9}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump({"options": {k: options[k] for k in ('connections', 'hold', 'interval', 'lookups',
+                                                               'workers', 'skus', 'seed')},
+                           "results": results}, fh, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def seed(self, options):
+        items = Item.objects.bulk_create([Item(sku=f"SKU-{n:05d}", name=f"Item {n}") for n in range(options['skus'])])
+        Inventory.objects.bulk_create([
+            Inventory(item=item, location_code=f"{chr(65 + n % 20)}-{n % 40 + 1:02d}-{level}",
+                      quantity=self.rng.randint(0, 200), version=1)
+            for n, item in enumerate(items) for level in (1, 2)
+        ])
+        stats.rebuild()
+        return [item.sku for item in items]
+
+    @staticmethod
+    def ensure_ok(response):
+        if response.status_code != 200:
+            raise CommandError(f"{response.request['PATH_INFO']} answered {response.status_code}")
+        return response
+
+    def report(self, latencies, wall, peak_threads):
+        latencies.sort()
+        return {
+            "lookup_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "lookup_p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "lookup_max_ms": round(latencies[-1] * 1000, 1),
+            "lookups_per_sec": round(len(latencies) / wall, 1),
+            "wall_s": round(wall, 2),
+            "peak_threads": peak_threads,
+        }
+
+    def run_wsgi(self, options, skus):
+        hold, interval = options['hold'], options['interval']
+
+        def held_dashboard():
+            # The sync stack can only wait for a change by polling inside the worker that took the request
+            deadline = time.perf_counter() + hold
+            try:
+                while True:
+                    stats.read()
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        return
+                    time.sleep(min(interval, remaining))
+            finally:
+                connection.close()
+
+        def lookup(sku, submitted):
+            self.ensure_ok(Client().get('/api/inventory/', {'item__sku': sku}))
+            return time.perf_counter() - submitted
+
+        with ThreadSampler() as sampler, ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            start = time.perf_counter()
+            held = [pool.submit(held_dashboard) for _ in range(options['connections'])]
+            lookups = [pool.submit(lookup, self.rng.choice(skus), time.perf_counter()) for _ in range(options['lookups'])]
+            latencies = [f.result() for f in lookups]
+            for f in held:
+                f.result()
+            wall = time.perf_counter() - start
+        return self.report(latencies, wall, sampler.peak)
+
+    async def run_asgi(self, options, skus):
+        client = AsyncClient()
+        version = self.ensure_ok(await client.get('/api/async/dashboard/stats/')).json()['version']
+
+        async def held_dashboard():
+            self.ensure_ok(await client.get('/api/async/dashboard/stats/', {'since': version, 'timeout': options['hold']}))
+
+        async def lookup(sku):
+            submitted = time.perf_counter()
+            self.ensure_ok(await client.get('/api/async/inventory/', {'sku': sku}))
+            return time.perf_counter() - submitted
+
+        with ThreadSampler() as sampler:
+            start = time.perf_counter()
+            held = [asyncio.ensure_future(held_dashboard()) for _ in range(options['connections'])]
+            latencies = await asyncio.gather(*[lookup(self.rng.choice(skus)) for _ in range(options['lookups'])])
+            await asyncio.gather(*held)
+            wall = time.perf_counter() - start
+        return self.report(list(latencies), wall, sampler.peak)
@@ -0,0 +1,83 @@
+import json
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+
+from inventory import routing
+from inventory.management.commands.benchmark_services import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares pick walk distance of routed waves against the old alphabetical location order, "
+        "and times the sequencing. Uses synthetic waves on the configured WMS_PICK_LAYOUT; no database needed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stops', default='25,100,300', help="Comma-separated wave sizes (distinct bins).")
+        parser.add_argument('--waves', type=int, default=20, help="Waves generated per size.")
+        parser.add_argument('--aisles', type=int, default=16)
+        parser.add_argument('--levels', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help="Write the JSON results to this file.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        layout = routing.get_layout()
+        aisles = [self.aisle_code(n) for n in range(options['aisles'])]
+        bays = layout['BAYS_PER_AISLE']
+        capacity = len(aisles) * bays * options['levels']
+
+        results = {}
+        for size in [int(s) for s in options['stops'].split(',')]:
+            size = min(size, capacity)
+            timings, routed, alphabetical = [], [], []
+            for _ in range(options['waves']):
+                codes = set()
+                while len(codes) < size:
+                    codes.add(f"{rng.choice(aisles)}-{rng.randint(1, bays):02d}-{rng.randint(1, options['levels'])}")
+                codes = list(codes)
+
+                # Cold run: a new wave never hits the matrix cache
+                routing._matrices.clear()
+                t0 = time.perf_counter()
+                order, distance = routing.sequence(codes, layout)
+                timings.append((time.perf_counter() - t0) * 1000)
+                routed.append(distance)
+                alphabetical.append(routing.walk_distance(sorted(codes), layout))
+
+            timings.sort()
+            saved = (sum(alphabetical) - sum(routed)) / sum(alphabetical) * 100
+            results[str(size)] = {
+                "waves": options['waves'],
+                "alphabetical_m": round(sum(alphabetical) / len(alphabetical), 1),
+                "routed_m": round(sum(routed) / len(routed), 1),
+                "saved_pct": round(saved, 1),
+                "p50_ms": round(percentile(timings, 50), 2),
+                "p95_ms": round(percentile(timings, 95), 2),
+                "max_ms": round(timings[-1], 2),
+            }
+
+        self.stdout.write(f"{'stops':>6}{'alpha m':>10}{'routed m':>10}{'saved':>8}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}")
+        for size, r in results.items():
+            self.stdout.write(
+                f"{size:>6}{r['alphabetical_m']:>10}{r['routed_m']:>10}{r['saved_pct']:>7}%"
+                f"{r['p50_ms']:>9}{r['p95_ms']:>9}{r['max_ms']:>9}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump({"layout": {k: v for k, v in layout.items() if k != 'PATTERN'}, "results": results}, fh, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    @staticmethod
+    def aisle_code(n):
+        # 0 -> A, 25 -> Z, 26 -> AA
+        code = ''
+        n += 1
+        while n:
+            n, rem = divmod(n - 1, 26)
+            code = string.ascii_uppercase[rem] + code
+        return code
@@ -0,0 +1,255 @@
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from inventory.models import CycleCountSession, CycleCountTask, Inventory, Item, Order, OrderLine
+from inventory.services import InventoryService
+
+
+class QueryCounter:
+    # execute_wrapper hook: cheaper than CaptureQueriesContext, so it can stay on while timing
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the InventoryService hot paths on a seeded synthetic dataset in a throwaway database. "
+        "Point WMS_POSTGRES_DB at a local PostgreSQL to run against it instead of SQLite."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skus', type=int, default=500)
+        parser.add_argument('--bins', type=int, default=2000)
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--lines', type=int, default=3, help="Lines per order.")
+        parser.add_argument('--ops', type=int, default=300, help="Operations timed per service method.")
+        parser.add_argument('--wave-size', type=int, default=50, help="Orders per generate_wave_plan call.")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help="Write the JSON results to this file.")
+        parser.add_argument('--compare', help="Baseline JSON from an earlier run; regressions fail the command.")
+        parser.add_argument('--threshold', type=float, default=10.0,
+                            help="Allowed ops/sec drop in percent before --compare flags a regression.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        old_name = connection.settings_dict['NAME']
+        tmp_dir = None
+
+        if connection.vendor == 'sqlite':
+            # Benchmark a real file rather than the in-memory test database
+            tmp_dir = tempfile.TemporaryDirectory()
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(tmp_dir.name, 'bench.sqlite3')
+
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.seed(options)
+            results = self.run_all(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            if tmp_dir:
+                tmp_dir.cleanup()
+
+        report = {"meta": self.meta(options), "results": results}
+        self.print_table(results)
+
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options['compare']:
+            self.compare(report, options['compare'], options['threshold'])
+
+    # --- DATASET ---
+
+    def seed(self, options):
+        rng = self.rng
+        Item.objects.bulk_create(
+            [Item(sku=f"BENCH-{n:06d}", name=f"Bench item {n}") for n in range(options['skus'])], batch_size=1000
+        )
+        item_ids = list(Item.objects.order_by('id').values_list('id', flat=True))
+
+        bins = set()
+        while len(bins) < options['bins']:
+            bins.add((rng.choice(item_ids), f"{rng.choice('ABCDEFGH')}-{rng.randint(1, 40):02d}-{rng.randint(1, 6)}"))
+        Inventory.objects.bulk_create(
+            [Inventory(item_id=item_id, location_code=loc, quantity=1000, version=0) for item_id, loc in bins],
+            batch_size=1000
+        )
+
+        stocked = list(Inventory.objects.values_list('item_id', flat=True).distinct())
+        Order.objects.bulk_create(
+            [Order(order_number=f"BENCH-ORD-{n:06d}", customer_name=f"Customer {n}") for n in range(options['orders'])],
+            batch_size=1000
+        )
+        OrderLine.objects.bulk_create([
+            OrderLine(order_id=order_id, item_id=item_id, qty_ordered=rng.randint(1, 3))
+            for order_id in Order.objects.values_list('id', flat=True)
+            for item_id in rng.sample(stocked, min(options['lines'], len(stocked)))
+        ], batch_size=1000)
+
+    # --- WORKLOADS ---
+
+    def run_all(self, options):
+        rng = self.rng
+        n = options['ops']
+        bins = list(Inventory.objects.values_list('id', 'item__sku', 'location_code'))
+        skus = [sku for _, sku, _ in bins]
+        results = {}
+
+        results['receive_item'] = self.measure([
+            (InventoryService.receive_item, (sku, loc, 5)) for _, sku, loc in rng.sample(bins, min(n, len(bins)))
+        ])
+        results['receive_batch'] = self.measure([
+            (InventoryService.receive_batch, ([{"sku": rng.choice(skus), "location": f"DOCK-{rng.randint(1, 20):02d}",
+                                               "quantity": 5} for _ in range(100)],))
+            for _ in range(max(1, n // 20))
+        ], units_per_op=100)
+        results['pick_item'] = self.measure([
+            (InventoryService.pick_item, (inv_id, 1)) for inv_id, _, _ in rng.sample(bins, min(n, len(bins)))
+        ])
+        results['move_item'] = self.measure([
+            (InventoryService.move_item, (sku, loc, f"MOVE-{rng.randint(1, 50):02d}", 1))
+            for _, sku, loc in rng.sample(bins, min(n, len(bins)))
+        ])
+
+        results['suggest_putaway'] = self.measure([
+            (InventoryService.suggest_putaway_location, (rng.choice(skus), rng.randint(1, 50))) for _ in range(n)
+        ])
+
+        order_ids = list(Order.objects.order_by('id').values_list('id', flat=True))
+        results['allocate_order'] = self.measure([
+            (InventoryService.allocate_order, (oid,)) for oid in order_ids[:n]
+        ])
+        results['allocate_orders'] = self.measure([
+            (InventoryService.allocate_orders, (order_ids[start:start + 100],))
+            for start in range(n, len(order_ids), 100)
+        ], units_per_op=100)
+
+        allocated = list(Order.objects.filter(status='ALLOCATED').order_by('id').values_list('id', flat=True))
+        wave = options['wave_size']
+        results['generate_wave_plan'] = self.measure([
+            (InventoryService.generate_wave_plan, (allocated[start:start + wave],))
+            for start in range(0, min(len(allocated), wave * 20), wave)
+        ])
+
+        picks = []
+        for line in OrderLine.objects.filter(order_id__in=allocated[:n]).select_related('item')[:n]:
+            inv = Inventory.objects.filter(item_id=line.item_id, reserved_quantity__gt=0).first()
+            if inv:
+                picks.append((InventoryService.pick_order_item, (line.order_id, line.item.sku, inv.location_code, 1)))
+        results['pick_order_item'] = self.measure(picks)
+
+        session = CycleCountSession.objects.get(id=InventoryService.create_cycle_count(limit=n)['session_id'])
+        results['submit_count'] = self.measure([
+            (InventoryService.submit_count, (task.id, task.expected_qty + rng.choice([-1, 0, 0, 1])))
+            for task in session.tasks.all()
+        ])
+
+        batches = []
+        for _ in range(max(1, n // 100)):
+            session_id = InventoryService.create_cycle_count(limit=100)['session_id']
+            batches.append((InventoryService.submit_counts, (session_id, [
+                {"task_id": task_id, "qty": qty + rng.choice([-1, 0, 0, 1])}
+                for task_id, qty in CycleCountTask.objects.filter(session_id=session_id).values_list('id', 'expected_qty')
+            ])))
+        results['submit_counts'] = self.measure(batches, units_per_op=100)
+        return results
+
+    def measure(self, calls, units_per_op=1):
+        latencies = []
+        counter = QueryCounter()
+        errors = 0
+
+        with connection.execute_wrapper(counter):
+            started = time.perf_counter()
+            for fn, args in calls:
+                t0 = time.perf_counter()
+                result = fn(*args)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                if isinstance(result, dict) and "error" in result:
+                    errors += 1
+            elapsed = time.perf_counter() - started
+
+        ops = len(latencies)
+        latencies.sort()
+        return {
+            "ops": ops,
+            "errors": errors,
+            "ops_per_sec": round(ops / elapsed, 2) if elapsed else 0.0,
+            "units_per_sec": round(ops * units_per_op / elapsed, 2) if elapsed else 0.0,
+            "mean_ms": round(sum(latencies) / ops, 3) if ops else 0.0,
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "queries_per_op": round(counter.count / ops, 2) if ops else 0.0,
+        }
+
+    # --- REPORTING ---
+
+    def meta(self, options):
+        try:
+            commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+        except OSError:
+            commit = ""
+        return {
+            "commit": commit,
+            "vendor": connection.vendor,
+            "django": django.get_version(),
+            "python": platform.python_version(),
+            "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "dataset": {key: options[key] for key in ('skus', 'bins', 'orders', 'lines', 'ops', 'wave_size', 'seed')},
+        }
+
+    def print_table(self, results):
+        self.stdout.write(f"{'method':<20}{'ops':>6}{'ops/s':>10}{'units/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'q/op':>7}")
+        for name, r in results.items():
+            self.stdout.write(
+                f"{name:<20}{r['ops']:>6}{r['ops_per_sec']:>10}{r['units_per_sec']:>10}"
+                f"{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}{r['queries_per_op']:>7}"
+            )
+
+    def compare(self, report, baseline_path, threshold):
+        with open(baseline_path) as fh:
+            baseline = json.load(fh)
+
+        if baseline["meta"]["dataset"] != report["meta"]["dataset"]:
+            self.stdout.write(self.style.WARNING("Baseline used a different dataset; numbers are not comparable."))
+
+        regressions = []
+        for name, current in report["results"].items():
+            before = baseline["results"].get(name)
+            if not before or not before["ops_per_sec"]:
+                continue
+            change = (current["ops_per_sec"] - before["ops_per_sec"]) / before["ops_per_sec"] * 100
+            line = (f"{name:<20}{before['ops_per_sec']:>10} -> {current['ops_per_sec']:<10}"
+                    f"({change:+.1f}%)  queries/op {before['queries_per_op']} -> {current['queries_per_op']}")
+            if change < -threshold or current["queries_per_op"] > before["queries_per_op"]:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+
+        if regressions:
+            raise CommandError(f"Regressions against {baseline_path}: {', '.join(regressions)}")
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {baseline_path}."))
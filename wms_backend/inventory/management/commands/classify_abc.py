@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from inventory import cyclecount
+
+
+class Command(BaseCommand):
+    help = "Re-ranks bins A/B/C by pick activity for cycle count planning. Run nightly."
+
+    def handle(self, *args, **options):
+        counts = cyclecount.classify_abc()
+        self.stdout.write(self.style.SUCCESS(f"Classified {counts['A']} bins as A and {counts['B']} as B; the rest are C."))
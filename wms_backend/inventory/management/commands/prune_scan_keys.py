@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventory.models import ScanKey
+
+
+class Command(BaseCommand):
+    help = "Deletes scan idempotency keys older than WMS_SCAN_INGEST['KEY_RETENTION_DAYS']. Run daily."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Override the retention period.")
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days is None:
+            days = getattr(settings, 'WMS_SCAN_INGEST', {}).get('KEY_RETENTION_DAYS', 30)
+        deleted, _ = ScanKey.objects.filter(created_at__lt=timezone.now() - timedelta(days=days)).delete()
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} scan keys."))
@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventory import changefeed
+
+
+class Command(BaseCommand):
+    help = "Deletes sync feed entries older than WMS_SYNC['RETENTION_DAYS']. Run daily; devices further behind resync fully."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Override the retention period.")
+
+    def handle(self, *args, **options):
+        older_than = timezone.now() - timedelta(days=options['days']) if options['days'] is not None else None
+        deleted = changefeed.prune(older_than)
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} sync feed entries."))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory import stats
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the dashboard counters from Inventory and TransactionLog, or verifies them with --verify."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help="Compare counters with a full recount without changing anything.")
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            current = stats.read()
+            actual = stats.compute_actual()
+            drift = {name: current[name] - actual[name] for name in stats.COUNTERS if current[name] != actual[name]}
+
+            for name in stats.COUNTERS:
+                self.stdout.write(f"{name}: counter={current[name]} actual={actual[name]}")
+            if drift:
+                raise CommandError(f"Dashboard counters drifted: {drift}")
+            self.stdout.write(self.style.SUCCESS("Dashboard counters match."))
+            return
+
+        actual = stats.rebuild()
+        for name in stats.COUNTERS:
+            self.stdout.write(f"{name}: {actual[name]}")
+        self.stdout.write(self.style.SUCCESS("Dashboard counters rebuilt."))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_alter_transactionlog_action_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transactionlog',
+            index=models.Index(fields=['timestamp', 'id'], name='txlog_ts_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactionlog',
+            index=models.Index(fields=['sku_snapshot', 'timestamp', 'id'], name='txlog_sku_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactionlog',
+            index=models.Index(fields=['location_snapshot', 'timestamp', 'id'], name='txlog_loc_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transactionlog',
+            index=models.Index(fields=['action', 'timestamp', 'id'], name='txlog_action_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:27
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def seed_counters(apps, schema_editor):
+    # Start from the real totals so dashboard_stats is correct straight after migrating
+    Inventory = apps.get_model('inventory', 'Inventory')
+    TransactionLog = apps.get_model('inventory', 'TransactionLog')
+    StatCounter = apps.get_model('inventory', 'StatCounter')
+
+    inv = Inventory.objects.aggregate(
+        total_stock=Sum('quantity'),
+        total_locations=Count('id'),
+        low_stock=Count('id', filter=Q(quantity__lt=10)),
+    )
+    StatCounter.objects.bulk_create([
+        StatCounter(name='total_stock', shard=0, value=inv['total_stock'] or 0),
+        StatCounter(name='total_locations', shard=0, value=inv['total_locations']),
+        StatCounter(name='low_stock', shard=0, value=inv['low_stock']),
+        StatCounter(name='transactions', shard=0, value=TransactionLog.objects.count()),
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_transactionlog_history_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('shard', models.PositiveSmallIntegerField(default=0)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('name', 'shard')},
+            },
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
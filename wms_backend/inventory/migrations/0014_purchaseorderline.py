@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_json_lines(apps, schema_editor):
+    # Move PurchaseOrder.lines (JSON) into PurchaseOrderLine rows and seed the PO totals
+    PurchaseOrder = apps.get_model('inventory', 'PurchaseOrder')
+    PurchaseOrderLine = apps.get_model('inventory', 'PurchaseOrderLine')
+
+    rows, pos = [], []
+    for po in PurchaseOrder.objects.only('id', 'lines').iterator(chunk_size=500):
+        po.total_ordered = po.total_received = 0
+        for line in po.lines or []:
+            qty = int(line.get('qty', 0))
+            received = int(line.get('received', 0))
+            rows.append(PurchaseOrderLine(po_id=po.id, sku=line['sku'], qty_ordered=qty, qty_received=received))
+            po.total_ordered += qty
+            po.total_received += received
+        pos.append(po)
+
+    PurchaseOrderLine.objects.bulk_create(rows, batch_size=1000)
+    PurchaseOrder.objects.bulk_update(pos, ['total_ordered', 'total_received'], batch_size=1000)
+
+
+def copy_rows_back(apps, schema_editor):
+    PurchaseOrder = apps.get_model('inventory', 'PurchaseOrder')
+    PurchaseOrderLine = apps.get_model('inventory', 'PurchaseOrderLine')
+
+    lines = {}
+    for line in PurchaseOrderLine.objects.order_by('id').iterator(chunk_size=1000):
+        lines.setdefault(line.po_id, []).append(
+            {"sku": line.sku, "qty": line.qty_ordered, "received": line.qty_received}
+        )
+    pos = list(PurchaseOrder.objects.only('id'))
+    for po in pos:
+        po.lines = lines.get(po.id, [])
+    PurchaseOrder.objects.bulk_update(pos, ['lines'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_statcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='total_ordered',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='purchaseorder',
+            name='total_received',
+            field=models.IntegerField(default=0),
+        ),
+        # No reverse accessor yet: 'lines' is still the JSON column until 0015
+        migrations.CreateModel(
+            name='PurchaseOrderLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sku', models.CharField(max_length=50)),
+                ('qty_ordered', models.IntegerField()),
+                ('qty_received', models.IntegerField(default=0)),
+                ('po', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inventory.purchaseorder')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['po', 'sku'], name='poline_po_sku_idx')],
+            },
+        ),
+        migrations.RunPython(copy_json_lines, copy_rows_back),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 09:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_purchaseorderline'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='purchaseorder',
+            name='lines',
+        ),
+        migrations.AlterField(
+            model_name='purchaseorderline',
+            name='po',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='inventory.purchaseorder'),
+        ),
+    ]
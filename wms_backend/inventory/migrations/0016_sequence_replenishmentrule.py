@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 10:05
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def seed_po_sequence(apps, schema_editor):
+    # Continue after the highest PO-NNNNN already issued
+    PurchaseOrder = apps.get_model('inventory', 'PurchaseOrder')
+    Sequence = apps.get_model('inventory', 'Sequence')
+
+    highest = 0
+    for number in PurchaseOrder.objects.values_list('po_number', flat=True).iterator():
+        match = re.fullmatch(r'PO-(\d+)', number)
+        if match:
+            highest = max(highest, int(match.group(1)))
+    Sequence.objects.create(name='purchase_order', value=highest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0015_remove_purchaseorder_lines'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReplenishmentRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('min_qty', models.IntegerField()),
+                ('max_qty', models.IntegerField()),
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='replenishment_rule', to='inventory.item')),
+                ('supplier', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='inventory.supplier')),
+            ],
+        ),
+        migrations.RunPython(seed_po_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:20
+
+import re
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+
+def backfill(apps, schema_editor):
+    Inventory = apps.get_model('inventory', 'Inventory')
+    CycleCountTask = apps.get_model('inventory', 'CycleCountTask')
+    CycleCountSession = apps.get_model('inventory', 'CycleCountSession')
+    Sequence = apps.get_model('inventory', 'Sequence')
+
+    # Best record of when a bin was last counted: the session of its latest counted task
+    last_count = CycleCountTask.objects.filter(inventory=OuterRef('pk'), status='COUNTED') \
+        .values('inventory').annotate(at=Max('session__created_at')).values('at')
+    Inventory.objects.update(last_counted_at=Subquery(last_count))
+
+    # Session references move to a sequence; continue after any CC-NNNNN already used
+    highest = 0
+    for ref in CycleCountSession.objects.values_list('reference', flat=True).iterator():
+        match = re.fullmatch(r'CC-(\d+)', ref)
+        if match:
+            highest = max(highest, int(match.group(1)))
+    Sequence.objects.create(name='cycle_count', value=highest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0016_sequence_replenishmentrule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='abc_class',
+            field=models.CharField(default='C', max_length=1),
+        ),
+        migrations.AddField(
+            model_name='inventory',
+            name='last_counted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(fields=['abc_class', 'last_counted_at'], name='inv_count_due_idx'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
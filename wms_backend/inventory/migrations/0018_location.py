@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:40
+
+from django.db import migrations, models
+
+
+def seed_locations(apps, schema_editor):
+    # Register every bin code already in use; zone is the code's first segment (A-01-1 -> A)
+    Inventory = apps.get_model('inventory', 'Inventory')
+    Location = apps.get_model('inventory', 'Location')
+
+    codes = Inventory.objects.values_list('location_code', flat=True).distinct()
+    Location.objects.bulk_create(
+        [Location(code=code, zone=code.split('-', 1)[0], capacity=100) for code in codes],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0017_inventory_cycle_count_planning'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Location',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=20, unique=True)),
+                ('zone', models.CharField(db_index=True, max_length=20)),
+                ('capacity', models.IntegerField(default=100)),
+            ],
+        ),
+        migrations.RunPython(seed_locations, migrations.RunPython.noop),
+    ]
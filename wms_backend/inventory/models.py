@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class Item(models.Model):
     sku = models.CharField(max_length=50, unique=True, db_index=True)
@@ -14,9 +15,15 @@ class Inventory(models.Model):
     quantity = models.IntegerField(default=0) 
     reserved_quantity = models.IntegerField(default=0) 
     version = models.IntegerField(default=0)
+    # Cycle count planning (see inventory/cyclecount.py)
+    abc_class = models.CharField(max_length=1, default='C')
+    last_counted_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         unique_together = ('item', 'location_code')
+        indexes = [
+            models.Index(fields=['abc_class', 'last_counted_at'], name='inv_count_due_idx'),
+        ]
     
     @property
     def available_quantity(self):
@@ -41,6 +48,15 @@ class TransactionLog(models.Model):
     location_snapshot = models.CharField(max_length=50) # Increased length to hold "A > B"
     quantity_change = models.IntegerField() 
 
+    class Meta:
+        # Keyset pagination walks (timestamp, id); history filters add their column in front
+        indexes = [
+            models.Index(fields=['timestamp', 'id'], name='txlog_ts_id_idx'),
+            models.Index(fields=['sku_snapshot', 'timestamp', 'id'], name='txlog_sku_ts_idx'),
+            models.Index(fields=['location_snapshot', 'timestamp', 'id'], name='txlog_loc_ts_idx'),
+            models.Index(fields=['action', 'timestamp', 'id'], name='txlog_action_ts_idx'),
+        ]
+
     def __str__(self):
         return f"[{self.timestamp}] {self.action}: {self.sku_snapshot} ({self.quantity_change})"
 
@@ -61,11 +77,31 @@ class PurchaseOrder(models.Model):
     po_number = models.CharField(max_length=50, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='DRAFT')
-    lines = models.JSONField(default=list) 
+    # Running totals over the lines, so receipts can set the status without summing every line
+    total_ordered = models.IntegerField(default=0)
+    total_received = models.IntegerField(default=0)
+
+    @property
+    def open_qty(self):
+        return self.total_ordered - self.total_received
 
     def __str__(self):
         return f"{self.po_number} - {self.supplier.name}"
 
+class PurchaseOrderLine(models.Model):
+    po = models.ForeignKey(PurchaseOrder, related_name='lines', on_delete=models.CASCADE)
+    sku = models.CharField(max_length=50)
+    qty_ordered = models.IntegerField()
+    qty_received = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['po', 'sku'], name='poline_po_sku_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.sku}: {self.qty_received}/{self.qty_ordered}"
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('PENDING', 'Pending'),
@@ -153,4 +189,65 @@ class CycleCountTask(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
     
     def __str__(self):
-        return f"Count {self.inventory.item.sku} @ {self.inventory.location_code}"
\ No newline at end of file
+        return f"Count {self.inventory.item.sku} @ {self.inventory.location_code}"
+
+class StatCounter(models.Model):
+    # Dashboard totals kept in step with InventoryService writes (see inventory/stats.py).
+    # Each counter is split over a few shard rows so concurrent writers don't all queue on one row.
+    name = models.CharField(max_length=50)
+    shard = models.PositiveSmallIntegerField(default=0)
+    value = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('name', 'shard')
+
+    def __str__(self):
+        return f"{self.name}[{self.shard}] = {self.value}"
+
+class Sequence(models.Model):
+    # Named counters for human-facing document numbers (see inventory/sequences.py)
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+class ReplenishmentRule(models.Model):
+    # Per-SKU min/max; SKUs without a rule use WMS_REPLENISHMENT defaults
+    item = models.OneToOneField(Item, related_name='replenishment_rule', on_delete=models.CASCADE)
+    min_qty = models.IntegerField()
+    max_qty = models.IntegerField()
+    supplier = models.ForeignKey(Supplier, null=True, blank=True, on_delete=models.SET_NULL)
+
+    def __str__(self):
+        return f"{self.item.sku}: {self.min_qty}-{self.max_qty}"
+
+class Location(models.Model):
+    # Bin master for putaway: how many units a bin holds and which zone it is in (see inventory/putaway.py)
+    code = models.CharField(max_length=20, unique=True)
+    zone = models.CharField(max_length=20, db_index=True)
+    capacity = models.IntegerField(default=100)
+
+    def __str__(self):
+        return f"{self.code} ({self.zone}, cap {self.capacity})"
+
+class SyncChange(models.Model):
+    # Append-only change feed for handheld delta sync (see inventory/changefeed.py); id is the sync cursor.
+    # An entry whose row no longer exists is a delete tombstone.
+    table = models.CharField(max_length=20)
+    object_id = models.BigIntegerField()
+    changed_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"#{self.id} {self.table}:{self.object_id}"
+
+class ScanKey(models.Model):
+    # Idempotency keys of ingested handheld scans and the outcome a replay gets back (see InventoryService.ingest_scans)
+    key = models.CharField(max_length=64, unique=True)
+    device_id = models.CharField(max_length=50, blank=True, null=True)
+    scan_type = models.CharField(max_length=10)
+    result = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.key} ({self.scan_type})"
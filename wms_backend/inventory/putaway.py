@@ -0,0 +1,225 @@
+import bisect
+import threading
+import time
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+
+from . import catalog
+from .models import Inventory, Location
+
+
+def get_config():
+    return {'DEFAULT_CAPACITY': 100, 'REFRESH_SECONDS': 300, **getattr(settings, 'WMS_PUTAWAY', {})}
+
+
+def zone_of(code):
+    """Zone for a bin with no Location row: the code's first segment (A-01-1 -> A)."""
+    return code.split('-', 1)[0]
+
+
+class FreeSlotIndex:
+    """
+    Process-local picture of bin capacity and fill, so putaway suggestions never hit the database.
+
+    Loaded from Location + Inventory on first use and every REFRESH_SECONDS (which also picks up writes
+    made by other processes). In between, the stock write paths push committed quantities in via track().
+    Suggestions are advice: receiving is still checked against the database.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded_at = None
+
+    # --- LOADING ---
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def load(self):
+        capacity, zones = {}, {}
+        for code, zone, cap in Location.objects.values_list('code', 'zone', 'capacity').iterator(chunk_size=5000):
+            capacity[code] = cap
+            zones[code] = zone
+        stock = list(
+            Inventory.objects.filter(quantity__gt=0)
+            .values_list('item_id', 'location_code', 'quantity').iterator(chunk_size=5000)
+        )
+
+        with self._lock:
+            self._capacity = capacity
+            self._zone = zones
+            self._stock = {}
+            self._fill = {}
+            self._item_bins = {}
+            for item_id, code, qty in stock:
+                self._stock[(item_id, code)] = qty
+                self._fill[code] = self._fill.get(code, 0) + qty
+                self._item_bins.setdefault(item_id, set()).add(code)
+
+            # Empty master bins per zone, sorted by capacity for best-fit lookups
+            self._empty = {}
+            for code, cap in capacity.items():
+                if not self._fill.get(code):
+                    self._empty.setdefault(zones[code], []).append((cap, code))
+            for bins in self._empty.values():
+                bins.sort()
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > get_config()['REFRESH_SECONDS']:
+            self.load()
+
+    def _item_id(self, sku):
+        item = catalog.items.get(sku)
+        return item.id if item else None
+
+    # --- UPDATES ---
+
+    def apply(self, rows):
+        """Sets the committed quantity of (item_id, location_code) bins."""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            for item_id, code, qty in rows:
+                self._set(item_id, code, qty)
+
+    def _set(self, item_id, code, qty):
+        key = (item_id, code)
+        old = self._stock.get(key, 0)
+        if qty == old:
+            return
+
+        if qty > 0:
+            self._stock[key] = qty
+            self._item_bins.setdefault(item_id, set()).add(code)
+        else:
+            self._stock.pop(key, None)
+            bins = self._item_bins.get(item_id)
+            if bins:
+                bins.discard(code)
+
+        was_empty = not self._fill.get(code)
+        self._fill[code] = self._fill.get(code, 0) + max(qty, 0) - old
+        is_empty = not self._fill[code]
+
+        if code in self._capacity and was_empty != is_empty:
+            bins = self._empty.setdefault(self._zone[code], [])
+            entry = (self._capacity[code], code)
+            if is_empty:
+                bisect.insort(bins, entry)
+            else:
+                idx = bisect.bisect_left(bins, entry)
+                if idx < len(bins) and bins[idx] == entry:
+                    del bins[idx]
+
+    # --- QUERIES ---
+
+    def _free(self, code, planned=None):
+        capacity = self._capacity.get(code, get_config()['DEFAULT_CAPACITY'])
+        used = self._fill.get(code, 0) + (planned.get(code, 0) if planned else 0)
+        return capacity - used
+
+    def _zone_of(self, code):
+        return self._zone.get(code) or zone_of(code)
+
+    def _consolidation_bins(self, item_id):
+        # Bins already holding the SKU, fullest first (same preference as the old suggestion)
+        return sorted(self._item_bins.get(item_id, ()), key=lambda code: -self._stock.get((item_id, code), 0))
+
+    def _zones_for(self, item_id):
+        preferred = []
+        for code in self._consolidation_bins(item_id):
+            zone = self._zone_of(code)
+            if zone not in preferred:
+                preferred.append(zone)
+        others = sorted((z for z in self._empty if z not in preferred), key=lambda z: -len(self._empty[z]))
+        return preferred + others
+
+    def _empty_bin(self, zone, qty, claimed=()):
+        """Smallest empty bin in the zone that holds qty, else the largest one there is."""
+        bins = self._empty.get(zone, [])
+        idx = bisect.bisect_left(bins, (qty, ''))
+        for cap, code in bins[idx:]:
+            if code not in claimed:
+                return code
+        for cap, code in reversed(bins[:idx]):
+            if code not in claimed:
+                return code
+        return None
+
+    def suggest(self, sku, qty=1):
+        self._ensure_loaded()
+        item_id = self._item_id(sku)
+
+        with self._lock:
+            for code in self._consolidation_bins(item_id):
+                free = self._free(code)
+                if free >= qty:
+                    return {"suggested_location": code, "zone": self._zone_of(code), "free_capacity": free,
+                            "reason": "Consolidate with existing stock"}
+
+            for zone in self._zones_for(item_id):
+                code = self._empty_bin(zone, qty)
+                if code and self._capacity[code] >= qty:
+                    return {"suggested_location": code, "zone": zone, "free_capacity": self._capacity[code],
+                            "reason": f"Empty slot in Zone {zone}"}
+        return None
+
+    def plan(self, lines):
+        """
+        Plans putaway for a whole ASN: [(sku, qty), ...] -> per line [{"location", "qty", "reason"}] and
+        the quantity that did not fit. Space handed to earlier lines is taken into account; the index
+        itself is not changed until the stock is actually received.
+        """
+        self._ensure_loaded()
+        item_ids = [self._item_id(sku) for sku, _ in lines]
+        planned, claimed, new_bins = {}, set(), {}
+        plans = []
+
+        with self._lock:
+            for (sku, qty), item_id in zip(lines, item_ids):
+                remaining = qty
+                allocations = []
+
+                # 1. Top up bins that already hold the SKU (or got it earlier in this ASN)
+                for code in self._consolidation_bins(item_id) + new_bins.get(sku, []):
+                    free = self._free(code, planned)
+                    if remaining and free > 0:
+                        take = min(free, remaining)
+                        allocations.append({"location": code, "qty": take, "reason": "Consolidate with existing stock"})
+                        planned[code] = planned.get(code, 0) + take
+                        remaining -= take
+
+                # 2. Then empty bins, preferring the SKU's zones
+                for zone in self._zones_for(item_id):
+                    while remaining:
+                        code = self._empty_bin(zone, remaining, claimed)
+                        if code is None:
+                            break
+                        claimed.add(code)
+                        new_bins.setdefault(sku, []).append(code)
+                        take = min(self._capacity[code], remaining)
+                        allocations.append({"location": code, "qty": take, "reason": f"Empty slot in Zone {zone}"})
+                        planned[code] = planned.get(code, 0) + take
+                        remaining -= take
+                    if not remaining:
+                        break
+
+                plans.append((allocations, remaining))
+        return plans
+
+
+index = FreeSlotIndex()
+
+
+def track(rows):
+    """
+    Queues committed bin quantities for the index: rows of (item_id, location_code, quantity).
+    Applied on commit, so rolled-back writes never reach it.
+    """
+    if rows:
+        transaction.on_commit(partial(index.apply, list(rows)), robust=True)
@@ -0,0 +1,115 @@
+import functools
+import inspect
+import random
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+# SQLSTATEs worth retrying: serialization_failure, deadlock_detected
+RETRYABLE_SQLSTATES = {'40001', '40P01'}
+
+
+class StockConflict(Exception):
+    """Raised inside a retried service call when an optimistic version check loses a race."""
+
+
+class ContentionMetrics:
+    """Process-local counters of conflicts, retries and give-ups per service method, plus the hottest keys."""
+
+    def __init__(self, top_keys=20):
+        self.top_keys = top_keys
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._methods = {}
+            self._keys = Counter()
+
+    def _bump(self, method, field, key=None):
+        with self._lock:
+            stats = self._methods.setdefault(method, {"calls": 0, "conflicts": 0, "retries": 0, "give_ups": 0})
+            stats[field] += 1
+            if key is not None and field == "conflicts":
+                self._keys[key] += 1
+
+    def call(self, method):
+        self._bump(method, "calls")
+
+    def conflict(self, method, key=None):
+        self._bump(method, "conflicts", key)
+
+    def retry(self, method):
+        self._bump(method, "retries")
+
+    def give_up(self, method):
+        self._bump(method, "give_ups")
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "methods": {name: dict(stats) for name, stats in self._methods.items()},
+                "hot_keys": [{"key": key, "conflicts": n} for key, n in self._keys.most_common(self.top_keys)],
+            }
+
+
+metrics = ContentionMetrics()
+
+
+def _is_retryable_db_error(exc):
+    if not isinstance(exc, OperationalError):
+        return False
+    cause = exc.__cause__
+    sqlstate = getattr(cause, 'sqlstate', None) or getattr(cause, 'pgcode', None)
+    return sqlstate in RETRYABLE_SQLSTATES or 'database is locked' in str(exc)
+
+
+def _backoff(attempt, config):
+    # Full jitter: spreads competing scanners out instead of having them collide again in lockstep
+    cap = min(config.get('MAX_DELAY', 0.2), config.get('BASE_DELAY', 0.01) * (2 ** attempt))
+    time.sleep(random.uniform(0, cap))
+
+
+def retry_on_conflict(key=None):
+    """
+    Retries a service method on StockConflict, serialization failures, deadlocks and SQLite 'database is locked'.
+    Attempts and backoff come from WMS_RETRY. `key` is a format string over the call's arguments
+    (e.g. "{sku}@{location}") naming the contended row in the metrics.
+    DB errors are only retried at the outermost transaction; inside an outer atomic block they propagate.
+    """
+    def decorator(fn):
+        method = fn.__name__
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            config = getattr(settings, 'WMS_RETRY', {})
+            max_attempts = config.get('MAX_ATTEMPTS', 5)
+            label = key.format(**signature.bind(*args, **kwargs).arguments) if key else None
+            metrics.call(method)
+
+            attempt = 0
+            while True:
+                try:
+                    return fn(*args, **kwargs)
+                except StockConflict:
+                    reason = "Race Condition: Data changed. Retry."
+                except OperationalError as exc:
+                    if not _is_retryable_db_error(exc) or connection.in_atomic_block:
+                        raise
+                    reason = "Race Condition: Database busy. Retry."
+
+                metrics.conflict(method, label)
+                attempt += 1
+                if attempt >= max_attempts:
+                    metrics.give_up(method)
+                    return {"error": reason, "attempts": attempt}
+
+                metrics.retry(method)
+                _backoff(attempt, config)
+
+        return wrapper
+    return decorator
@@ -0,0 +1,198 @@
+import heapq
+import re
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+
+DEFAULT_LAYOUT = {
+    # Location codes look like A-01-2: aisle letters, bay number, optional level
+    'PATTERN': r'^(?P<aisle>[A-Z]{1,2})-(?P<bay>\d+)(?:-(?P<level>\d+))?$',
+    'AISLE_PITCH': 3.0,       # Metres between neighbouring aisle centre lines
+    'BAY_WIDTH': 1.0,         # Metres per bay along an aisle
+    'BAYS_PER_AISLE': 40,     # Cross aisles run along the front (bay 0) and back (bay N+1)
+    'LEVEL_COST': 0.5,        # Metre-equivalent per level climbed between stops
+    'DEPOT': 'A-00',          # Where every pick walk starts and ends
+    'NEIGHBOURS': 10,         # Candidate moves per stop tried by 2-opt
+    'TIME_BUDGET_MS': 50,     # 2-opt stops improving after this long
+    'CACHE_SIZE': 64,         # Distance matrices kept for repeated stop sets
+}
+
+
+def get_layout():
+    return {**DEFAULT_LAYOUT, **getattr(settings, 'WMS_PICK_LAYOUT', {})}
+
+
+@lru_cache(maxsize=100000)
+def _coordinates(code, pattern):
+    match = re.match(pattern, code or '')
+    if not match:
+        return None
+    aisle = 0
+    for char in match.group('aisle'):
+        aisle = aisle * 26 + (ord(char) - 64)
+    level = match.group('level')
+    return aisle - 1, int(match.group('bay')), int(level) if level else 1
+
+
+def coordinates(code, layout=None):
+    """(aisle index, bay, level) for a location code, or None when it doesn't follow the layout."""
+    return _coordinates(code, (layout or get_layout())['PATTERN'])
+
+
+def distance(p, q, layout):
+    """
+    Walking distance between two parsed locations in a parallel-aisle warehouse.
+    Same aisle: straight along it. Different aisles: out via the front or back cross aisle, whichever is shorter.
+    """
+    (a1, b1, l1), (a2, b2, l2) = p, q
+    bay = layout['BAY_WIDTH']
+    if a1 == a2:
+        walk = abs(b1 - b2) * bay
+    else:
+        depth = layout['BAYS_PER_AISLE'] + 1
+        walk = abs(a1 - a2) * layout['AISLE_PITCH'] + min(b1 + b2, 2 * depth - b1 - b2) * bay
+    return walk + abs(l1 - l2) * layout['LEVEL_COST']
+
+
+# --- DISTANCE MATRIX CACHE ---
+
+_matrices = OrderedDict()
+
+
+def distance_matrix(points, layout):
+    """
+    Row-per-point distance matrix plus each point's nearest neighbours (for 2-opt).
+    Cached by stop set, so re-planning the same wave skips the O(n^2) build.
+    """
+    key = (tuple(points), layout['AISLE_PITCH'], layout['BAY_WIDTH'], layout['BAYS_PER_AISLE'],
+           layout['LEVEL_COST'], layout['NEIGHBOURS'])
+    cached = _matrices.get(key)
+    if cached is not None:
+        _matrices.move_to_end(key)
+        return cached
+
+    pitch, bay, level_cost = layout['AISLE_PITCH'], layout['BAY_WIDTH'], layout['LEVEL_COST']
+    depth2 = 2 * (layout['BAYS_PER_AISLE'] + 1)
+    n = len(points)
+    matrix = [[0.0] * n for _ in range(n)]
+    # Inlined copy of distance() over the upper triangle: this loop is the hot part of the build
+    for i, (a1, b1, l1) in enumerate(points):
+        row = matrix[i]
+        for j in range(i + 1, n):
+            a2, b2, l2 = points[j]
+            if a1 == a2:
+                walk = abs(b1 - b2) * bay
+            else:
+                across = b1 + b2
+                walk = abs(a1 - a2) * pitch + (across if across < depth2 - across else depth2 - across) * bay
+            row[j] = matrix[j][i] = walk + abs(l1 - l2) * level_cost
+
+    k = min(layout['NEIGHBOURS'], n - 1)
+    others = range(n)
+    neighbours = [
+        [j for j in heapq.nsmallest(k + 1, others, key=row.__getitem__) if j != i][:k]
+        for i, row in enumerate(matrix)
+    ]
+
+    _matrices[key] = (matrix, neighbours)
+    while len(_matrices) > layout['CACHE_SIZE']:
+        _matrices.popitem(last=False)
+    return matrix, neighbours
+
+
+# --- TOUR CONSTRUCTION ---
+
+def _nearest_neighbour(dist, start=0):
+    n = len(dist)
+    unvisited = set(range(n))
+    unvisited.discard(start)
+    tour = [start]
+    current = start
+    while unvisited:
+        row = dist[current]
+        current = min(unvisited, key=row.__getitem__)
+        unvisited.discard(current)
+        tour.append(current)
+    return tour
+
+
+def _two_opt(tour, dist, neighbours, deadline):
+    """
+    2-opt on a closed tour, only trying to connect each stop to its nearest neighbours.
+    Keeps sweeping until a sweep finds no improving move or the deadline passes.
+    """
+    n = len(tour)
+    pos = [0] * n
+    for idx, node in enumerate(tour):
+        pos[node] = idx
+
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for a in range(n):
+            i = pos[a]
+            b = tour[(i + 1) % n]
+            dist_a = dist[a]
+            base = dist_a[b]
+            for c in neighbours[a]:
+                gain_limit = base - dist_a[c]
+                if gain_limit <= 0:
+                    # Neighbours are sorted; nothing further along can shorten a->b
+                    break
+                j = pos[c]
+                d = tour[(j + 1) % n]
+                if c == b or d == a:
+                    continue
+                if dist_a[c] + dist[b][d] < base + dist[c][d] - 1e-9:
+                    lo, hi = (i, j) if i < j else (j, i)
+                    # Reconnect a-c / b-d by reversing the stretch between the two edges
+                    segment = tour[lo + 1:hi + 1]
+                    segment.reverse()
+                    tour[lo + 1:hi + 1] = segment
+                    for offset, node in enumerate(segment, lo + 1):
+                        pos[node] = offset
+                    improved = True
+                    break
+    return tour
+
+
+def tour_length(order, dist):
+    return sum(dist[order[k]][order[k + 1]] for k in range(len(order) - 1))
+
+
+def sequence(codes, layout=None):
+    """
+    Orders location codes into a short pick walk starting and ending at the depot.
+    Returns (ordered codes, walk distance). Codes that don't fit the layout go last, alphabetically.
+    """
+    layout = layout or get_layout()
+    pattern = layout['PATTERN']
+    unique = sorted(set(codes))
+    routable = [code for code in unique if _coordinates(code, pattern)]
+    unroutable = [code for code in unique if not _coordinates(code, pattern)]
+    if not routable:
+        return unroutable, 0.0
+
+    depot = _coordinates(layout['DEPOT'], pattern) or (0, 0, 1)
+    points = [depot] + [_coordinates(code, pattern) for code in routable]
+    deadline = time.perf_counter() + layout['TIME_BUDGET_MS'] / 1000
+    dist, neighbours = distance_matrix(points, layout)
+
+    tour = _two_opt(_nearest_neighbour(dist), dist, neighbours, deadline)
+
+    # Rotate so the walk starts at the depot, then return to it
+    start = tour.index(0)
+    tour = tour[start:] + tour[:start] + [0]
+    ordered = [routable[node - 1] for node in tour[1:-1]]
+    return ordered + unroutable, tour_length(tour, dist)
+
+
+def walk_distance(codes, layout=None):
+    """Depot -> codes in the given order -> depot, skipping codes that don't fit the layout."""
+    layout = layout or get_layout()
+    pattern = layout['PATTERN']
+    depot = _coordinates(layout['DEPOT'], pattern) or (0, 0, 1)
+    points = [depot] + [p for p in (_coordinates(code, pattern) for code in codes) if p] + [depot]
+    return sum(distance(points[k], points[k + 1], layout) for k in range(len(points) - 1))
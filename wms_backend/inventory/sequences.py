@@ -0,0 +1,26 @@
+from django.db import transaction
+from django.db.models import F
+
+from .models import Sequence
+
+
+def reserve(name, count=1):
+    """
+    Atomically takes `count` consecutive values from a named sequence and returns them as a range.
+    The increment is one UPDATE, so concurrent callers queue on the row instead of probing for gaps.
+    """
+    with transaction.atomic():
+        if not Sequence.objects.filter(name=name).update(value=F('value') + count):
+            Sequence.objects.get_or_create(name=name)
+            Sequence.objects.filter(name=name).update(value=F('value') + count)
+        # Still holding the row lock from the UPDATE, so nobody else has moved it
+        last = Sequence.objects.values_list('value', flat=True).get(name=name)
+    return range(last - count + 1, last + 1)
+
+
+def next_po_numbers(count):
+    return [f"PO-{n:05d}" for n in reserve('purchase_order', count)]
+
+
+def next_cycle_count_reference():
+    return f"CC-{reserve('cycle_count')[0]:05d}"
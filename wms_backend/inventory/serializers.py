@@ -1,5 +1,7 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import RMA, CycleCountSession, CycleCountTask, Item, Inventory, RMALine, TransactionLog, Order, OrderLine, Supplier, PurchaseOrder
+from . import sequences
+from .models import RMA, CycleCountSession, CycleCountTask, Item, Inventory, Location, RMALine, TransactionLog, Order, OrderLine, Supplier, PurchaseOrder, PurchaseOrderLine, ReplenishmentRule
 
 class ItemSerializer(serializers.ModelSerializer):
     class Meta:
@@ -15,6 +17,11 @@ class InventorySerializer(serializers.ModelSerializer):
         model = Inventory
         fields = ['id', 'item_id', 'item_sku', 'item_name', 'item_attr', 'location_code', 'quantity', 'version', 'reserved_quantity', 'available_quantity']
 
+class LocationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Location
+        fields = ['id', 'code', 'zone', 'capacity']
+
 class TransactionLogSerializer(serializers.ModelSerializer):
     timestamp = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S")
     class Meta:
@@ -26,11 +33,66 @@ class SupplierSerializer(serializers.ModelSerializer):
         model = Supplier
         fields = '__all__'
 
+class ReplenishmentRuleSerializer(serializers.ModelSerializer):
+    item_sku = serializers.CharField(source='item.sku', read_only=True)
+    supplier_name = serializers.CharField(source='supplier.name', read_only=True, default=None)
+    class Meta:
+        model = ReplenishmentRule
+        fields = ['id', 'item', 'item_sku', 'min_qty', 'max_qty', 'supplier', 'supplier_name']
+
+    def validate(self, attrs):
+        min_qty = attrs.get('min_qty', getattr(self.instance, 'min_qty', 0))
+        max_qty = attrs.get('max_qty', getattr(self.instance, 'max_qty', 0))
+        if max_qty < min_qty:
+            raise serializers.ValidationError("max_qty must be at least min_qty")
+        return attrs
+
+class PurchaseOrderLineSerializer(serializers.ModelSerializer):
+    qty = serializers.IntegerField(source='qty_ordered', min_value=1)
+    received = serializers.IntegerField(source='qty_received', read_only=True)
+    class Meta:
+        model = PurchaseOrderLine
+        fields = ['id', 'sku', 'qty', 'received']
+
 class PurchaseOrderSerializer(serializers.ModelSerializer):
     supplier_name = serializers.CharField(source='supplier.name', read_only=True)
+    lines = PurchaseOrderLineSerializer(many=True, required=False)
     class Meta:
         model = PurchaseOrder
-        fields = ['id', 'po_number', 'supplier', 'supplier_name', 'status', 'created_at', 'lines']
+        fields = [
+            'id', 'po_number', 'supplier', 'supplier_name', 'status', 'created_at',
+            'total_ordered', 'total_received', 'open_qty', 'lines'
+        ]
+        read_only_fields = ['total_ordered', 'total_received']
+        extra_kwargs = {'po_number': {'required': False}}
+
+    @transaction.atomic
+    def create(self, validated_data):
+        lines_data = validated_data.pop('lines', [])
+        if not validated_data.get('po_number'):
+            validated_data['po_number'] = sequences.next_po_numbers(1)[0]
+        validated_data['total_ordered'] = sum(l['qty_ordered'] for l in lines_data)
+        po = PurchaseOrder.objects.create(**validated_data)
+        PurchaseOrderLine.objects.bulk_create([PurchaseOrderLine(po=po, **l) for l in lines_data])
+        return po
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        lines_data = validated_data.pop('lines', None)
+        if lines_data is not None:
+            # Replacing the lines starts receiving over, which would erase stock already booked in
+            if instance.lines.filter(qty_received__gt=0).exists():
+                raise serializers.ValidationError(
+                    {'lines': "Stock has already been received against this PO; its lines can't be replaced."}
+                )
+            instance.lines.all().delete()
+            PurchaseOrderLine.objects.bulk_create([PurchaseOrderLine(po=instance, **l) for l in lines_data])
+            instance.total_ordered = sum(l['qty_ordered'] for l in lines_data)
+            instance.total_received = 0
+            # Nothing received yet, so the PO can't be complete
+            if validated_data.get('status', instance.status) == 'RECEIVED':
+                validated_data['status'] = 'ORDERED'
+        return super().update(instance, validated_data)
 
 class OrderLineSerializer(serializers.ModelSerializer):
     item_sku = serializers.CharField(source='item.sku', read_only=True)
@@ -1,220 +1,453 @@
+import itertools
 import random
-from django.db import transaction
-from django.db.models import F
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Max, Q, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 # IMPORTANT: Added PurchaseOrder to imports
-from .models import RMA, CycleCountSession, CycleCountTask, Inventory, Item, TransactionLog, Order, OrderLine, RMALine, PurchaseOrder
+from . import catalog, changefeed, cyclecount, events, generations, putaway, routing, sequences, stats, stock, txlog
+from .retry import StockConflict, retry_on_conflict
+from .models import RMA, CycleCountSession, CycleCountTask, Inventory, TransactionLog, Order, OrderLine, RMALine, PurchaseOrder, PurchaseOrderLine, ScanKey, Sequence, Supplier
 
 class InventoryService:
     
     @staticmethod
+    @retry_on_conflict(key="{sku}@{location}")
     def receive_item(sku, location, quantity, attributes=None):
         with transaction.atomic():
-            try:
-                item = Item.objects.get(sku=sku)
-            except Item.DoesNotExist:
+            item = catalog.items.get(sku)
+            if item is None:
                 return {"error": "SKU not found in catalog"}
 
-            inventory, created = Inventory.objects.select_for_update().get_or_create(
-                item=item,
-                location_code=location,
-                defaults={'quantity': 0, 'version': 0}
-            )
-
-            inventory.quantity += quantity
-            inventory.version += 1
-            inventory.save()
+            row, _ = stock.add_stock(item.id, location, quantity)
 
-            TransactionLog.objects.create(
+            txlog.record(
                 action='RECEIVE',
                 sku_snapshot=sku,
                 location_snapshot=location,
                 quantity_change=quantity
             )
+            events.emit('receive', sku=sku, location=location, quantity=quantity, new_qty=row.quantity)
 
-            return {"success": True, "new_qty": inventory.quantity, "id": inventory.id}
+            return {"success": True, "new_qty": row.quantity, "id": row.id}
 
-    # --- FIXED PO RECEIVING LOGIC ---
     @staticmethod
+    @retry_on_conflict()
+    def receive_batch(lines):
+        """
+        Receives a whole ASN in one transaction.
+        Each line is {"sku", "location", "quantity"}; results come back per line, in order.
+        """
+        results = [None] * len(lines)
+        valid = []
+
+        # 1. Validate shape of every line up front
+        for idx, line in enumerate(lines):
+            if not isinstance(line, dict):
+                line = {}
+            sku = line.get('sku')
+            location = line.get('location')
+            try:
+                qty = int(line.get('quantity', 1))
+            except (TypeError, ValueError):
+                qty = 0
+
+            if not sku or not location:
+                results[idx] = {"line": idx, "error": "SKU and Location required"}
+            elif qty <= 0:
+                results[idx] = {"line": idx, "sku": sku, "error": "Quantity must be positive"}
+            else:
+                valid.append((idx, sku, location, qty))
+
+        with transaction.atomic():
+            # 2. Resolve every SKU from the catalog cache (one query for the misses)
+            items = catalog.items.get_many({sku for _, sku, _, _ in valid})
+
+            receipts = []
+            for idx, sku, location, qty in valid:
+                if sku not in items:
+                    results[idx] = {"line": idx, "sku": sku, "error": "SKU not found in catalog"}
+                else:
+                    receipts.append((idx, items[sku], location, qty))
+
+            if receipts:
+                pairs = {(item.id, location) for _, item, location, _ in receipts}
+
+                def lock(wanted):
+                    # Exactly the wanted (item, location) pairs, in chunks that keep the OR list small
+                    wanted = sorted(wanted)
+                    locked = {}
+                    for start in range(0, len(wanted), 200):
+                        match = Q()
+                        for item_id, loc in wanted[start:start + 200]:
+                            match |= Q(item_id=item_id, location_code=loc)
+                        for inv in Inventory.objects.select_for_update().filter(match).order_by('id'):
+                            locked[(inv.item_id, inv.location_code)] = inv
+                    return locked
+
+                # 3. Lock the bins that exist, create the rest, then lock those too. Placeholders go in at
+                #    version -1, so a bin a concurrent receipt created and committed first isn't counted as ours
+                bins = lock(pairs)
+                missing = pairs - bins.keys()
+                created = set()
+                if missing:
+                    Inventory.objects.bulk_create(
+                        [Inventory(item_id=item_id, location_code=loc, quantity=0, version=-1) for item_id, loc in missing],
+                        ignore_conflicts=True
+                    )
+                    bins.update(lock(missing))
+                    created = {key for key in missing if bins[key].version < 0}
+                    for key in created:
+                        bins[key].version = 0
+                before = {key: inv.quantity for key, inv in bins.items()}
+
+                # 4. Apply quantities in memory, one version bump per bin
+                logs = []
+                for idx, item, location, qty in receipts:
+                    inv = bins[(item.id, location)]
+                    inv.quantity += qty
+                    logs.append(TransactionLog(
+                        action='RECEIVE',
+                        sku_snapshot=item.sku,
+                        location_snapshot=location,
+                        quantity_change=qty
+                    ))
+                    results[idx] = {"line": idx, "sku": item.sku, "location": location,
+                                    "success": True, "new_qty": inv.quantity, "id": inv.id}
+                    events.emit('receive', sku=item.sku, location=location, quantity=qty, new_qty=inv.quantity)
+
+                for inv in bins.values():
+                    inv.version += 1
+
+                # 5. Write back set-wise
+                Inventory.objects.bulk_update(bins.values(), ['quantity', 'version'], batch_size=500)
+                stats.add(*[stats.bin_delta(before[key], inv.quantity, key in created) for key, inv in bins.items()])
+                putaway.track([(inv.item_id, inv.location_code, inv.quantity) for inv in bins.values()])
+                generations.touch('inventory')
+                changefeed.record(inventory=[inv.id for inv in bins.values()])
+                txlog.record_many(logs)
+
+        received = sum(1 for r in results if r.get("success"))
+        return {
+            "success": True,
+            "received": received,
+            "failed": len(results) - received,
+            "results": results
+        }
+
+    # --- PO RECEIVING ---
+    @staticmethod
+    @retry_on_conflict(key="po:{po_id}:{sku}")
     def receive_po_item(po_id, sku, location, qty):
         with transaction.atomic():
-            try:
-                # Use select_for_update to lock the PO row
-                po = PurchaseOrder.objects.select_for_update().get(id=po_id)
-            except PurchaseOrder.DoesNotExist:
-                return {"error": "PO not found"}
-
-            # 1. Find the line item
-            # We must clone the lines list to ensure Django detects the change
-            new_lines = list(po.lines) 
-            target_line_index = -1
-            
-            for idx, line in enumerate(new_lines):
-                if line['sku'] == sku:
-                    target_line_index = idx
-                    break
-            
-            if target_line_index == -1:
+            # 1. Find the line item (indexed on po + sku)
+            lines = list(
+                PurchaseOrderLine.objects.filter(po_id=po_id, sku=sku).order_by('id')
+                .values('id', 'qty_ordered', 'qty_received')
+            )
+            if not lines:
+                if not PurchaseOrder.objects.filter(id=po_id).exists():
+                    return {"error": "PO not found"}
                 return {"error": "Item not in this PO"}
 
-            target_line = new_lines[target_line_index]
+            # Same SKU can sit on several lines; fill them in order
+            target_line = next((l for l in lines if l['qty_received'] + qty <= l['qty_ordered']), None)
+            if target_line is None:
+                return {"error": f"Over-receiving! Ordered: {lines[0]['qty_ordered']}, Received: {lines[0]['qty_received']}"}
 
-            # 2. Update Receive Count
-            received_so_far = target_line.get('received', 0)
-            if received_so_far + qty > target_line['qty']:
-                return {"error": f"Over-receiving! Ordered: {target_line['qty']}, Received: {received_so_far}"}
+            # 2. Update Receive Count (only this line's row is locked, so other lines receive in parallel)
+            updated = PurchaseOrderLine.objects.filter(
+                id=target_line['id'], qty_received__lte=F('qty_ordered') - qty
+            ).update(qty_received=F('qty_received') + qty)
+            if not updated:
+                raise StockConflict()
 
             # 3. Increment Physical Inventory
             inv_res = InventoryService.receive_item(sku, location, qty)
             if "error" in inv_res:
+                transaction.set_rollback(True)
                 return inv_res
 
-            # 4. Update the Line Data
-            target_line['received'] = received_so_far + qty
-            new_lines[target_line_index] = target_line # Update list
-            po.lines = new_lines # Reassign to trigger dirty flag
+            # 4. Update PO totals and status last, so the PO row is only locked until commit.
+            # SET expressions see the old row, hence the "- qty" in the condition.
+            PurchaseOrder.objects.filter(id=po_id).update(
+                total_received=F('total_received') + qty,
+                status=Case(
+                    When(total_received__gte=F('total_ordered') - qty, then=Value('RECEIVED')),
+                    default=Value('ORDERED'),
+                ),
+            )
+            po_status = PurchaseOrder.objects.values_list('status', flat=True).get(id=po_id)
 
-            # 5. Update Status
-            total_ordered = sum(l['qty'] for l in new_lines)
-            total_received = sum(l.get('received', 0) for l in new_lines)
+            return {
+                "success": True,
+                "po_status": po_status,
+                "line_progress": f"{target_line['qty_received'] + qty}/{target_line['qty_ordered']}"
+            }
 
-            if total_received >= total_ordered:
-                po.status = 'RECEIVED'
-            elif total_received > 0:
-                po.status = 'ORDERED'
-            
-            # Force save specific fields
-            po.save(update_fields=['lines', 'status'])
+    @staticmethod
+    def auto_replenish():
+        """
+        Raises draft POs for every SKU whose stock position (on hand - reserved + still on order)
+        is below its min, ordering up to its max. Lines are grouped into one PO per supplier.
+        """
+        config = getattr(settings, 'WMS_REPLENISHMENT', {})
 
-            return {"success": True, "po_status": po.status, "line_progress": f"{target_line['received']}/{target_line['qty']}"}
+        with transaction.atomic():
+            # Serialize replenishment runs on the PO sequence row, so two runs can't both order the same shortfall
+            list(Sequence.objects.select_for_update().filter(name='purchase_order'))
 
-    @staticmethod
-    def pick_item(inventory_id, qty_to_pick):
-        try:
-            with transaction.atomic():
-                inv = Inventory.objects.get(id=inventory_id)
-                
-                if inv.quantity < qty_to_pick:
-                    return {"error": "Not enough stock"}
-
-                updated = Inventory.objects.filter(
-                    id=inventory_id,
-                    version=inv.version
-                ).update(
-                    quantity=inv.quantity - qty_to_pick,
-                    version=inv.version + 1
-                )
+            # 1. Stock position and rule per SKU, in one grouped query
+            positions = list(
+                Inventory.objects.values('item__sku').annotate(
+                    position=Sum('quantity') - Sum('reserved_quantity'),
+                    min_qty=Coalesce(Max('item__replenishment_rule__min_qty'), Value(config.get('DEFAULT_MIN', 10))),
+                    max_qty=Coalesce(Max('item__replenishment_rule__max_qty'), Value(config.get('DEFAULT_MAX', 50))),
+                    rule_supplier=Max('item__replenishment_rule__supplier_id'),
+                ).filter(position__lt=F('min_qty')).order_by('item__sku')
+            )
+            if not positions:
+                return {"success": True, "purchase_orders": []}
+
+            # 2. Quantity still open on earlier POs counts towards the position
+            on_order = dict(
+                PurchaseOrderLine.objects.filter(sku__in=[p['item__sku'] for p in positions])
+                .exclude(po__status='RECEIVED')
+                .values('sku').annotate(open=Sum(F('qty_ordered') - F('qty_received')))
+                .values_list('sku', 'open')
+            )
 
-                if updated == 0:
-                    return {"error": "Race Condition: Data changed. Retry."}
+            # 3. Group the shortfalls by supplier
+            default_supplier = None
+            by_supplier = {}
+            for p in positions:
+                position = p['position'] + (on_order.get(p['item__sku']) or 0)
+                if position >= p['min_qty']:
+                    continue
+                supplier_id = p['rule_supplier']
+                if supplier_id is None:
+                    if default_supplier is None:
+                        default_supplier, _ = Supplier.objects.get_or_create(
+                            name=config.get('DEFAULT_SUPPLIER', "Global Supplies Inc."),
+                            defaults={"contact_email": config.get('DEFAULT_SUPPLIER_EMAIL', "orders@globalsupplies.com")}
+                        )
+                    supplier_id = default_supplier.id
+                by_supplier.setdefault(supplier_id, []).append((p['item__sku'], p['max_qty'] - position))
 
-                TransactionLog.objects.create(
-                    action='PICK',
-                    sku_snapshot=inv.item.sku,
-                    location_snapshot=inv.location_code,
-                    quantity_change=-qty_to_pick
+            if not by_supplier:
+                return {"success": True, "purchase_orders": []}
+
+            # 4. Create POs and lines in bulk, numbered from the sequence
+            numbers = sequences.next_po_numbers(len(by_supplier))
+            pos = PurchaseOrder.objects.bulk_create([
+                PurchaseOrder(
+                    supplier_id=supplier_id, po_number=number, status='DRAFT',
+                    total_ordered=sum(qty for _, qty in lines)
                 )
-                
-                return {"success": True}
+                for number, (supplier_id, lines) in zip(numbers, by_supplier.items())
+            ])
+            PurchaseOrderLine.objects.bulk_create([
+                PurchaseOrderLine(po=po, sku=sku, qty_ordered=qty)
+                for po, lines in zip(pos, by_supplier.values())
+                for sku, qty in lines
+            ])
+
+            suppliers = Supplier.objects.in_bulk(list(by_supplier))
+            return {
+                "success": True,
+                "purchase_orders": [
+                    {
+                        "id": po.id,
+                        "po_number": po.po_number,
+                        "supplier": suppliers[po.supplier_id].name,
+                        "lines": len(lines),
+                        "total_ordered": po.total_ordered,
+                    }
+                    for po, lines in zip(pos, by_supplier.values())
+                ]
+            }
+
+    @staticmethod
+    @retry_on_conflict(key="inventory:{inventory_id}")
+    def pick_item(inventory_id, qty_to_pick):
+        with transaction.atomic():
+            # The stock check and the decrement are one statement, so there is nothing to race
+            row = stock.change_stock(id=inventory_id, delta=-qty_to_pick, min_quantity=qty_to_pick)
+            if row is None:
+                if stock.current_quantity(id=inventory_id) is None:
+                    return {"error": "Inventory record not found"}
+                return {"error": "Not enough stock"}
 
-        except Inventory.DoesNotExist:
-            return {"error": "Inventory record not found"}
+            sku = catalog.items.get_by_id(row.item_id).sku
+            txlog.record(
+                action='PICK',
+                sku_snapshot=sku,
+                location_snapshot=row.location_code,
+                quantity_change=-qty_to_pick
+            )
+            events.emit('pick', sku=sku, location=row.location_code, quantity=-qty_to_pick, new_qty=row.quantity)
+
+            return {"success": True}
         
     @staticmethod
     def allocate_order(order_id):
+        result = InventoryService.allocate_orders([order_id])
+        if "error" in result:
+            return result
+        if not result["orders"]:
+            return {"error": "Order not found"}
+
+        outcome = result["orders"][0]
+        if "error" in outcome:
+            return {"error": outcome["error"]}
+
+        return {"success": True, "status": outcome["status"], "lines": outcome["lines"]}
+
+    @staticmethod
+    @retry_on_conflict()
+    def allocate_orders(order_ids):
+        """
+        Allocates many orders in one pass.
+        Orders are served oldest first (created_at, id); bins are drained in id order.
+        Orders and candidate bins are each locked once, and everything is written back in bulk.
+        """
         with transaction.atomic():
-            order = Order.objects.select_for_update().get(id=order_id)
-            
-            if order.status != 'PENDING':
-                return {"error": f"Order is {order.status}, cannot allocate"}
+            # 1. Lock the orders once, in a stable order
+            orders = list(
+                Order.objects.select_for_update().filter(id__in=order_ids).order_by('created_at', 'id')
+            )
+            pending = [o for o in orders if o.status == 'PENDING']
 
-            for line in order.lines.all().select_related('item'):
-                qty_needed = line.qty_ordered - line.qty_allocated
-                
-                if qty_needed <= 0:
-                    continue
+            # 2. One query for every line of every pending order
+            lines_by_order = {o.id: [] for o in pending}
+            for line in OrderLine.objects.filter(order_id__in=lines_by_order.keys()).order_by('id'):
+                lines_by_order[line.order_id].append(line)
+            skus = catalog.items.skus({l.item_id for lines in lines_by_order.values() for l in lines})
 
-                candidates = Inventory.objects.filter(
-                    item=line.item,
-                    quantity__gt=F('reserved_quantity')
-                ).order_by('id')
+            # 3. Lock every candidate bin for the SKUs involved, once
+            needed_items = {
+                l.item_id for lines in lines_by_order.values() for l in lines
+                if l.qty_ordered > l.qty_allocated
+            }
+            bins_by_item = {}
+            for bin in Inventory.objects.select_for_update().filter(
+                item_id__in=needed_items,
+                quantity__gt=F('reserved_quantity')
+            ).order_by('id'):
+                bins_by_item.setdefault(bin.item_id, []).append(bin)
+
+            # 4. Allocate in memory
+            touched_bins = {}
+            touched_lines = []
+            allocated_ids = []
+            results = []
 
-                for bin in candidates:
+            for order in orders:
+                if order.status != 'PENDING':
+                    results.append({"order_id": order.id, "order_number": order.order_number,
+                                    "error": f"Order is {order.status}, cannot allocate"})
+                    continue
+
+                for line in lines_by_order[order.id]:
+                    qty_needed = line.qty_ordered - line.qty_allocated
                     if qty_needed <= 0:
-                        break
+                        continue
 
-                    available = bin.quantity - bin.reserved_quantity
-                    to_take = min(available, qty_needed)
+                    for bin in bins_by_item.get(line.item_id, []):
+                        if qty_needed <= 0:
+                            break
 
-                    bin.reserved_quantity += to_take
-                    bin.save()
+                        available = bin.quantity - bin.reserved_quantity
+                        if available <= 0:
+                            continue
 
-                    line.qty_allocated += to_take
-                    qty_needed -= to_take
-                
-                line.save()
+                        to_take = min(available, qty_needed)
+                        bin.reserved_quantity += to_take
+                        touched_bins[bin.id] = bin
+
+                        line.qty_allocated += to_take
+                        qty_needed -= to_take
+
+                    touched_lines.append(line)
+
+                if all(l.qty_ordered == l.qty_allocated for l in lines_by_order[order.id]):
+                    order.status = 'ALLOCATED'
+                    allocated_ids.append(order.id)
+
+                results.append({
+                    "order_id": order.id,
+                    "order_number": order.order_number,
+                    "success": True,
+                    "status": order.status,
+                    "lines": [
+                        {"sku": skus[l.item_id], "ordered": l.qty_ordered, "allocated": l.qty_allocated}
+                        for l in lines_by_order[order.id]
+                    ]
+                })
+
+            # 5. Write back set-wise
+            Inventory.objects.bulk_update(touched_bins.values(), ['reserved_quantity'], batch_size=500)
+            OrderLine.objects.bulk_update(touched_lines, ['qty_allocated'], batch_size=500)
+            if allocated_ids:
+                Order.objects.filter(id__in=allocated_ids).update(status='ALLOCATED')
+            generations.touch('inventory', 'order')
+            changefeed.record(inventory=touched_bins.keys(), order_line=[l.id for l in touched_lines], order=allocated_ids)
+            for result in results:
+                if result.get("success"):
+                    events.emit('allocate', order_id=result["order_id"], order_number=result["order_number"],
+                                status=result["status"], skus=[l["sku"] for l in result["lines"]])
 
-            is_fully_allocated = all(l.qty_ordered == l.qty_allocated for l in order.lines.all())
-            
-            if is_fully_allocated:
-                order.status = 'ALLOCATED'
-            else:
-                order.status = 'PENDING' 
-            
-            order.save()
-            
             return {
-                "success": True, 
-                "status": order.status,
-                "lines": [
-                    {"sku": l.item.sku, "ordered": l.qty_ordered, "allocated": l.qty_allocated}
-                    for l in order.lines.all()
-                ]
+                "success": True,
+                "allocated": len(allocated_ids),
+                "orders": results
             }
-        
+
     @staticmethod
+    @retry_on_conflict(key="{item_sku}@{location_code}")
     def pick_order_item(order_id, item_sku, location_code, qty=1):
         with transaction.atomic():
+            item = catalog.items.get(item_sku)
             try:
                 order = Order.objects.get(id=order_id)
-                item = Item.objects.get(sku=item_sku)
-            except (Order.DoesNotExist, Item.DoesNotExist):
+            except Order.DoesNotExist:
+                item = None
+            if item is None:
                 return {"error": "Invalid Order or SKU"}
 
-            line = order.lines.filter(item=item).first()
+            line = order.lines.filter(item_id=item.id).first()
             if not line:
                 return {"error": "Item not in this order"}
-            
-            if line.qty_picked + qty > line.qty_allocated:
-                return {"error": "Cannot pick more than allocated"}
-
-            try:
-                inv = Inventory.objects.select_for_update().get(
-                    item=item, location_code=location_code
-                )
-            except Inventory.DoesNotExist:
-                return {"error": "Bin not found"}
-
-            if inv.quantity < qty:
-                return {"error": "Not enough physical stock"}
 
-            inv.quantity -= qty
-            inv.reserved_quantity -= qty 
-            inv.save()
+            # Guarded increment: two scanners on the same line can't overshoot the allocation
+            picked = OrderLine.objects.filter(
+                id=line.id, qty_picked__lte=F('qty_allocated') - qty
+            ).update(qty_picked=F('qty_picked') + qty)
+            if not picked:
+                return {"error": "Cannot pick more than allocated"}
+            generations.touch('order')
+            changefeed.record(order_line=[line.id])
 
-            line.qty_picked += qty
-            line.save()
+            row = stock.change_stock(item_id=item.id, location=location_code, delta=-qty, release=qty, min_quantity=qty)
+            if row is None:
+                bin_exists = stock.current_quantity(item_id=item.id, location_code=location_code) is not None
+                # Undo the line increment along with the rest of this attempt
+                transaction.set_rollback(True)
+                return {"error": "Not enough physical stock" if bin_exists else "Bin not found"}
 
-            all_picked = all(l.qty_picked >= l.qty_ordered for l in order.lines.all())
-            if all_picked:
+            if not order.lines.filter(qty_picked__lt=F('qty_ordered')).exists():
                 order.status = 'PICKED'
-                order.save()
+                order.save(update_fields=['status'])
             
-            TransactionLog.objects.create(
+            txlog.record(
                 action='PICK',
                 sku_snapshot=item.sku,
                 location_snapshot=location_code,
                 quantity_change=-qty
             )
+            events.emit('pick', sku=item.sku, location=location_code, quantity=-qty, new_qty=row.quantity,
+                        order_id=order.id, status=order.status)
 
             return {"success": True, "status": order.status}
 
@@ -232,13 +465,19 @@ class InventoryService:
             order.status = 'PACKED'
             order.save()
 
-            for line in order.lines.all():
-                TransactionLog.objects.create(
+            item_ids = list(order.lines.values_list('item_id', flat=True))
+            skus = catalog.items.skus(item_ids)
+            txlog.record_many([
+                TransactionLog(
                     action='PACK',
-                    sku_snapshot=line.item.sku,
+                    sku_snapshot=skus[item_id],
                     location_snapshot='PACKING_BENCH',
-                    quantity_change=0 
+                    quantity_change=0
                 )
+                for item_id in item_ids
+            ])
+            events.emit('pack', order_id=order.id, order_number=order.order_number, status='PACKED',
+                        skus=list(dict.fromkeys(skus[item_id] for item_id in item_ids)))
 
             return {"success": True, "status": "PACKED"}
 
@@ -256,17 +495,24 @@ class InventoryService:
             order.status = 'SHIPPED'
             order.save()
             
-            for line in order.lines.all():
-                TransactionLog.objects.create(
+            item_ids = list(order.lines.values_list('item_id', flat=True))
+            skus = catalog.items.skus(item_ids)
+            txlog.record_many([
+                TransactionLog(
                     action='SHIP',
-                    sku_snapshot=line.item.sku,
+                    sku_snapshot=skus[item_id],
                     location_snapshot='OUTBOUND_DOCK',
                     quantity_change=0
                 )
+                for item_id in item_ids
+            ])
+            events.emit('ship', order_id=order.id, order_number=order.order_number, status='SHIPPED',
+                        skus=list(dict.fromkeys(skus[item_id] for item_id in item_ids)))
             
             return {"success": True, "status": "SHIPPED"}
         
     @staticmethod
+    @retry_on_conflict(key="rma:{rma_id}")
     def process_return_receipt(rma_id, location_code='RETURNS-DOCK'):
         with transaction.atomic():
             try:
@@ -277,26 +523,22 @@ class InventoryService:
             if rma.status == 'RECEIVED':
                 return {"error": "RMA already processed"}
 
-            for line in rma.lines.all():
-                inventory, _ = Inventory.objects.select_for_update().get_or_create(
-                    item=line.item,
-                    location_code=location_code,
-                    defaults={'quantity': 0, 'version': 0}
-                )
-                
-                inventory.quantity += line.qty_to_return
-                inventory.version += 1
-                inventory.save()
+            rma_lines = list(rma.lines.all())
+            skus = catalog.items.skus({line.item_id for line in rma_lines})
+            for line in rma_lines:
+                row, _ = stock.add_stock(line.item_id, location_code, line.qty_to_return)
 
                 line.qty_received = line.qty_to_return
                 line.save()
 
-                TransactionLog.objects.create(
+                txlog.record(
                     action='RECEIVE',
-                    sku_snapshot=line.item.sku,
+                    sku_snapshot=skus[line.item_id],
                     location_snapshot=location_code,
                     quantity_change=line.qty_to_return
                 )
+                events.emit('receive', sku=skus[line.item_id], location=location_code,
+                            quantity=line.qty_to_return, new_qty=row.quantity, rma_id=rma.id)
 
             rma.status = 'RECEIVED'
             rma.save()
@@ -304,64 +546,70 @@ class InventoryService:
             return {"success": True, "status": "RECEIVED"}
         
     @staticmethod
-    def create_cycle_count(aisle_prefix=None, limit=10):
+    def create_cycle_count(aisle_prefix=None, limit=10, stratify=True):
         with transaction.atomic():
-            queryset = Inventory.objects.filter(quantity__gt=0)
-            if aisle_prefix:
-                queryset = queryset.filter(location_code__startswith=aisle_prefix)
-            
-            all_ids = list(queryset.values_list('id', flat=True))
-            if not all_ids:
+            # Bin selection (due-first, ABC stratified) lives in cyclecount.plan
+            bins = cyclecount.plan(aisle_prefix, limit, stratify)
+            if not bins:
                 return {"error": "No inventory found to count"}
-            
-            selected_ids = random.sample(all_ids, min(len(all_ids), limit))
-            
-            ref = f"CC-{random.randint(10000,99999)}"
+
+            ref = sequences.next_cycle_count_reference()
             session = CycleCountSession.objects.create(reference=ref)
-            
-            tasks = []
-            for inv_id in selected_ids:
-                inv = Inventory.objects.get(id=inv_id)
-                tasks.append(CycleCountTask(
-                    session=session,
-                    inventory=inv,
-                    expected_qty=inv.quantity
-                ))
-            
-            CycleCountTask.objects.bulk_create(tasks)
-            return {"success": True, "session_id": session.id, "reference": ref}
+
+            tasks = CycleCountTask.objects.bulk_create([
+                CycleCountTask(session=session, inventory_id=b['id'], expected_qty=b['quantity'])
+                for b in bins
+            ])
+            if tasks[0].id is None:
+                # Backend can't return ids from a bulk INSERT
+                tasks = session.tasks.all()
+            changefeed.record(cycle_count_task=[t.id for t in tasks])
+
+            classes = {}
+            for b in bins:
+                classes[b['abc_class']] = classes.get(b['abc_class'], 0) + 1
+            return {"success": True, "session_id": session.id, "reference": ref, "tasks": len(bins), "classes": classes}
 
     @staticmethod
+    @retry_on_conflict(key="count-task:{task_id}")
     def submit_count(task_id, counted_qty):
         with transaction.atomic():
             try:
-                task = CycleCountTask.objects.select_for_update().get(id=task_id)
+                task = CycleCountTask.objects.select_related('inventory', 'session').get(id=task_id)
             except CycleCountTask.DoesNotExist:
                 return {"error": "Task not found"}
             
             if task.status == 'COUNTED':
                 return {"error": "Task already completed"}
 
-            inventory = Inventory.objects.select_for_update().get(id=task.inventory.id)
-            
+            inventory = task.inventory
             current_system_qty = inventory.quantity
             variance = counted_qty - current_system_qty
-            
-            task.counted_qty = counted_qty
-            task.variance = variance
-            task.status = 'COUNTED'
-            task.save()
+
+            # PENDING -> COUNTED in one statement; a concurrent submit of the same task gets 0 rows
+            claimed = CycleCountTask.objects.filter(id=task.id, status='PENDING').update(
+                counted_qty=counted_qty, variance=variance, status='COUNTED'
+            )
+            if not claimed:
+                return {"error": "Task already completed"}
+            changefeed.record(cycle_count_task=[task.id])
+            Inventory.objects.filter(id=inventory.id).update(last_counted_at=timezone.now())
             
             if variance != 0:
-                inventory.quantity = counted_qty
-                inventory.save()
+                # Only overwrite the quantity we based the variance on; if a pick landed in between, recount
+                row = stock.change_stock(id=inventory.id, set_quantity=counted_qty, expected_quantity=current_system_qty)
+                if row is None:
+                    raise StockConflict()
                 
-                TransactionLog.objects.create(
+                sku = catalog.items.get_by_id(inventory.item_id).sku
+                txlog.record(
                     action='ADJUST',
-                    sku_snapshot=inventory.item.sku,
+                    sku_snapshot=sku,
                     location_snapshot=inventory.location_code,
                     quantity_change=variance 
                 )
+                events.emit('adjust', sku=sku, location=inventory.location_code, quantity=variance,
+                            new_qty=row.quantity)
             
             session = task.session
             if not session.tasks.filter(status='PENDING').exists():
@@ -375,107 +623,605 @@ class InventoryService:
             }
         
     @staticmethod
-    def suggest_putaway_location(sku):
-        existing_locs = Inventory.objects.filter(item__sku=sku, quantity__gt=0)\
-                                         .order_by('-quantity')
-        
-        if existing_locs.exists():
-            best_loc = existing_locs.first().location_code
-            return {"suggested_location": best_loc, "reason": "Consolidate with existing stock"}
+    @retry_on_conflict(key="count-session:{session_id}")
+    def submit_counts(session_id, counts):
+        """
+        Applies a scanner's whole upload for one session: [{"task_id", "qty"}, ...].
+        Same outcome per task as submit_count, but tasks and bins are locked, updated and logged set-wise,
+        and session completion is checked once at the end.
+        """
+        results = [None] * len(counts)
+        valid = []
+
+        # 1. Validate shape of every count up front
+        for idx, entry in enumerate(counts):
+            if not isinstance(entry, dict):
+                entry = {}
+            try:
+                task_id = int(entry.get('task_id'))
+                qty = int(entry.get('qty'))
+            except (TypeError, ValueError):
+                results[idx] = {"line": idx, "error": "task_id and qty required"}
+                continue
+            if qty < 0:
+                results[idx] = {"line": idx, "task_id": task_id, "error": "Quantity cannot be negative"}
+            else:
+                valid.append((idx, task_id, qty))
 
+        with transaction.atomic():
+            try:
+                session = CycleCountSession.objects.get(id=session_id)
+            except CycleCountSession.DoesNotExist:
+                return {"error": "Session not found"}
+
+            # 2. Lock the tasks, then their bins, both in id order (same order as submit_count)
+            tasks = {
+                task.id: task for task in CycleCountTask.objects.select_for_update().filter(
+                    session=session, id__in={task_id for _, task_id, _ in valid}
+                ).order_by('id')
+            }
+            bins = {
+                inv.id: inv for inv in Inventory.objects.select_for_update(of=('self',)).filter(
+                    id__in={task.inventory_id for task in tasks.values()}
+                ).order_by('id')
+            }
+            skus = catalog.items.skus({inv.item_id for inv in bins.values()})
+            before = {inv_id: inv.quantity for inv_id, inv in bins.items()}
+
+            # 3. Variances in one pass
+            now = timezone.now()
+            counted_tasks, logs, seen = [], [], set()
+            for idx, task_id, qty in valid:
+                task = tasks.get(task_id)
+                if task is None:
+                    results[idx] = {"line": idx, "task_id": task_id, "error": "Task not found"}
+                    continue
+                if task.status == 'COUNTED' or task_id in seen:
+                    results[idx] = {"line": idx, "task_id": task_id, "error": "Task already completed"}
+                    continue
+                seen.add(task_id)
+
+                inv = bins[task.inventory_id]
+                variance = qty - inv.quantity
+                task.counted_qty = qty
+                task.variance = variance
+                task.status = 'COUNTED'
+                counted_tasks.append(task)
+                inv.last_counted_at = now
+
+                if variance != 0:
+                    inv.quantity = qty
+                    logs.append(TransactionLog(
+                        action='ADJUST',
+                        sku_snapshot=skus[inv.item_id],
+                        location_snapshot=inv.location_code,
+                        quantity_change=variance
+                    ))
+                    events.emit('adjust', sku=skus[inv.item_id], location=inv.location_code, quantity=variance,
+                                new_qty=qty)
+
+                results[idx] = {
+                    "line": idx, "task_id": task_id, "success": True, "variance": variance,
+                    "message": "Match" if variance == 0 else f"Variance of {variance} recorded."
+                }
+
+            # 4. Write back set-wise
+            changed = [inv for inv_id, inv in bins.items() if inv.quantity != before[inv_id]]
+            for inv in changed:
+                inv.version += 1
+            CycleCountTask.objects.bulk_update(counted_tasks, ['counted_qty', 'variance', 'status'], batch_size=500)
+            Inventory.objects.bulk_update(
+                [inv for inv in bins.values() if inv.last_counted_at == now],
+                ['quantity', 'version', 'last_counted_at'], batch_size=500
+            )
+            stats.add(*[stats.bin_delta(before[inv.id], inv.quantity) for inv in changed])
+            putaway.track([(inv.item_id, inv.location_code, inv.quantity) for inv in changed])
+            generations.touch('inventory')
+            changefeed.record(cycle_count_task=[t.id for t in counted_tasks], inventory=[inv.id for inv in changed])
+            txlog.record_many(logs)
+
+            # 5. Session completion, once
+            if counted_tasks and not session.tasks.filter(status='PENDING').exists():
+                session.status = 'COMPLETED'
+                session.save(update_fields=['status'])
+
+        counted = len(counted_tasks)
+        return {
+            "success": True,
+            "counted": counted,
+            "failed": len(results) - counted,
+            "session_status": session.status,
+            "results": results
+        }
+
+    @staticmethod
+    def suggest_putaway_location(sku, qty=1):
+        # Answered from the in-process free-slot index, no query once it is warm
+        suggestion = putaway.index.suggest(sku, qty)
+        if suggestion:
+            return suggestion
+
+        # No bin master data with room: fall back to the old zone spread
         aisle_char = chr(65 + (sum(ord(c) for c in sku) % 5)) 
-        return {"suggested_location": f"ZONE-{aisle_char}-01", "reason": f"Empty slot in Zone {aisle_char}"}
+        return {"suggested_location": f"ZONE-{aisle_char}-01", "reason": f"No free capacity known; default Zone {aisle_char}"}
+
+    @staticmethod
+    def plan_putaway(lines):
+        """
+        Plans putaway for a whole inbound ASN: [{"sku", "quantity"}, ...].
+        Lines are split across bins by free capacity; receipt_lines can be posted straight to receive/batch.
+        """
+        results = [None] * len(lines)
+        valid = []
+
+        for idx, line in enumerate(lines):
+            if not isinstance(line, dict):
+                line = {}
+            sku = line.get('sku')
+            try:
+                qty = int(line.get('quantity', 1))
+            except (TypeError, ValueError):
+                qty = 0
+
+            if not sku:
+                results[idx] = {"line": idx, "error": "SKU required"}
+            elif qty <= 0:
+                results[idx] = {"line": idx, "sku": sku, "error": "Quantity must be positive"}
+            else:
+                valid.append((idx, sku, qty))
+
+        plans = putaway.index.plan([(sku, qty) for _, sku, qty in valid])
+        receipt_lines = []
+        for (idx, sku, qty), (allocations, unplaced) in zip(valid, plans):
+            results[idx] = {"line": idx, "sku": sku, "quantity": qty, "allocations": allocations, "unplaced": unplaced}
+            receipt_lines += [{"sku": sku, "location": a["location"], "quantity": a["qty"]} for a in allocations]
+
+        return {
+            "success": True,
+            "planned": sum(1 for r in results if "allocations" in r and not r["unplaced"]),
+            "results": results,
+            "receipt_lines": receipt_lines
+        }
+
+    @staticmethod
+    def _pick_location_index(item_ids):
+        """
+        Builds the SKU -> pick bins index for a wave in one query.
+        Bins are kept in allocation order (id), so reserved stock is found where allocate_orders put it.
+        """
+        index = {}
+        for bin in Inventory.objects.filter(item_id__in=item_ids, quantity__gt=0).order_by('id'):
+            index.setdefault(bin.item_id, []).append(bin)
+        return index
+
+    @staticmethod
+    def _split_across_bins(bins, qty):
+        taken = {}
+        remaining = qty
+
+        # 1. Reserved stock first: that is where allocation promised it
+        for bin in bins:
+            take = min(bin.reserved_quantity, bin.quantity, remaining)
+            if take > 0:
+                taken[bin.location_code] = take
+                remaining -= take
+
+        # 2. Top up from free stock if reservations don't cover the wave
+        for bin in bins:
+            if remaining <= 0:
+                break
+            take = min(bin.available_quantity, remaining)
+            if take > 0:
+                taken[bin.location_code] = taken.get(bin.location_code, 0) + take
+                remaining -= take
+
+        return [{"location": loc, "qty": q} for loc, q in taken.items()], remaining
 
     @staticmethod
     def generate_wave_plan(order_ids):
-        orders = Order.objects.filter(id__in=order_ids, status='ALLOCATED')
-        if not orders.exists():
+        orders = list(Order.objects.filter(id__in=order_ids, status='ALLOCATED').order_by('id'))
+        if not orders:
             return {"error": "No ALLOCATED orders found for these IDs"}
 
+        order_numbers = {o.id: o.order_number for o in orders}
+        lines = list(
+            OrderLine.objects.filter(order_id__in=order_numbers.keys()).order_by('order_id', 'id')
+        )
+        index = InventoryService._pick_location_index({l.item_id for l in lines})
+        skus = catalog.items.skus({l.item_id for l in lines})
+
         pick_summary = {}
-        
-        for order in orders:
-            for line in order.lines.all():
-                sku = line.item.sku
-                if sku not in pick_summary:
-                    pick_summary[sku] = {
-                        "sku": sku, 
-                        "total_qty": 0, 
-                        "orders": [],
-                        "order_ids": [],
-                        "location": "Unknown" 
-                    }
-                
-                pick_summary[sku]["total_qty"] += line.qty_allocated
-                pick_summary[sku]["orders"].append(order.order_number)
-                pick_summary[sku]["order_ids"].append(order.id)
-                
-                first_inv = Inventory.objects.filter(item__sku=sku, quantity__gt=0).first()
-                if first_inv:
-                    pick_summary[sku]["location"] = first_inv.location_code
 
-        sorted_pick_list = sorted(list(pick_summary.values()), key=lambda x: x['location'])
+        for line in lines:
+            sku = skus[line.item_id]
+            if sku not in pick_summary:
+                pick_summary[sku] = {
+                    "sku": sku,
+                    "item_id": line.item_id,
+                    "total_qty": 0,
+                    "orders": [],
+                    "order_ids": [],
+                    "location": "Unknown",
+                    "bins": []
+                }
+
+            pick_summary[sku]["total_qty"] += line.qty_allocated
+            pick_summary[sku]["orders"].append(order_numbers[line.order_id])
+            pick_summary[sku]["order_ids"].append(line.order_id)
+
+        for entry in pick_summary.values():
+            bins, short = InventoryService._split_across_bins(index.get(entry.pop("item_id"), []), entry["total_qty"])
+            entry["bins"] = bins
+            if bins:
+                entry["location"] = bins[0]["location"]
+            if short > 0:
+                entry["short_qty"] = short
+
+        # Walk order from the warehouse layout instead of sorting location strings
+        route, route_distance = routing.sequence(
+            [b["location"] for entry in pick_summary.values() for b in entry["bins"]]
+        )
+        stop_of = {location: stop for stop, location in enumerate(route, 1)}
+        for entry in pick_summary.values():
+            entry["bins"].sort(key=lambda b: stop_of[b["location"]])
+            if entry["bins"]:
+                entry["location"] = entry["bins"][0]["location"]
+        sorted_pick_list = sorted(
+            pick_summary.values(), key=lambda x: stop_of.get(x['location'], len(route) + 1)
+        )
 
         return {
             "success": True,
             "wave_id": f"WAVE-{random.randint(1000,9999)}",
             "pick_list": sorted_pick_list,
-            "order_count": orders.count()
+            "route": route,
+            "route_distance": round(route_distance, 1),
+            "order_count": len(orders)
+        }
+
+    @staticmethod
+    def complete_wave(order_ids, chunk_size=None):
+        """
+        Confirms every outstanding allocated line of the wave as picked.
+        Bins come from the same pick index as generate_wave_plan; the actual writes go through execute_wave_picks.
+        """
+        order_ids = [int(oid) for oid in order_ids]
+        orders = {o.id: o.order_number for o in Order.objects.filter(id__in=order_ids)}
+        lines = list(
+            OrderLine.objects.filter(order_id__in=orders.keys()).order_by('order_id', 'id')
+        )
+        index = InventoryService._pick_location_index({l.item_id for l in lines})
+        skus = catalog.items.skus({l.item_id for l in lines})
+
+        # Split each SKU's wave total across bins once, then hand the bins out to lines in order
+        outstanding = {}
+        for line in lines:
+            if line.qty_allocated > line.qty_picked:
+                outstanding.setdefault(line.item_id, []).append(line)
+
+        picks = []
+        for item_id, item_lines in outstanding.items():
+            total = sum(l.qty_allocated - l.qty_picked for l in item_lines)
+            bins, _ = InventoryService._split_across_bins(index.get(item_id, []), total)
+            for line in item_lines:
+                needed = line.qty_allocated - line.qty_picked
+                while needed > 0 and bins:
+                    take = min(needed, bins[0]["qty"])
+                    picks.append({"order_id": line.order_id, "sku": skus[line.item_id],
+                                  "location": bins[0]["location"], "qty": take})
+                    needed -= take
+                    bins[0]["qty"] -= take
+                    if bins[0]["qty"] == 0:
+                        bins.pop(0)
+
+        result = InventoryService.execute_wave_picks(picks, chunk_size)
+
+        errors = {}
+        for r in result["picks"]:
+            if "error" in r:
+                errors.setdefault(r["order_id"], r["error"])
+
+        results = []
+        for oid in order_ids:
+            if oid not in orders:
+                results.append(f"Error picking {oid}: Order not found")
+            elif oid in errors:
+                results.append(f"Error picking {orders[oid]}: {errors[oid]}")
+            else:
+                results.append(f"Picked {orders[oid]}")
+
+        return {"success": True, "results": results, "picked": result["picked"], "picks": result["picks"]}
+
+    @staticmethod
+    def execute_wave_picks(picks, chunk_size=None):
+        """
+        Applies a batch of pick confirmations ({"order_id", "sku", "location", "qty"}).
+        Each chunk is its own transaction, so a huge wave never holds floor locks for its whole run.
+        """
+        chunk_size = int(chunk_size or getattr(settings, 'WMS_WAVE_PICK_CHUNK_SIZE', 200))
+        results = []
+
+        for start in range(0, len(picks), chunk_size):
+            chunk = picks[start:start + chunk_size]
+            outcome = InventoryService._apply_pick_chunk(chunk, start)
+            if isinstance(outcome, dict):
+                # Still conflicting after retries: nothing in this chunk was applied
+                outcome = [{"pick": start + n, "order_id": p.get("order_id"), "sku": p.get("sku"),
+                            "location": p.get("location"), "error": outcome["error"]}
+                           for n, p in enumerate(chunk)]
+            results.extend(outcome)
+
+        return {
+            "success": True,
+            "picked": sum(1 for r in results if r.get("success")),
+            "picks": results
         }
 
     @staticmethod
-    def complete_wave(order_ids):
+    @retry_on_conflict()
+    def _apply_pick_chunk(picks, offset=0):
         with transaction.atomic():
+            order_ids = {p.get("order_id") for p in picks}
+
+            # 1. Lock every line of the touched orders in id order (lines before bins, as in
+            #    pick_order_item), so qty_picked can't move under the allocation check and the
+            #    write-back below. All lines, so status can be decided without re-querying.
+            lines = {}
+            lines_by_order = {}
+            order_lines = list(OrderLine.objects.select_for_update().filter(order_id__in=order_ids).order_by('id'))
+            skus = catalog.items.skus({line.item_id for line in order_lines})
+            for line in order_lines:
+                # An order may carry the same SKU on several lines
+                lines.setdefault((line.order_id, skus[line.item_id]), []).append(line)
+                lines_by_order.setdefault(line.order_id, []).append(line)
+
+            # 2. Lock the affected bins once, in id order
+            item_ids = {line.item_id for line in order_lines}
+            locations = {p.get("location") for p in picks}
+            bins = {
+                (inv.item_id, inv.location_code): inv
+                for inv in Inventory.objects.select_for_update().filter(
+                    item_id__in=item_ids, location_code__in=locations
+                ).order_by('id')
+            }
+
+            # 3. Apply in memory, same checks as pick_order_item
             results = []
-            for oid in order_ids:
+            logs = []
+            touched_bins = {}
+            touched_lines = {}
+            before = {}
+
+            for n, pick in enumerate(picks):
                 try:
-                    order = Order.objects.get(id=oid)
-                    for line in order.lines.all():
-                        inv = Inventory.objects.filter(item=line.item, quantity__gt=0).first()
-                        if inv:
-                            InventoryService.pick_order_item(oid, line.item.sku, inv.location_code, line.qty_allocated)
-                    
-                    results.append(f"Picked {order.order_number}")
-                except Exception as e:
-                    results.append(f"Error picking {oid}: {str(e)}")
-            
-            return {"success": True, "results": results}
-        
+                    qty = int(pick.get("qty", 1))
+                except (TypeError, ValueError):
+                    qty = 0
+                outcome = {"pick": offset + n, "order_id": pick.get("order_id"),
+                           "sku": pick.get("sku"), "location": pick.get("location"), "qty": qty}
+                sku_lines = lines.get((pick.get("order_id"), pick.get("sku")), [])
+                line = sku_lines[0] if sku_lines else None
+                inv = bins.get((line.item_id, pick.get("location"))) if line else None
+
+                if qty <= 0:
+                    outcome["error"] = "Quantity must be positive"
+                elif not line:
+                    outcome["error"] = "Item not in this order"
+                elif sum(l.qty_allocated - l.qty_picked for l in sku_lines) < qty:
+                    outcome["error"] = "Cannot pick more than allocated"
+                elif not inv:
+                    outcome["error"] = "Bin not found"
+                elif inv.quantity < qty:
+                    outcome["error"] = "Not enough physical stock"
+                else:
+                    before.setdefault(inv.id, inv.quantity)
+                    inv.quantity -= qty
+                    inv.reserved_quantity -= min(qty, inv.reserved_quantity)
+                    inv.version += 1
+                    touched_bins[inv.id] = inv
+
+                    # Fill the SKU's lines in id order
+                    left = qty
+                    for l in sku_lines:
+                        take = min(left, l.qty_allocated - l.qty_picked)
+                        if take > 0:
+                            l.qty_picked += take
+                            touched_lines[l.id] = l
+                            left -= take
+
+                    logs.append(TransactionLog(
+                        action='PICK',
+                        sku_snapshot=skus[line.item_id],
+                        location_snapshot=inv.location_code,
+                        quantity_change=-qty
+                    ))
+                    events.emit('pick', sku=skus[line.item_id], location=inv.location_code, quantity=-qty,
+                                new_qty=inv.quantity, order_id=line.order_id)
+                    outcome["success"] = True
+
+                results.append(outcome)
+
+            # 4. Write back: bins, lines, order statuses and logs in one statement each
+            Inventory.objects.bulk_update(touched_bins.values(), ['quantity', 'reserved_quantity', 'version'], batch_size=500)
+            stats.add(*[stats.bin_delta(before[inv.id], inv.quantity) for inv in touched_bins.values()])
+            putaway.track([(inv.item_id, inv.location_code, inv.quantity) for inv in touched_bins.values()])
+            OrderLine.objects.bulk_update(touched_lines.values(), ['qty_picked'], batch_size=500)
+
+            picked_orders = [
+                oid for oid in {l.order_id for l in touched_lines.values()}
+                if all(l.qty_picked >= l.qty_ordered for l in lines_by_order[oid])
+            ]
+            if picked_orders:
+                Order.objects.filter(id__in=picked_orders).update(status='PICKED')
+            generations.touch('inventory', 'order')
+            changefeed.record(inventory=touched_bins.keys(), order_line=touched_lines.keys(), order=picked_orders)
+
+            txlog.record_many(logs)
+
+            return results
+
     @staticmethod
+    @retry_on_conflict(key="{sku}@{source_loc}")
     def move_item(sku, source_loc, dest_loc, qty):
         with transaction.atomic():
-            # 1. Lock & Validate Source
-            try:
-                source_inv = Inventory.objects.select_for_update().get(
-                    item__sku=sku, location_code=source_loc
-                )
-            except Inventory.DoesNotExist:
-                return {"error": "Source inventory not found"}
-
-            if source_inv.quantity < qty:
-                return {"error": f"Not enough stock. Available: {source_inv.quantity}"}
-
-            # 2. Get or Create Destination
-            # We use the item object from the source to ensure validity
-            dest_inv, created = Inventory.objects.select_for_update().get_or_create(
-                item=source_inv.item,
-                location_code=dest_loc,
-                defaults={'quantity': 0, 'version': 0}
-            )
+            item = catalog.items.get(sku)
+            item_id = item.id if item else None
 
-            # 3. Execute Move
-            source_inv.quantity -= qty
-            source_inv.save()
-            
-            dest_inv.quantity += qty
-            dest_inv.save()
+            # 1. Take from Source (check + decrement in one statement)
+            source = stock.change_stock(item_id=item_id, location=source_loc, delta=-qty, min_quantity=qty)
+            if source is None:
+                available = stock.current_quantity(item_id=item_id, location_code=source_loc)
+                if available is None:
+                    return {"error": "Source inventory not found"}
+                return {"error": f"Not enough stock. Available: {available}"}
+
+            # 2. Put into Destination (created on first use)
+            dest, _ = stock.add_stock(item_id, dest_loc, qty)
 
             # 4. Log It
-            TransactionLog.objects.create(
+            txlog.record(
                 action='MOVE',
                 sku_snapshot=sku,
                 location_snapshot=f"{source_loc} > {dest_loc}",
                 quantity_change=qty
             )
+            events.emit('move', sku=sku, location=source_loc, to_location=dest_loc, quantity=qty,
+                        new_qty=source.quantity, to_new_qty=dest.quantity)
+
+            return {"success": True, "message": f"Moved {qty} of {sku} from {source_loc} to {dest_loc}"}
+
+    # --- OFFLINE SCAN INGESTION ---
+    SCAN_TYPES = ('receive', 'pick', 'move')
+
+    @staticmethod
+    def ingest_scans(scans, device_id=None, chunk_size=None):
+        """
+        Replays a handheld's offline queue, in device order. Each scan carries a client-generated "key":
+            {"key", "type": "receive", "sku", "location", "quantity"}
+            {"key", "type": "pick", "order_id", "sku", "location", "quantity"}
+            {"key", "type": "move", "sku", "source_location", "dest_location", "quantity"}
+        A key seen before (in an earlier upload or earlier in this one) is not applied again; its first
+        outcome comes back with "duplicate": true. Each chunk is one transaction that applies its scans
+        and records their keys together, so a retried upload can never apply a scan twice.
+        """
+        chunk_size = int(chunk_size or getattr(settings, 'WMS_SCAN_INGEST', {}).get('CHUNK_SIZE', 200))
+        results = [None] * len(scans)
+        pending, repeats, first_by_key = [], [], {}
+
+        # 1. Validate shape of every scan up front; the first scan with a key stands for the rest
+        for idx, scan in enumerate(scans):
+            if not isinstance(scan, dict):
+                scan = {}
+            key = scan.get('key')
+            scan_type = scan.get('type')
+            if not isinstance(key, str) or not key or len(key) > 64:
+                results[idx] = {"event": idx, "error": "key required (at most 64 characters)"}
+            elif scan_type not in InventoryService.SCAN_TYPES:
+                results[idx] = {"event": idx, "key": key,
+                                "error": f"type must be one of {', '.join(InventoryService.SCAN_TYPES)}"}
+            elif key in first_by_key:
+                repeats.append((idx, first_by_key[key]))
+            else:
+                first_by_key[key] = idx
+                pending.append((idx, key, scan_type, scan))
+
+        # 2. Apply in chunks, each its own transaction
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            outcomes = InventoryService._apply_scan_chunk(chunk, device_id)
+            if "error" in outcomes:
+                # Still conflicting after retries: nothing in the chunk was applied or remembered
+                outcomes = {idx: {"event": idx, "key": key, "type": scan_type, "error": outcomes["error"]}
+                            for idx, key, scan_type, _ in chunk}
+            for idx, outcome in outcomes.items():
+                results[idx] = outcome
+
+        for idx, first in repeats:
+            results[idx] = {**results[first], "event": idx, "duplicate": True}
+
+        applied = sum(1 for r in results if r.get("success") and not r.get("duplicate"))
+        duplicates = sum(1 for r in results if r.get("duplicate"))
+        return {
+            "success": True,
+            "applied": applied,
+            "duplicates": duplicates,
+            "failed": sum(1 for r in results if "error" in r),
+            "results": results
+        }
+
+    @staticmethod
+    @retry_on_conflict()
+    def _apply_scan_chunk(chunk, device_id=None):
+        with transaction.atomic():
+            # 1. Keys already ingested answer with their stored outcome
+            stored = dict(ScanKey.objects.filter(key__in=[key for _, key, _, _ in chunk]).values_list('key', 'result'))
+            outcomes = {}
+            fresh = []
+            for idx, key, scan_type, scan in chunk:
+                if key in stored:
+                    outcomes[idx] = {**stored[key], "event": idx, "duplicate": True}
+                else:
+                    fresh.append((idx, key, scan_type, scan))
+
+            # 2. Consecutive scans of one type go through that type's batch path, so a receive
+            #    still lands before the move the device scanned after it
+            for scan_type, run in itertools.groupby(fresh, key=lambda entry: entry[2]):
+                run = list(run)
+                applied = InventoryService._apply_scan_run(scan_type, [scan for _, _, _, scan in run])
+                for (idx, key, _, _), outcome in zip(run, applied):
+                    outcomes[idx] = {"event": idx, "key": key, "type": scan_type, **outcome}
+
+            # 3. Keys commit with the changes they describe; outcomes of lost races stay replayable
+            try:
+                ScanKey.objects.bulk_create([
+                    ScanKey(key=key, device_id=device_id, scan_type=scan_type,
+                            result={k: v for k, v in outcomes[idx].items() if k != "event"})
+                    for idx, key, scan_type, _ in fresh
+                    if "Race" not in outcomes[idx].get("error", "")
+                ], batch_size=500)
+            except IntegrityError:
+                # Another upload of the same keys committed first (a device retrying a slow flush);
+                # the block rolls back and the retry finds them stored and answers with their outcome
+                raise StockConflict()
+            return outcomes
+
+    @staticmethod
+    def _apply_scan_run(scan_type, scans):
+        """One outcome per scan, in order, for a run of scans of the same type."""
+        if scan_type == 'receive':
+            result = InventoryService.receive_batch([
+                {"sku": s.get('sku'), "location": s.get('location'), "quantity": s.get('quantity', 1)} for s in scans
+            ])
+            if "error" in result:
+                return [{"error": result["error"]}] * len(scans)
+            return [{k: v for k, v in r.items() if k != "line"} for r in result["results"]]
 
-            return {"success": True, "message": f"Moved {qty} of {sku} from {source_loc} to {dest_loc}"}
\ No newline at end of file
+        if scan_type == 'pick':
+            picks = []
+            for s in scans:
+                try:
+                    order_id = int(s.get('order_id'))
+                except (TypeError, ValueError):
+                    order_id = None
+                picks.append({"order_id": order_id, "sku": s.get('sku'), "location": s.get('location'),
+                              "qty": s.get('quantity', 1)})
+            result = InventoryService._apply_pick_chunk(picks)
+            if isinstance(result, dict):
+                return [{"error": result["error"]}] * len(scans)
+            return [{k: v for k, v in r.items() if k != "pick"} for r in result]
+
+        outcomes = []
+        for s in scans:
+            sku, source, dest = s.get('sku'), s.get('source_location'), s.get('dest_location')
+            try:
+                qty = int(s.get('quantity', 1))
+            except (TypeError, ValueError):
+                qty = 0
+            if not sku or not source or not dest:
+                outcomes.append({"error": "sku, source_location and dest_location required"})
+            elif qty <= 0:
+                outcomes.append({"error": "Quantity must be positive"})
+            else:
+                outcomes.append({"sku": sku, "location": source, "to_location": dest, "qty": qty,
+                                 **InventoryService.move_item(sku, source, dest, qty)})
+        return outcomes
@@ -0,0 +1,102 @@
+import random
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+
+from .models import Inventory, StatCounter, TransactionLog
+
+LOW_STOCK_THRESHOLD = 10
+COUNTERS = ('total_stock', 'total_locations', 'low_stock', 'transactions')
+
+
+def _shards():
+    return getattr(settings, 'WMS_STATS_SHARDS', 8)
+
+
+def bin_delta(before, after, created=False, deleted=False):
+    """Counter changes for one Inventory row going from `before` to `after` units."""
+    was_low = not created and before < LOW_STOCK_THRESHOLD
+    is_low = not deleted and after < LOW_STOCK_THRESHOLD
+    return {
+        'total_stock': (0 if deleted else after) - (0 if created else before),
+        'total_locations': int(created) - int(deleted),
+        'low_stock': int(is_low) - int(was_low),
+    }
+
+
+def add(*deltas, **extra):
+    """
+    Applies counter deltas in the caller's transaction with a single UPDATE.
+    Writers spread over WMS_STATS_SHARDS rows per counter so concurrent mutations rarely queue on the same row.
+    """
+    totals = dict(extra)
+    for delta in deltas:
+        for name, value in delta.items():
+            totals[name] = totals.get(name, 0) + value
+    totals = {name: value for name, value in totals.items() if value}
+    if not totals:
+        return
+
+    shard = random.randrange(_shards())
+    change = Case(*[When(name=name, then=Value(value)) for name, value in totals.items()], default=Value(0))
+    updated = StatCounter.objects.filter(shard=shard, name__in=totals.keys()).update(value=F('value') + change)
+
+    if updated < len(totals):
+        # Shard rows not seeded yet (e.g. WMS_STATS_SHARDS was raised): create them and retry once
+        StatCounter.objects.bulk_create(
+            [StatCounter(name=name, shard=shard, value=0) for name in COUNTERS], ignore_conflicts=True
+        )
+        StatCounter.objects.filter(shard=shard, name__in=totals.keys()).update(value=F('value') + change)
+
+
+def read():
+    """Current dashboard numbers; sums at most len(COUNTERS) * WMS_STATS_SHARDS rows."""
+    values = dict.fromkeys(COUNTERS, 0)
+    for row in StatCounter.objects.values('name').annotate(total=Sum('value')):
+        values[row['name']] = row['total']
+    return values
+
+
+async def aread():
+    """read() for async views: same single grouped query through the async ORM."""
+    values = dict.fromkeys(COUNTERS, 0)
+    async for row in StatCounter.objects.values('name').annotate(total=Sum('value')):
+        values[row['name']] = row['total']
+    return values
+
+
+def compute_actual():
+    """Recomputes every counter from the source tables (full scans; for rebuild/verify only)."""
+    inv = Inventory.objects.aggregate(
+        total_stock=Sum('quantity'),
+        total_locations=Count('id'),
+        low_stock=Count('id', filter=Q(quantity__lt=LOW_STOCK_THRESHOLD)),
+    )
+    return {
+        'total_stock': inv['total_stock'] or 0,
+        'total_locations': inv['total_locations'],
+        'low_stock': inv['low_stock'],
+        'transactions': TransactionLog.objects.count(),
+    }
+
+
+def rebuild():
+    """
+    Resets the counters to freshly computed values.
+    Counter rows are locked first, so mutations racing the rebuild apply their delta after it, not before.
+    """
+    with transaction.atomic():
+        StatCounter.objects.bulk_create(
+            [StatCounter(name=name, shard=shard, value=0) for name in COUNTERS for shard in range(_shards())],
+            ignore_conflicts=True
+        )
+        list(StatCounter.objects.select_for_update().all())
+        actual = compute_actual()
+
+        # Whole value lands on shard 0, every other shard starts from zero again
+        StatCounter.objects.update(value=Case(
+            *[When(name=name, shard=0, then=Value(actual[name])) for name in COUNTERS],
+            default=Value(0)
+        ))
+        return actual
@@ -0,0 +1,126 @@
+import sqlite3
+from collections import namedtuple
+
+from django.db import IntegrityError, connection, transaction
+
+from . import changefeed, generations, putaway, stats
+from .models import Inventory
+
+StockRow = namedtuple('StockRow', ['id', 'item_id', 'location_code', 'quantity', 'reserved_quantity', 'version'])
+
+_COLUMNS = ', '.join(StockRow._fields)
+
+
+def _supports_returning():
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return sqlite3.sqlite_version_info >= (3, 35, 0)
+    return False
+
+
+def change_stock(*, id=None, item_id=None, location=None, delta=0, release=0, set_quantity=None,
+                 min_quantity=None, min_available=None, expected_quantity=None):
+    """
+    Applies one stock mutation as a single guarded UPDATE and returns the new row, or None when the
+    bin does not exist or a guard failed. The row lock is held for this one statement only.
+
+        delta              quantity += delta
+        release            reserved_quantity -= release (never below zero)
+        set_quantity       quantity = set_quantity (requires expected_quantity, the value it replaces)
+        min_quantity       WHERE quantity >= n
+        min_available      WHERE quantity - reserved_quantity >= n
+        expected_quantity  WHERE quantity = n (optimistic check for absolute writes)
+
+    The bin is addressed by id or by (item_id, location). Every write bumps version and feeds the
+    dashboard counters, the putaway index, the API's change generation and the sync feed.
+    """
+    qn = connection.ops.quote_name
+    sets, set_params = [], []
+    where, where_params = [], []
+
+    if set_quantity is not None:
+        if expected_quantity is None:
+            raise ValueError("set_quantity needs expected_quantity to know the value it replaces")
+        sets.append(f"{qn('quantity')} = %s")
+        set_params.append(set_quantity)
+    elif delta:
+        sets.append(f"{qn('quantity')} = {qn('quantity')} + %s")
+        set_params.append(delta)
+    if release:
+        sets.append(
+            f"{qn('reserved_quantity')} = CASE WHEN {qn('reserved_quantity')} > %s "
+            f"THEN {qn('reserved_quantity')} - %s ELSE 0 END"
+        )
+        set_params += [release, release]
+    sets.append(f"{qn('version')} = {qn('version')} + 1")
+
+    if id is not None:
+        where.append(f"{qn('id')} = %s")
+        where_params.append(id)
+    else:
+        where += [f"{qn('item_id')} = %s", f"{qn('location_code')} = %s"]
+        where_params += [item_id, location]
+    if min_quantity is not None:
+        where.append(f"{qn('quantity')} >= %s")
+        where_params.append(min_quantity)
+    if min_available is not None:
+        where.append(f"{qn('quantity')} - {qn('reserved_quantity')} >= %s")
+        where_params.append(min_available)
+    if expected_quantity is not None:
+        where.append(f"{qn('quantity')} = %s")
+        where_params.append(expected_quantity)
+
+    table = qn(Inventory._meta.db_table)
+    sql = f"UPDATE {table} SET {', '.join(sets)} WHERE {' AND '.join(where)}"
+    params = set_params + where_params
+
+    with connection.cursor() as cursor:
+        if _supports_returning():
+            cursor.execute(f"{sql} RETURNING {_COLUMNS}", params)
+            row = cursor.fetchone()
+        else:
+            cursor.execute(sql, params)
+            row = None
+            if cursor.rowcount:
+                cursor.execute(f"SELECT {_COLUMNS} FROM {table} WHERE {' AND '.join(where[:1 if id is not None else 2])}",
+                               where_params[:1 if id is not None else 2])
+                row = cursor.fetchone()
+
+    if row is None:
+        return None
+
+    row = StockRow(*row)
+    before = expected_quantity if set_quantity is not None else row.quantity - delta
+    stats.add(stats.bin_delta(before, row.quantity))
+    putaway.track([(row.item_id, row.location_code, row.quantity)])
+    generations.touch('inventory')
+    changefeed.record(inventory=[row.id])
+    return row
+
+
+def add_stock(item_id, location, quantity):
+    """
+    Adds stock to a bin, creating it on first use. Returns (row, created).
+    The common case (bin exists) is one UPDATE; a new bin costs one INSERT.
+    """
+    row = change_stock(item_id=item_id, location=location, delta=quantity)
+    if row is not None:
+        return row, False
+
+    try:
+        with transaction.atomic():
+            inv = Inventory.objects.create(item_id=item_id, location_code=location, quantity=quantity, version=1)
+    except IntegrityError:
+        # Someone else created the bin between our UPDATE and INSERT
+        return change_stock(item_id=item_id, location=location, delta=quantity), False
+
+    stats.add(stats.bin_delta(0, quantity, created=True))
+    putaway.track([(item_id, location, quantity)])
+    generations.touch('inventory')
+    return StockRow(inv.id, item_id, location, inv.quantity, inv.reserved_quantity, inv.version), True
+
+
+def current_quantity(**lookup):
+    """Reads a bin's quantity after a failed guard, to tell 'not found' from 'not enough'."""
+    return Inventory.objects.filter(**lookup).values_list('quantity', flat=True).first()
@@ -1,3 +1,621 @@
-from django.test import TestCase
+import socket
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.db import IntegrityError, OperationalError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APITestCase
+
+from . import checks, labels, stats, stock
+from .retry import StockConflict, retry_on_conflict
+
+from .services import InventoryService
+from .models import (
+    RMA, RMALine, CycleCountSession, CycleCountTask, Inventory, Item, Order, OrderLine,
+    PurchaseOrder, PurchaseOrderLine, ReplenishmentRule, ScanKey, Supplier, TransactionLog
+)
+
+
+def seed(start, count):
+    """Creates `count` rows of every listed model, with the relations their serializers read."""
+    for n in range(start, start + count):
+        item = Item.objects.create(sku=f"SKU-{n}", name=f"Item {n}")
+        inv = Inventory.objects.create(item=item, location_code=f"A-{n:03d}", quantity=20)
+
+        order = Order.objects.create(order_number=f"ORD-{n}", customer_name=f"Customer {n}")
+        OrderLine.objects.create(order=order, item=item, qty_ordered=2)
+        OrderLine.objects.create(order=order, item=item, qty_ordered=1)
+
+        rma = RMA.objects.create(order=order, rma_number=f"RMA-{n}")
+        RMALine.objects.create(rma=rma, item=item, qty_to_return=1)
+
+        session = CycleCountSession.objects.create(reference=f"CC-{n}")
+        CycleCountTask.objects.create(session=session, inventory=inv, expected_qty=20)
+
+        supplier = Supplier.objects.create(name=f"Supplier {n}", contact_email=f"s{n}@example.com")
+        po = PurchaseOrder.objects.create(supplier=supplier, po_number=f"PO-{n:05d}", total_ordered=5)
+        PurchaseOrderLine.objects.create(po=po, sku=item.sku, qty_ordered=5)
+
+        TransactionLog.objects.create(action='RECEIVE', sku_snapshot=item.sku,
+                                      location_snapshot=inv.location_code, quantity_change=20)
+
+
+class QueryBudgetTests(APITestCase):
+    # Maximum queries per list page. The count must not grow with the number of rows.
+    BUDGETS = {
+        '/api/items/': 2,
+        '/api/inventory/': 2,
+        '/api/history/': 1,
+        '/api/orders/': 3,
+        '/api/rmas/': 3,
+        '/api/cycle-counts/': 3,
+        '/api/purchase-orders/': 3,
+        '/api/suppliers/': 2,
+        '/api/dashboard/stats/': 1,
+    }
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(ctx)
+
+    def test_list_endpoints_stay_within_budget(self):
+        seed(0, 2)
+        small = {url: self.count_queries(url) for url in self.BUDGETS}
+
+        seed(2, 25)
+        large = {url: self.count_queries(url) for url in self.BUDGETS}
+
+        for url, budget in self.BUDGETS.items():
+            with self.subTest(url=url):
+                self.assertLessEqual(large[url], budget)
+                self.assertEqual(small[url], large[url])
+
+    def test_list_endpoints_are_paginated(self):
+        seed(0, 3)
+        for url in self.BUDGETS:
+            if url.startswith('/api/dashboard/'):
+                continue
+            with self.subTest(url=url):
+                response = self.client.get(url, {'page_size': 2})
+                self.assertEqual(len(response.data['results']), 2)
+                self.assertIsNotNone(response.data['next'])
+
+
+
+class LabelSpoolTests(SimpleTestCase):
+    def listen(self):
+        # A stand-in printer on an ephemeral port that keeps everything it is sent
+        server = socket.create_server(('127.0.0.1', 0))
+        self.addCleanup(server.close)
+        received = bytearray()
+
+        def accept():
+            conn, _ = server.accept()
+            with conn:
+                while data := conn.recv(65536):
+                    received.extend(data)
+
+        thread = threading.Thread(target=accept, daemon=True)
+        thread.start()
+        return server.getsockname()[1], thread, received
+
+    def test_spool_sends_the_whole_job(self):
+        port, thread, received = self.listen()
+        contexts = [labels.bin_context(f"Item {n}", f"SKU-{n}", f"A-{n:03d}") for n in range(450)]
+        rendered = list(labels.render_all('bin', contexts))
+
+        count, sent = labels.spool('127.0.0.1', port, iter(rendered), timeout=5)
+        thread.join(5)
+
+        job = ''.join(rendered).encode('utf-8')
+        self.assertEqual(count, 450)
+        self.assertEqual(sent, len(job))
+        self.assertEqual(bytes(received), job)
+        self.assertEqual(received.count(b'^XA'), 450)
+
+    def test_unreachable_printer_raises(self):
+        server = socket.create_server(('127.0.0.1', 0))
+        port = server.getsockname()[1]
+        server.close()
+        with self.assertRaises(labels.PrinterError):
+            labels.spool('127.0.0.1', port, iter(['^XA^XZ']), timeout=1)
+
+
+class ShippingLabelTests(APITestCase):
+    def test_string_ids_render_and_unknown_ids_are_reported(self):
+        item = Item.objects.create(sku="SKU-1", name="Item 1")
+        packed = Order.objects.create(order_number="ORD-1", customer_name="A", status='PACKED')
+        OrderLine.objects.create(order=packed, item=item, qty_ordered=1)
+        pending = Order.objects.create(order_number="ORD-2", customer_name="B")
+
+        response = self.client.post('/api/orders/labels/', {'order_ids': [str(packed.id), pending.id, 999]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        job = b''.join(response.streaming_content)
+        self.assertEqual(job.count(b'^XA'), 1)
+        self.assertIn(b'ORD-1', job)
+        self.assertEqual(response['X-Skipped-Ids'], f'{pending.id},999')
+
+        response = self.client.post('/api/orders/labels/', {'order_ids': [999]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['skipped'], [999])
+
+        response = self.client.post('/api/orders/labels/', {'order_ids': ['x']}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+
+@override_settings(WMS_CONDITIONAL_GET={'ALLOW_PROCESS_LOCAL': True})
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        item = Item.objects.create(sku="SKU-1", name="Item 1")
+        Inventory.objects.create(item=item, location_code="A-01-1", quantity=10)
+
+    def test_etag_304_and_new_etag_after_stock_change(self):
+        first = self.client.get('/api/inventory/')
+        self.assertEqual(first.status_code, 200)
+        etag = first['ETag']
+        self.assertTrue(etag)
+
+        with CaptureQueriesContext(connection) as ctx:
+            unchanged = self.client.get('/api/inventory/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(unchanged.status_code, 304)
+        self.assertEqual(len(ctx), 0)
+
+        InventoryService.receive_item("SKU-1", "A-01-1", 5)
+
+        changed = self.client.get('/api/inventory/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+        self.assertEqual(changed.json()['results'][0]['quantity'], 15)
+
+    @override_settings(WMS_CONDITIONAL_GET={'ALLOW_PROCESS_LOCAL': False})
+    def test_disabled_on_process_local_cache(self):
+        response = self.client.get('/api/inventory/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertIn('inventory.W002', [m.id for m in checks.shared_cache_check(None)])
+
+
+
+class ScanIngestTests(APITestCase):
+    def setUp(self):
+        Item.objects.create(sku="SKU-1", name="Item 1")
+
+    def upload(self, scans):
+        response = self.client.post('/api/scans/', {'device_id': 'HH-1', 'scans': scans}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def receive(self, key, qty=1):
+        return {'key': key, 'type': 'receive', 'sku': 'SKU-1', 'location': 'A-01-1', 'quantity': qty}
+
+    def quantity(self, location):
+        return Inventory.objects.get(location_code=location).quantity
+
+    def test_resent_batch_applies_nothing(self):
+        scans = [self.receive('r1', 5), self.receive('r2', 3),
+                 {'key': 'm1', 'type': 'move', 'sku': 'SKU-1', 'source_location': 'A-01-1',
+                  'dest_location': 'B-01-1', 'quantity': 2}]
+        first = self.upload(scans)
+        self.assertEqual((first['applied'], first['duplicates'], first['failed']), (3, 0, 0))
+        self.assertEqual((self.quantity('A-01-1'), self.quantity('B-01-1')), (6, 2))
+
+        again = self.upload(scans)
+        self.assertEqual((again['applied'], again['duplicates'], again['failed']), (0, 3, 0))
+        self.assertTrue(all(r['duplicate'] for r in again['results']))
+        self.assertEqual(again['results'][1]['new_qty'], first['results'][1]['new_qty'])
+        self.assertEqual((self.quantity('A-01-1'), self.quantity('B-01-1')), (6, 2))
+
+    def test_partly_seen_batch_applies_only_new_keys(self):
+        self.upload([self.receive('r1', 5)])
+        result = self.upload([self.receive('r1', 5), self.receive('r2', 4), self.receive('r2', 4)])
+
+        self.assertEqual((result['applied'], result['duplicates']), (1, 2))
+        self.assertEqual([r.get('duplicate', False) for r in result['results']], [True, False, True])
+        self.assertEqual(self.quantity('A-01-1'), 9)
+
+    def test_integrity_errors_outside_the_key_insert_are_not_retried(self):
+        with mock.patch.object(InventoryService, '_apply_scan_run', side_effect=IntegrityError('other')) as run:
+            with self.assertRaises(IntegrityError):
+                InventoryService.ingest_scans([self.receive('r1')])
+        self.assertEqual(run.call_count, 1)
+        self.assertFalse(ScanKey.objects.exists())
+
+
+
+class ReceiveBatchTests(APITestCase):
+    def setUp(self):
+        self.one = Item.objects.create(sku="SKU-1", name="Item 1")
+        self.two = Item.objects.create(sku="SKU-2", name="Item 2")
+        # Same items and locations as the receipt, but not the pairs it names
+        self.others = [Inventory.objects.create(item=self.one, location_code="B-01-1", quantity=7),
+                       Inventory.objects.create(item=self.two, location_code="A-01-1", quantity=7)]
+
+    def test_receipt_touches_only_its_bins(self):
+        existing = Inventory.objects.create(item=self.one, location_code="A-01-1", quantity=2, version=3)
+        counters = stats.read()
+        response = self.client.post('/api/inventory/receive/batch/', {'lines': [
+            {'sku': 'SKU-1', 'location': 'A-01-1', 'quantity': 5},
+            {'sku': 'SKU-2', 'location': 'B-01-1', 'quantity': 4},
+            {'sku': 'SKU-2', 'location': 'B-01-1', 'quantity': 1},
+            {'sku': 'SKU-9', 'location': 'B-01-1', 'quantity': 1},
+            {'sku': 'SKU-1', 'location': 'A-01-1', 'quantity': 0},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['received'], response.data['failed']), (3, 2))
+
+        existing.refresh_from_db()
+        self.assertEqual((existing.quantity, existing.version), (7, 4))
+        created = Inventory.objects.get(item=self.two, location_code="B-01-1")
+        self.assertEqual((created.quantity, created.version), (5, 1))
+        self.assertEqual([(inv.quantity, inv.version) for inv in Inventory.objects.filter(
+            id__in=[inv.id for inv in self.others]).order_by('id')], [(7, 0), (7, 0)])
+
+        after = stats.read()
+        self.assertEqual(after['total_locations'] - counters['total_locations'], 1)
+        self.assertEqual(after['total_stock'] - counters['total_stock'], 10)
+
+    def test_bin_created_concurrently_is_not_counted_as_new(self):
+        insert = Inventory.objects.bulk_create
+
+        def created_first(rows, **kwargs):
+            # Another receipt commits the same bin between our lookup and our insert
+            Inventory.objects.create(item=self.one, location_code="C-01-1", quantity=4, version=1)
+            return insert(rows, **kwargs)
+
+        counters = stats.read()
+        with mock.patch.object(Inventory.objects, 'bulk_create', side_effect=created_first):
+            result = InventoryService.receive_batch([{'sku': 'SKU-1', 'location': 'C-01-1', 'quantity': 3}])
+        self.assertEqual(result['results'][0]['new_qty'], 7)
+        self.assertEqual(Inventory.objects.get(location_code="C-01-1").version, 2)
+        self.assertEqual(stats.read()['total_locations'], counters['total_locations'])
+
+
+class AllocationTests(APITestCase):
+    def setUp(self):
+        self.item = Item.objects.create(sku="SKU-1", name="Item 1")
+        Inventory.objects.create(item=self.item, location_code="A-01-1", quantity=3)
+        Inventory.objects.create(item=self.item, location_code="A-01-2", quantity=2)
+
+    def order(self, number, qty):
+        order = Order.objects.create(order_number=number, customer_name="A")
+        OrderLine.objects.create(order=order, item=self.item, qty_ordered=qty)
+        return order
+
+    def allocate(self, order_ids):
+        response = self.client.post('/api/orders/allocate_batch/', {'order_ids': order_ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_orders_are_served_oldest_first_across_bins(self):
+        first, second, third = self.order("ORD-1", 4), self.order("ORD-2", 2), self.order("ORD-3", 1)
+        result = self.allocate([third.id, str(second.id), first.id])
+
+        self.assertEqual(result['allocated'], 1)
+        self.assertEqual([(r['order_id'], r['status'], r['lines'][0]['allocated']) for r in result['orders']],
+                         [(first.id, 'ALLOCATED', 4), (second.id, 'PENDING', 1), (third.id, 'PENDING', 0)])
+        self.assertEqual(sorted(Inventory.objects.values_list('reserved_quantity', flat=True)), [2, 3])
+
+    def test_repeated_and_already_allocated_orders(self):
+        order = self.order("ORD-1", 2)
+        self.assertEqual(len(self.allocate([order.id, order.id])['orders']), 1)
+
+        again = self.allocate([order.id])
+        self.assertEqual((again['allocated'], again['orders'][0]['error']), (0, "Order is ALLOCATED, cannot allocate"))
+        self.assertEqual(sum(Inventory.objects.values_list('reserved_quantity', flat=True)), 2)
+
+    def test_bad_order_ids_are_rejected(self):
+        for order_ids in ([], "1,2", [1, "x"], [None]):
+            response = self.client.post('/api/orders/allocate_batch/', {'order_ids': order_ids}, format='json')
+            self.assertEqual(response.status_code, 400)
+
+
+@override_settings(WMS_SYNC={'SETTLE_SECONDS': 0})
+class DeltaSyncTests(APITestCase):
+    def sync(self, **params):
+        response = self.client.get('/api/sync/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_cursor_returns_only_later_changes(self):
+        Item.objects.create(sku="SKU-1", name="Item 1")
+        cursor = self.sync(cursor=0)['cursor']
+
+        InventoryService.receive_item("SKU-1", "A-01-1", 5)
+        delta = self.sync(cursor=cursor)
+        self.assertFalse(delta['reset'])
+        self.assertEqual(list(delta['changed']), ['inventory'])
+        self.assertEqual(delta['changed']['inventory'][0]['quantity'], 5)
+        self.assertEqual(self.sync(cursor=delta['cursor'])['changed'], {})
+
+    def test_deletes_come_back_as_tombstones(self):
+        item = Item.objects.create(sku="SKU-1", name="Item 1")
+        inv = Inventory.objects.create(item=item, location_code="A-01-1", quantity=5)
+        cursor = self.sync(cursor=0)['cursor']
+
+        inv_id = inv.id
+        inv.delete()
+        delta = self.sync(cursor=cursor)
+        self.assertEqual(delta['deleted'], {'inventory': [inv_id]})
+        self.assertEqual(delta['changed'], {})
+
+    def test_paging_neither_skips_nor_repeats(self):
+        items = [Item.objects.create(sku=f"SKU-{n}", name=f"Item {n}") for n in range(7)]
+        cursor, seen, pages = 0, [], 0
+        while True:
+            page = self.sync(cursor=cursor, limit=3)
+            seen += [row['id'] for row in page['changed'].get('item', [])]
+            cursor, pages = page['cursor'], pages + 1
+            if not page['more']:
+                break
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, [item.id for item in items])
+
+    def test_missing_or_pruned_cursor_asks_for_reset(self):
+        Item.objects.create(sku="SKU-1", name="Item 1")
+        self.assertTrue(self.sync()['reset'])
+        self.assertTrue(self.sync(cursor=10 ** 9)['reset'])
+
+
+
+class WavePickTests(APITestCase):
+    def setUp(self):
+        self.item = Item.objects.create(sku="SKU-1", name="Item 1")
+        self.bin = Inventory.objects.create(item=self.item, location_code="A-01-1", quantity=20)
+        self.order = Order.objects.create(order_number="ORD-1", customer_name="A")
+
+    def pick(self, qty):
+        return {"order_id": self.order.id, "sku": "SKU-1", "location": "A-01-1", "qty": qty}
+
+    def test_over_pick_is_refused_against_earlier_picks(self):
+        line = OrderLine.objects.create(order=self.order, item=self.item, qty_ordered=3)
+        InventoryService.allocate_orders([self.order.id])
+        # A scanner picks through the single-item path first
+        self.assertTrue(InventoryService.pick_order_item(self.order.id, "SKU-1", "A-01-1", 2)["success"])
+
+        result = InventoryService.execute_wave_picks([self.pick(2), self.pick(1), self.pick(1)])
+        self.assertEqual([r.get("error") for r in result["picks"]],
+                         ["Cannot pick more than allocated", None, "Cannot pick more than allocated"])
+        line.refresh_from_db()
+        self.assertEqual(line.qty_picked, 3)
+        self.bin.refresh_from_db()
+        self.assertEqual(self.bin.quantity, 17)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'PICKED')
+
+    def test_duplicate_sku_lines_are_both_picked(self):
+        first = OrderLine.objects.create(order=self.order, item=self.item, qty_ordered=2)
+        second = OrderLine.objects.create(order=self.order, item=self.item, qty_ordered=3)
+        InventoryService.allocate_orders([self.order.id])
+
+        result = InventoryService.execute_wave_picks([self.pick(3), self.pick(2)])
+        self.assertEqual(result["picked"], 2)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.qty_picked, second.qty_picked), (2, 3))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'PICKED')
+
+
+
+class PurchaseOrderTests(APITestCase):
+    def setUp(self):
+        Item.objects.create(sku="SKU-1", name="Item 1")
+        Item.objects.create(sku="SKU-2", name="Item 2")
+        supplier = Supplier.objects.create(name="Supplier", contact_email="s@example.com")
+        response = self.client.post('/api/purchase-orders/', {
+            'supplier': supplier.id, 'status': 'ORDERED',
+            'lines': [{'sku': 'SKU-1', 'qty': 3}, {'sku': 'SKU-1', 'qty': 2}, {'sku': 'SKU-2', 'qty': 1}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.po = PurchaseOrder.objects.get(id=response.data['id'])
+
+    def test_receive_fills_same_sku_lines_in_order_and_completes_the_po(self):
+        first = InventoryService.receive_po_item(self.po.id, "SKU-1", "A-01-1", 3)
+        self.assertEqual((first["po_status"], first["line_progress"]), ('ORDERED', '3/3'))
+        second = InventoryService.receive_po_item(self.po.id, "SKU-1", "A-01-1", 2)
+        self.assertEqual(second["line_progress"], '2/2')
+        self.assertIn("Over-receiving", InventoryService.receive_po_item(self.po.id, "SKU-1", "A-01-1", 1)["error"])
+        self.assertEqual(InventoryService.receive_po_item(self.po.id, "SKU-9", "A-01-1", 1)["error"], "Item not in this PO")
+
+        last = InventoryService.receive_po_item(self.po.id, "SKU-2", "A-01-2", 1)
+        self.assertEqual(last["po_status"], 'RECEIVED')
+        self.po.refresh_from_db()
+        self.assertEqual((self.po.total_ordered, self.po.total_received), (6, 6))
+        self.assertEqual(Inventory.objects.get(location_code="A-01-1").quantity, 5)
+
+    def test_lines_cannot_be_replaced_after_receiving(self):
+        InventoryService.receive_po_item(self.po.id, "SKU-1", "A-01-1", 1)
+        response = self.client.patch(f'/api/purchase-orders/{self.po.id}/', {'lines': [{'sku': 'SKU-2', 'qty': 9}]},
+                                     format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.po.lines.count(), 3)
+        self.assertEqual(sum(line.qty_received for line in self.po.lines.all()), 1)
+
+    def test_replacing_lines_before_receiving_resets_totals(self):
+        PurchaseOrder.objects.filter(id=self.po.id).update(status='RECEIVED')
+        response = self.client.patch(f'/api/purchase-orders/{self.po.id}/', {'lines': [{'sku': 'SKU-2', 'qty': 9}]},
+                                     format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['status'], response.data['total_ordered']), ('ORDERED', 9))
+        self.assertEqual([(l.sku, l.qty_ordered) for l in self.po.lines.all()], [('SKU-2', 9)])
+
+
+class PurchaseOrderLineMigrationTests(TransactionTestCase):
+    before = [('inventory', '0013_statcounter')]
+    after = [('inventory', '0014_purchaseorderline')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_json_lines_are_copied_into_rows(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        old = executor.loader.project_state(self.before).apps
+        supplier = old.get_model('inventory', 'Supplier').objects.create(name="S", contact_email="s@example.com")
+        po = old.get_model('inventory', 'PurchaseOrder').objects.create(
+            supplier=supplier, po_number="PO-1",
+            lines=[{"sku": "SKU-1", "qty": 5, "received": 2}, {"sku": "SKU-2", "qty": "3"}],
+        )
+        old.get_model('inventory', 'PurchaseOrder').objects.create(supplier=supplier, po_number="PO-2", lines=[])
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        new = executor.loader.project_state(self.after).apps
+        lines = new.get_model('inventory', 'PurchaseOrderLine').objects.filter(po_id=po.id).order_by('id')
+        self.assertEqual([(l.sku, l.qty_ordered, l.qty_received) for l in lines],
+                         [("SKU-1", 5, 2), ("SKU-2", 3, 0)])
+        totals = new.get_model('inventory', 'PurchaseOrder').objects.values_list('po_number', 'total_ordered', 'total_received')
+        self.assertEqual(sorted(totals), [("PO-1", 8, 2), ("PO-2", 0, 0)])
+
+
+class StockTests(APITestCase):
+    def setUp(self):
+        self.item = Item.objects.create(sku="SKU-1", name="Item 1")
+        self.bin = Inventory.objects.create(item=self.item, location_code="A-01-1", quantity=5, reserved_quantity=2)
+
+    def test_guarded_change_bumps_version(self):
+        row = stock.change_stock(id=self.bin.id, delta=-3, min_available=3)
+        self.assertEqual((row.quantity, row.reserved_quantity, row.version), (2, 2, 1))
+        row = stock.change_stock(item_id=self.item.id, location="A-01-1", release=5)
+        self.assertEqual((row.quantity, row.reserved_quantity, row.version), (2, 0, 2))
+
+    def test_insufficient_stock_is_refused_without_writing(self):
+        self.assertIsNone(stock.change_stock(id=self.bin.id, delta=-4, min_available=4))
+        self.assertIsNone(stock.change_stock(id=self.bin.id, delta=-6, min_quantity=6))
+        self.assertIsNone(stock.change_stock(id=self.bin.id, set_quantity=9, expected_quantity=4))
+        self.assertIsNone(stock.change_stock(item_id=self.item.id, location="Z-99-9", delta=1))
+        self.bin.refresh_from_db()
+        self.assertEqual((self.bin.quantity, self.bin.version), (5, 0))
+        with self.assertRaises(ValueError):
+            stock.change_stock(id=self.bin.id, set_quantity=9)
+
+    def test_add_stock_creates_a_missing_bin(self):
+        counters = stats.read()
+        row, created = stock.add_stock(self.item.id, "B-01-1", 4)
+        self.assertTrue(created)
+        self.assertEqual((row.quantity, row.version), (4, 1))
+
+        row, created = stock.add_stock(self.item.id, "B-01-1", 2)
+        self.assertFalse(created)
+        self.assertEqual((row.quantity, row.version), (6, 2))
+        self.assertEqual(stats.read()['total_locations'] - counters['total_locations'], 1)
+
+
+@override_settings(WMS_RETRY={'MAX_ATTEMPTS': 3, 'BASE_DELAY': 0})
+class RetryTests(SimpleTestCase):
+    def flaky(self, *errors):
+        """A service method that raises `errors` in turn, then succeeds."""
+        calls = mock.Mock(side_effect=[*errors, {"success": True}])
+        return retry_on_conflict()(lambda: calls()), calls
+
+    def test_conflicts_are_retried_until_one_succeeds(self):
+        method, calls = self.flaky(StockConflict(), StockConflict())
+        self.assertEqual(method(), {"success": True})
+        self.assertEqual(calls.call_count, 3)
+
+    def test_gives_up_after_the_configured_attempts(self):
+        method, calls = self.flaky(*[StockConflict()] * 5)
+        self.assertEqual(method(), {"error": "Race Condition: Data changed. Retry.", "attempts": 3})
+        self.assertEqual(calls.call_count, 3)
+
+    def test_lock_errors_are_retried_only_at_the_outermost_transaction(self):
+        method, calls = self.flaky(OperationalError('database is locked'))
+        self.assertEqual(method(), {"success": True})
+        self.assertEqual(calls.call_count, 2)
+
+        method, calls = self.flaky(OperationalError('database is locked'))
+        with mock.patch.object(connection, 'in_atomic_block', True):
+            with self.assertRaises(OperationalError):
+                method()
+        self.assertEqual(calls.call_count, 1)
+
+    def test_other_database_errors_propagate(self):
+        method, calls = self.flaky(OperationalError('no such table: inventory_inventory'))
+        with self.assertRaises(OperationalError):
+            method()
+        self.assertEqual(calls.call_count, 1)
+
+
+class CycleCountBatchTests(APITestCase):
+    def setUp(self):
+        item = Item.objects.create(sku="SKU-1", name="Item 1")
+        self.bins = [Inventory.objects.create(item=item, location_code=f"A-01-{n}", quantity=10) for n in (1, 2, 3)]
+        self.session = CycleCountSession.objects.create(reference="CC-1")
+        self.tasks = [CycleCountTask.objects.create(session=self.session, inventory=inv, expected_qty=10)
+                      for inv in self.bins]
+        other = CycleCountSession.objects.create(reference="CC-2")
+        self.foreign = CycleCountTask.objects.create(session=other, inventory=self.bins[0], expected_qty=10)
+
+    def submit(self, counts):
+        response = self.client.post(f'/api/cycle-counts/{self.session.id}/submit/batch/', {'counts': counts},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_variances_adjust_stock_and_complete_the_session(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = self.submit([{'task_id': t.id, 'qty': qty} for t, qty in zip(self.tasks, (10, 7, 12))])
+
+        self.assertEqual((result['counted'], result['session_status']), (3, 'COMPLETED'))
+        self.assertEqual([r['variance'] for r in result['results']], [0, -3, 2])
+        self.assertEqual([(inv.quantity, inv.version) for inv in Inventory.objects.order_by('id')],
+                         [(10, 0), (7, 1), (12, 1)])
+        self.assertEqual(sorted(TransactionLog.objects.filter(action='ADJUST').values_list('quantity_change', flat=True)),
+                         [-3, 2])
+
+    def test_counted_repeated_and_foreign_tasks_are_refused(self):
+        self.submit([{'task_id': self.tasks[0].id, 'qty': 8}])
+        result = self.submit([
+            {'task_id': self.tasks[0].id, 'qty': 5},
+            {'task_id': self.tasks[1].id, 'qty': 9},
+            {'task_id': self.tasks[1].id, 'qty': 1},
+            {'task_id': self.foreign.id, 'qty': 1},
+            {'task_id': 'x', 'qty': 1},
+        ])
+
+        self.assertEqual([r.get('error') for r in result['results']],
+                         ["Task already completed", None, "Task already completed", "Task not found",
+                          "task_id and qty required"])
+        self.assertEqual((result['counted'], result['session_status']), (1, 'IN_PROGRESS'))
+        self.assertEqual([inv.quantity for inv in Inventory.objects.order_by('id')], [8, 9, 10])
+        self.foreign.refresh_from_db()
+        self.assertEqual(self.foreign.status, 'PENDING')
+
+
+@override_settings(WMS_REPLENISHMENT={'DEFAULT_MIN': 10, 'DEFAULT_MAX': 50, 'DEFAULT_SUPPLIER': "Default"})
+class ReplenishmentTests(APITestCase):
+    def stock(self, sku, *bins, reserved=0):
+        item = Item.objects.create(sku=sku, name=sku)
+        for n, qty in enumerate(bins):
+            Inventory.objects.create(item=item, location_code=f"{sku}-{n}", quantity=qty,
+                                     reserved_quantity=reserved if n == 0 else 0)
+        return item
+
+    def test_shortfalls_are_ordered_up_to_max_per_supplier(self):
+        acme = Supplier.objects.create(name="Acme", contact_email="a@example.com")
+        # Per-SKU rule, stock spread over two bins: 3 + 2 - 1 reserved = 4 < 5, ordered up to 20
+        ReplenishmentRule.objects.create(item=self.stock("SKU-A", 3, 2, reserved=1), min_qty=5, max_qty=20,
+                                         supplier=acme)
+        # Rule without a supplier, at its min: not ordered
+        ReplenishmentRule.objects.create(item=self.stock("SKU-B", 5), min_qty=5, max_qty=8)
+        # Defaults: 4 on hand plus 4 still open on an earlier PO is 8 < 10, ordered up to 50
+        self.stock("SKU-C", 4)
+        earlier = PurchaseOrder.objects.create(supplier=acme, po_number="PO-OLD", status='ORDERED')
+        PurchaseOrderLine.objects.create(po=earlier, sku="SKU-C", qty_ordered=6, qty_received=2)
+        self.stock("SKU-D", 30)
+
+        result = InventoryService.auto_replenish()["purchase_orders"]
+        self.assertEqual([(po["supplier"], po["po_number"], po["total_ordered"]) for po in result],
+                         [("Acme", "PO-00001", 16), ("Default", "PO-00002", 42)])
+        lines = PurchaseOrderLine.objects.filter(po_id__in=[po["id"] for po in result])
+        self.assertEqual(sorted(lines.values_list('po__supplier__name', 'sku', 'qty_ordered')),
+                         [("Acme", "SKU-A", 16), ("Default", "SKU-C", 42)])
+
+        # The new POs count as on order, so a second run finds nothing short
+        self.assertEqual(InventoryService.auto_replenish()["purchase_orders"], [])
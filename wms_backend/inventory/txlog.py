@@ -0,0 +1,178 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+
+from . import stats
+from .models import TransactionLog
+
+logger = logging.getLogger(__name__)
+
+FLUSH_ATTEMPTS = 5
+
+# Per-thread batch of log rows waiting for the current transaction to commit
+_local = threading.local()
+
+
+class _Batch:
+    def __init__(self):
+        self.entries = []
+
+    def flush(self):
+        entries, self.entries = self.entries, []
+        if not entries:
+            return
+
+        buffer = get_buffer()
+        if buffer is not None:
+            buffer.put_many(entries)
+            return
+
+        # Runs after COMMIT: raising here would make callers think the stock change failed
+        for attempt in range(FLUSH_ATTEMPTS):
+            try:
+                TransactionLog.objects.bulk_create(entries, batch_size=500)
+                return
+            except DatabaseError:
+                if attempt == FLUSH_ATTEMPTS - 1:
+                    logger.exception("Dropped %d TransactionLog rows after %d attempts", len(entries), FLUSH_ATTEMPTS)
+                    return
+                time.sleep(0.05 * (attempt + 1))
+
+
+def _current_batch(using=None):
+    """
+    Returns the batch bound to the open transaction, registering its on_commit flush on first use.
+    A rolled-back transaction drops its on_commit callback, which is how a stale batch is detected.
+    """
+    conn = transaction.get_connection(using)
+    batch = getattr(_local, 'batch', None)
+
+    if batch is None or not any(cb[1] == batch.flush for cb in conn.run_on_commit):
+        batch = _Batch()
+        _local.batch = batch
+        transaction.on_commit(batch.flush, using=using, robust=True)
+    return batch
+
+
+def record(using=None, **fields):
+    """Queues one TransactionLog row; it is written when the surrounding transaction commits."""
+    record_many([TransactionLog(**fields)], using=using)
+
+
+def record_many(entries, using=None):
+    """Queues unsaved TransactionLog instances for the surrounding transaction."""
+    if not entries:
+        return
+
+    stats.add(transactions=len(entries))
+
+    if not transaction.get_connection(using).in_atomic_block:
+        # Autocommit: nothing to wait for
+        batch = _Batch()
+        batch.entries.extend(entries)
+        batch.flush()
+        return
+
+    _current_batch(using).entries.extend(entries)
+
+
+class GroupCommitBuffer:
+    """
+    Bounded in-process buffer that group-commits log rows across requests.
+    A background thread flushes when flush_size rows are waiting or flush_interval seconds pass.
+    When the buffer is full the caller flushes inline instead of dropping rows.
+    """
+
+    def __init__(self, max_size=10000, flush_size=500, flush_interval=0.5):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_size)
+        self._failed = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='txlog-flusher', daemon=True)
+        self._thread.start()
+
+    def put_many(self, entries):
+        for entry in entries:
+            try:
+                self._queue.put_nowait(entry)
+            except queue.Full:
+                # Back-pressure: drain on the caller's thread, then retry
+                self.flush()
+                self._queue.put(entry)
+
+        if self._queue.qsize() >= self.flush_size:
+            self._wake.set()
+
+    def flush(self):
+        with self._lock:
+            while True:
+                # Rows from a failed insert go first so nothing is dropped on a transient DB error
+                entries, self._failed = self._failed, []
+                while len(entries) < self.flush_size:
+                    try:
+                        entries.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not entries:
+                    return
+                try:
+                    TransactionLog.objects.bulk_create(entries, batch_size=self.flush_size)
+                except Exception:
+                    self._failed = entries
+                    raise
+
+    def close(self):
+        """Stops the flusher and writes out everything still queued."""
+        self._stopped.set()
+        self._wake.set()
+        self._thread.join(timeout=5)
+        self.flush()
+
+    def _run(self):
+        try:
+            while not self._stopped.is_set():
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception("TransactionLog group commit failed")
+        finally:
+            connection.close()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Returns the shared group-commit buffer, or None when WMS_TXLOG_BUFFER is not enabled."""
+    global _buffer
+    config = getattr(settings, 'WMS_TXLOG_BUFFER', {})
+    if not config.get('ENABLED'):
+        return None
+
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = GroupCommitBuffer(
+                    max_size=config.get('MAX_SIZE', 10000),
+                    flush_size=config.get('FLUSH_SIZE', 500),
+                    flush_interval=config.get('FLUSH_INTERVAL', 0.5),
+                )
+                atexit.register(_buffer.close)
+    return _buffer
+
+
+def flush():
+    """Forces any group-commit backlog to the database (e.g. before reading history in tests or jobs)."""
+    if _buffer is not None:
+        _buffer.flush()
@@ -1,23 +1,37 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import (
     CycleCountViewSet, ItemViewSet, InventoryViewSet, RMAViewSet, TransactionLogViewSet, 
-    OrderViewSet, SupplierViewSet, PurchaseOrderViewSet, # <-- Import new views
-    dashboard_stats, current_user
+    OrderViewSet, SupplierViewSet, PurchaseOrderViewSet, ReplenishmentRuleViewSet, LocationViewSet, # <-- Import new views
+    dashboard_stats, current_user, contention_stats, catalog_stats, sync_changes, ingest_scans
 )
 
 router = DefaultRouter()
 router.register(r'items', ItemViewSet)
 router.register(r'inventory', InventoryViewSet)
+router.register(r'locations', LocationViewSet)
 router.register(r'history', TransactionLogViewSet)
 router.register(r'orders', OrderViewSet)
 router.register(r'suppliers', SupplierViewSet)       # <-- New
 router.register(r'purchase-orders', PurchaseOrderViewSet) # <-- New
+router.register(r'replenishment-rules', ReplenishmentRuleViewSet)
 router.register(r'rmas', RMAViewSet)
 router.register(r'cycle-counts', CycleCountViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
     path('dashboard/stats/', dashboard_stats),
-    path('me/', current_user)
+    path('metrics/contention/', contention_stats),
+    path('metrics/catalog/', catalog_stats),
+    path('me/', current_user),
+    path('sync/', sync_changes),
+    path('scans/', ingest_scans),
+
+    # Async read paths; serve through wms_backend.asgi so waiting requests don't hold a thread
+    path('async/inventory/', async_views.inventory_lookup),
+    path('async/orders/<int:pk>/status/', async_views.order_status),
+    path('async/putaway/suggest/', async_views.putaway_suggestion),
+    path('async/dashboard/stats/', async_views.dashboard_stats),
+    path('async/events/', async_views.event_stream),
 ]
\ No newline at end of file
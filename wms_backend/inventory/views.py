@@ -1,27 +1,97 @@
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.conf import settings
 from django.http import HttpResponse
+from django.db import transaction
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Sum, Count, F
+from django.db.models import Prefetch
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 
-from .serializers import CycleCountSessionSerializer, ItemSerializer, InventorySerializer, PurchaseOrderSerializer, RMASerializer, SupplierSerializer, TransactionLogSerializer, OrderSerializer
-from .models import RMA, CycleCountSession, Item, Inventory, PurchaseOrder, Supplier, TransactionLog, Order
+from .serializers import CycleCountSessionSerializer, ItemSerializer, InventorySerializer, LocationSerializer, PurchaseOrderSerializer, ReplenishmentRuleSerializer, RMASerializer, SupplierSerializer, TransactionLogSerializer, OrderSerializer
+from .models import RMA, RMALine, CycleCountSession, CycleCountTask, Item, Inventory, Location, PurchaseOrder, PurchaseOrderLine, ReplenishmentRule, Supplier, TransactionLog, Order, OrderLine
+from . import catalog, changefeed, labels, putaway, stats
 from .services import InventoryService
-
-class ItemViewSet(viewsets.ModelViewSet):
-    queryset = Item.objects.all()
+from .retry import metrics as contention_metrics
+from .filters import TransactionLogFilter
+from .pagination import KeysetPagination
+from .conditional import ConditionalGetMixin
+from .exports import (
+    CSVRenderer, NDJSONRenderer, ExportContentNegotiation, stream_export,
+    INVENTORY_COLUMNS, ORDER_LINE_COLUMNS, TRANSACTION_LOG_COLUMNS
+)
+
+def error_status(result):
+    # Conflicts that survived the service-side retries are 409 so clients can tell them from bad input
+    return 409 if "Race" in result['error'] else 400
+
+def int_ids(values):
+    # JSON clients send ids as numbers or numeric strings; every lookup downstream is keyed by int
+    return [int(value) for value in values]
+
+def label_response(request, rendered, filename, skipped=()):
+    # ?printer=<name> (or "printer" in the body) spools straight to a WMS_LABEL_PRINTERS entry;
+    # otherwise the ZPL job streams back as a download. `skipped` ids are reported either way.
+    printer = request.query_params.get('printer') or request.data.get('printer')
+    if not printer:
+        response = labels.stream_labels(rendered, filename)
+        if skipped:
+            response['X-Skipped-Ids'] = ','.join(str(i) for i in skipped)
+        return response
+    try:
+        host, port = labels.get_printer(printer)
+    except labels.PrinterError as e:
+        return Response({'error': str(e)}, status=400)
+    try:
+        count, sent = labels.spool(host, port, rendered)
+    except labels.PrinterError as e:
+        return Response({'error': str(e)}, status=502)
+    return Response({"success": True, "printer": printer, "labels": count, "bytes": sent, "skipped": list(skipped)})
+
+class ItemViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Item.objects.all().order_by('id')
     serializer_class = ItemSerializer
-
-class InventoryViewSet(viewsets.ModelViewSet):
+    etag_tables = ('item',)
+
+    def perform_destroy(self, instance):
+        # Deleting an item cascades to its bins; take them off the dashboard counters too
+        with transaction.atomic():
+            item_id = instance.id
+            bins = list(instance.inventory_set.values_list('location_code', 'quantity'))
+            instance.delete()
+            stats.add(*[stats.bin_delta(qty, 0, deleted=True) for _, qty in bins])
+            putaway.track([(item_id, code, 0) for code, _ in bins])
+
+class InventoryViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Inventory.objects.all().select_related('item').order_by('location_code')
     serializer_class = InventorySerializer
+    # Rows embed item sku/name/attributes
+    etag_tables = ('inventory', 'item')
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = ['item__sku', 'item__name', 'location_code']
     filterset_fields = ['location_code', 'item__sku']
 
+    # Direct edits bypass InventoryService, so keep the dashboard counters in step here
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            inv = serializer.save()
+            stats.add(stats.bin_delta(0, inv.quantity, created=True))
+            putaway.track([(inv.item_id, inv.location_code, inv.quantity)])
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            before = Inventory.objects.select_for_update().get(pk=serializer.instance.pk)
+            inv = serializer.save()
+            stats.add(stats.bin_delta(before.quantity, inv.quantity))
+            putaway.track([(before.item_id, before.location_code, 0), (inv.item_id, inv.location_code, inv.quantity)])
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            stats.add(stats.bin_delta(instance.quantity, 0, deleted=True))
+            putaway.track([(instance.item_id, instance.location_code, 0)])
+
     @action(detail=False, methods=['post'])
     def receive(self, request):
         sku = request.data.get('sku')
@@ -33,7 +103,19 @@ class InventoryViewSet(viewsets.ModelViewSet):
 
         result = InventoryService.receive_item(sku, location, qty)
         if "error" in result:
-            return Response(result, status=400)
+            return Response(result, status=error_status(result))
+        return Response(result, status=200)
+
+    @action(detail=False, methods=['post'], url_path='receive/batch')
+    def receive_batch(self, request):
+        # Whole ASN in one call: {"lines": [{"sku", "location", "quantity"}, ...]}
+        lines = request.data.get('lines', [])
+        if not isinstance(lines, list) or not lines:
+            return Response({'error': 'No ASN lines provided'}, status=400)
+
+        result = InventoryService.receive_batch(lines)
+        if "error" in result:
+            return Response(result, status=error_status(result))
         return Response(result, status=200)
 
     @action(detail=True, methods=['post'])
@@ -41,25 +123,30 @@ class InventoryViewSet(viewsets.ModelViewSet):
         qty = int(request.data.get('quantity', 1))
         result = InventoryService.pick_item(pk, qty)
         if "error" in result:
-            status_code = 409 if "Race" in result['error'] else 400
-            return Response(result, status=status_code)
+            return Response(result, status=error_status(result))
         return Response(result, status=200)
 
     @action(detail=True, methods=['get'])
     def zpl_label(self, request, pk=None):
         try:
             inv = self.get_object()
-            zpl_code = f"""
-            ^XA
-            ^FO50,50^ADN,36,20^FD{inv.item.name[:25]}^FS
-            ^FO50,100^ADN,18,10^FDSKU: {inv.item.sku}^FS
-            ^FO50,130^ADN,18,10^FDLOC: {inv.location_code}^FS
-            ^FO50,180^BY2,2,100^BCN,100,Y,N,N^FD{inv.item.sku}^FS
-            ^XZ
-            """
-            return HttpResponse(zpl_code.strip(), content_type="text/plain")
+            zpl_code = labels.render(labels.get_template('bin'),
+                                     labels.bin_context(inv.item.name, inv.item.sku, inv.location_code))
+            return HttpResponse(zpl_code, content_type="text/plain")
         except Exception as e:
             return Response({'error': str(e)}, status=500)
+
+    @action(detail=False, methods=['get'], url_path='labels')
+    def bin_labels(self, request):
+        # Bin labels for a location range: ?from=A-01&to=A-99, plus the usual search/filter params
+        queryset = self.filter_queryset(Inventory.objects.all())
+        start, end = request.query_params.get('from'), request.query_params.get('to')
+        if start:
+            queryset = queryset.filter(location_code__gte=start)
+        if end:
+            # "to=A-99" should include A-99-3, so compare against the longest code that starts with it
+            queryset = queryset.filter(location_code__lte=end + '\uffff')
+        return label_response(request, labels.render_all('bin', labels.bin_contexts(queryset)), 'bin-labels')
         
     @action(detail=False, methods=['get'])
     def suggest_location(self, request):
@@ -67,8 +154,22 @@ class InventoryViewSet(viewsets.ModelViewSet):
         if not sku:
             return Response({'error': 'SKU parameter required'}, status=400)
         
-        result = InventoryService.suggest_putaway_location(sku)
+        try:
+            qty = max(1, int(request.query_params.get('qty', 1)))
+        except ValueError:
+            return Response({'error': 'qty must be a number'}, status=400)
+
+        result = InventoryService.suggest_putaway_location(sku, qty)
         return Response(result)
+
+    @action(detail=False, methods=['post'], url_path='putaway/plan')
+    def putaway_plan(self, request):
+        # Whole ASN in one call: {"lines": [{"sku", "quantity"}, ...]}
+        lines = request.data.get('lines', [])
+        if not isinstance(lines, list) or not lines:
+            return Response({'error': 'No ASN lines provided'}, status=400)
+
+        return Response(InventoryService.plan_putaway(lines))
     
     @action(detail=False, methods=['post'])
     def move(self, request):
@@ -82,24 +183,59 @@ class InventoryViewSet(viewsets.ModelViewSet):
 
         result = InventoryService.move_item(sku, source_loc, dest_loc, qty)
         if "error" in result:
-            return Response(result, status=400)
+            return Response(result, status=error_status(result))
         return Response(result)
 
+    @action(detail=False, methods=['get'], renderer_classes=[NDJSONRenderer, CSVRenderer],
+            content_negotiation_class=ExportContentNegotiation)
+    def export(self, request):
+        # ?format=ndjson|csv, honours the same search/filter params as the list
+        queryset = self.filter_queryset(Inventory.objects.order_by('id'))
+        return stream_export(queryset, INVENTORY_COLUMNS, request.accepted_renderer.format, 'inventory')
+
 class TransactionLogViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = TransactionLog.objects.all().order_by('-timestamp')
+    queryset = TransactionLog.objects.all().order_by('-timestamp', '-id')
     serializer_class = TransactionLogSerializer
-
-class OrderViewSet(viewsets.ModelViewSet):
-    queryset = Order.objects.all().order_by('-created_at')
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = TransactionLogFilter
+
+    @action(detail=False, methods=['get'], renderer_classes=[NDJSONRenderer, CSVRenderer],
+            content_negotiation_class=ExportContentNegotiation)
+    def export(self, request):
+        queryset = self.filter_queryset(TransactionLog.objects.order_by('id'))
+        return stream_export(queryset, TRANSACTION_LOG_COLUMNS, request.accepted_renderer.format, 'history')
+
+class OrderViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    # OrderLineSerializer reads line.item.sku
+    queryset = Order.objects.all().prefetch_related(
+        Prefetch('lines', queryset=OrderLine.objects.select_related('item'))
+    ).order_by('-created_at')
     serializer_class = OrderSerializer
+    etag_tables = ('order', 'item')
 
     @action(detail=True, methods=['post'])
     def allocate(self, request, pk=None):
         result = InventoryService.allocate_order(pk)
         if "error" in result:
-            return Response(result, status=400)
+            return Response(result, status=error_status(result))
         return Response(result)
-    
+
+    @action(detail=False, methods=['post'])
+    def allocate_batch(self, request):
+        order_ids = request.data.get('order_ids', [])
+        if not isinstance(order_ids, list) or not order_ids:
+             return Response({'error': 'No order IDs provided'}, status=400)
+        try:
+            order_ids = int_ids(order_ids)
+        except (TypeError, ValueError):
+            return Response({'error': 'order_ids must be numbers'}, status=400)
+
+        result = InventoryService.allocate_orders(order_ids)
+        if "error" in result:
+            return Response(result, status=error_status(result))
+        return Response(result)
+
     @action(detail=True, methods=['post'])
     def pick_item(self, request, pk=None):
         sku = request.data.get('sku')
@@ -107,7 +243,7 @@ class OrderViewSet(viewsets.ModelViewSet):
         qty = int(request.data.get('qty', 1))
         result = InventoryService.pick_order_item(pk, sku, location, qty)
         if "error" in result:
-            return Response(result, status=400)
+            return Response(result, status=error_status(result))
         return Response(result)
 
     @action(detail=True, methods=['post'])
@@ -131,44 +267,42 @@ class OrderViewSet(viewsets.ModelViewSet):
             if order.status not in ['SHIPPED', 'PACKED']:
                  return Response({'error': 'Order must be PACKED or SHIPPED to generate label'}, status=400)
 
-            addr = order.customer_address or "No Address Provided"
-            city = order.customer_city or "Unknown City"
-            state = order.customer_state or "XX"
-            zip_code = order.customer_zip or "00000"
-
-            zpl_code = f"""
-            ^XA
-            ^FX Top section
-            ^CF0,60
-            ^FO50,50^GB100,100,100^FS
-            ^FO75,75^FR^GB100,100,100^FS
-            ^FO93,93^GB40,40,40^FS
-            ^FO220,50^FDIntershipping, Inc.^FS
-            ^CF0,30
-            ^FO220,115^FD1000 Shipping Lane^FS
-            ^FO220,155^FDShelbyville TN 38102^FS
-            ^FO220,195^FDUnited States (USA)^FS
-            ^FO50,250^GB700,3,3^FS
-
-            ^FX Recipient
-            ^CF0,30
-            ^FO50,300^FD{order.customer_name}^FS
-            ^FO50,340^FD{addr}^FS
-            ^FO50,380^FD{city}, {state} {zip_code}^FS
-            ^CFA,30
-            ^FO50,430^FDOrder #: {order.order_number}^FS
-            ^FO50,470^FDSKU Count: {order.lines.count()}^FS
-            ^FO50,530^GB700,3,3^FS
-
-            ^FX Barcode
-            ^BY5,2,270
-            ^FO100,580^BC^FD{order.order_number}^FS
-            ^XZ
-            """
-            return HttpResponse(zpl_code.strip(), content_type="text/plain")
+            # Lines are prefetched by the queryset; count() would be another query
+            zpl_code = labels.render(labels.get_template('shipping'),
+                                     labels.shipping_context(order, len(order.lines.all())))
+            return HttpResponse(zpl_code, content_type="text/plain")
         except Exception as e:
             return Response({'error': str(e)}, status=500)
         
+    @action(detail=False, methods=['post'], url_path='labels')
+    def shipping_labels(self, request):
+        # One ZPL job for a batch of PACKED/SHIPPED orders: {"order_ids": [...]}. Unknown or unpacked
+        # orders are skipped and listed in X-Skipped-Ids (or "skipped" when spooling)
+        order_ids = request.data.get('order_ids', [])
+        if not isinstance(order_ids, list) or not order_ids:
+             return Response({'error': 'No order IDs provided'}, status=400)
+        try:
+            contexts, skipped = labels.shipping_contexts(int_ids(order_ids))
+        except (TypeError, ValueError):
+            return Response({'error': 'order_ids must be numbers'}, status=400)
+        if not contexts:
+            return Response({'error': 'None of the orders exist and are PACKED or SHIPPED', 'skipped': skipped}, status=400)
+
+        rendered = labels.render_all('shipping', contexts)
+        return label_response(request, rendered, 'shipping-labels', skipped)
+
+    @action(detail=False, methods=['post'])
+    def wave_labels(self, request):
+        # Pick tickets for a wave, one per bin visit in walk order
+        order_ids = request.data.get('order_ids', [])
+        if not order_ids:
+             return Response({'error': 'No order IDs provided'}, status=400)
+
+        plan = InventoryService.generate_wave_plan(order_ids)
+        if "error" in plan:
+            return Response(plan, status=400)
+        return label_response(request, labels.render_all('pick', labels.pick_contexts(plan)), 'pick-tickets')
+
     @action(detail=False, methods=['post'])
     def wave_plan(self, request):
         order_ids = request.data.get('order_ids', [])
@@ -183,59 +317,90 @@ class OrderViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['post'])
     def wave_complete(self, request):
         order_ids = request.data.get('order_ids', [])
-        if not order_ids:
+        if not isinstance(order_ids, list) or not order_ids:
              return Response({'error': 'No order IDs provided'}, status=400)
+        try:
+            order_ids = int_ids(order_ids)
+        except (TypeError, ValueError):
+            return Response({'error': 'order_ids must be numbers'}, status=400)
+
+        result = InventoryService.complete_wave(order_ids, request.data.get('chunk_size'))
+        return Response(result)
+
+    @action(detail=False, methods=['get'], renderer_classes=[NDJSONRenderer, CSVRenderer],
+            content_negotiation_class=ExportContentNegotiation)
+    def export(self, request):
+        # One row per order line, with the order header repeated
+        queryset = OrderLine.objects.order_by('order_id', 'id')
+        status_filter = request.query_params.get('status')
+        if status_filter:
+            queryset = queryset.filter(order__status=status_filter)
+        return stream_export(queryset, ORDER_LINE_COLUMNS, request.accepted_renderer.format, 'orders')
 
-        result = InventoryService.complete_wave(order_ids)
+    @action(detail=False, methods=['post'])
+    def wave_pick(self, request):
+        # Scanner confirmations for a wave: {"picks": [{"order_id", "sku", "location", "qty"}, ...]}
+        picks = request.data.get('picks', [])
+        if not isinstance(picks, list) or not picks:
+             return Response({'error': 'No picks provided'}, status=400)
+        try:
+            picks = [{**pick, "order_id": int(pick.get("order_id"))} for pick in picks]
+        except (AttributeError, TypeError, ValueError):
+            return Response({'error': 'Every pick needs a numeric order_id'}, status=400)
+
+        result = InventoryService.execute_wave_picks(picks, request.data.get('chunk_size'))
         return Response(result)
 
 class SupplierViewSet(viewsets.ModelViewSet):
-    queryset = Supplier.objects.all()
+    queryset = Supplier.objects.all().order_by('id')
     serializer_class = SupplierSerializer
 
+class ReplenishmentRuleViewSet(viewsets.ModelViewSet):
+    queryset = ReplenishmentRule.objects.all().select_related('item', 'supplier').order_by('id')
+    serializer_class = ReplenishmentRuleSerializer
+
+class LocationViewSet(viewsets.ModelViewSet):
+    queryset = Location.objects.all().order_by('code')
+    serializer_class = LocationSerializer
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['zone']
+
+    # Capacity and zones feed the putaway index; reload it once the change is committed
+    def perform_create(self, serializer):
+        serializer.save()
+        transaction.on_commit(putaway.index.invalidate)
+
+    def perform_update(self, serializer):
+        serializer.save()
+        transaction.on_commit(putaway.index.invalidate)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        transaction.on_commit(putaway.index.invalidate)
+
 class PurchaseOrderViewSet(viewsets.ModelViewSet):
-    queryset = PurchaseOrder.objects.all().order_by('-created_at')
+    queryset = PurchaseOrder.objects.all().select_related('supplier').prefetch_related(
+        Prefetch('lines', queryset=PurchaseOrderLine.objects.order_by('id'))
+    ).order_by('-created_at')
     serializer_class = PurchaseOrderSerializer
 
     @action(detail=False, methods=['post'])
     def auto_replenish(self, request):
         """
-        Finds items with < 10 quantity and creates a Draft PO.
-        NOW USES SEQUENTIAL SERIAL NUMBERS (e.g. PO-00001).
+        Raises draft POs for SKUs below their min stock, one PO per supplier.
+        PO numbers come from the purchase_order sequence (e.g. PO-00001).
         """
-        low_stock_items = Inventory.objects.filter(quantity__lt=10)
-        if not low_stock_items.exists():
+        result = InventoryService.auto_replenish()
+        pos = result["purchase_orders"]
+        if not pos:
             return Response({"message": "No low stock items found."}, status=200)
 
-        supplier, _ = Supplier.objects.get_or_create(
-            name="Global Supplies Inc.", 
-            defaults={"contact_email": "orders@globalsupplies.com"}
-        )
-
-        lines = []
-        for inv in low_stock_items:
-            # Simple logic: Order enough to get to 50
-            qty_needed = 50 - inv.quantity
-            lines.append({"sku": inv.item.sku, "qty": qty_needed, "received": 0})
-
-        # --- FIXED: SEQUENTIAL PO GENERATION ---
-        # Get the count of existing POs to determine the next number
-        next_id = PurchaseOrder.objects.count() + 1
-        po_number = f"PO-{next_id:05d}" # e.g. PO-00001
-
-        # Loop to handle potential collisions with deleted records or existing random ones
-        while PurchaseOrder.objects.filter(po_number=po_number).exists():
-            next_id += 1
-            po_number = f"PO-{next_id:05d}"
-
-        po = PurchaseOrder.objects.create(
-            supplier=supplier,
-            po_number=po_number,
-            status='DRAFT',
-            lines=lines
-        )
-
-        return Response({"message": f"Created PO {po.po_number}", "po_id": po.id})
+        numbers = ", ".join(po["po_number"] for po in pos)
+        return Response({
+            "message": f"Created PO {numbers}" if len(pos) == 1 else f"Created {len(pos)} POs: {numbers}",
+            "po_id": pos[0]["id"],
+            "purchase_orders": pos
+        })
 
     @action(detail=True, methods=['post'])
     def receive_item(self, request, pk=None):
@@ -245,11 +410,13 @@ class PurchaseOrderViewSet(viewsets.ModelViewSet):
         
         result = InventoryService.receive_po_item(pk, sku, location, qty)
         if "error" in result:
-            return Response(result, status=400)
+            return Response(result, status=error_status(result))
         return Response(result)
 
 class RMAViewSet(viewsets.ModelViewSet):
-    queryset = RMA.objects.all().order_by('-created_at')
+    queryset = RMA.objects.all().select_related('order').prefetch_related(
+        Prefetch('lines', queryset=RMALine.objects.select_related('item'))
+    ).order_by('-created_at')
     serializer_class = RMASerializer
 
     @action(detail=True, methods=['post'])
@@ -258,18 +425,21 @@ class RMAViewSet(viewsets.ModelViewSet):
         location = request.data.get('location', 'RETURNS-DOCK')
         result = InventoryService.process_return_receipt(pk, location)
         if "error" in result:
-            return Response(result, status=400)
+            return Response(result, status=error_status(result))
         return Response(result)
 
 class CycleCountViewSet(viewsets.ModelViewSet):
-    queryset = CycleCountSession.objects.all().order_by('-created_at')
+    queryset = CycleCountSession.objects.all().prefetch_related(
+        Prefetch('tasks', queryset=CycleCountTask.objects.select_related('inventory__item'))
+    ).order_by('-created_at')
     serializer_class = CycleCountSessionSerializer
 
     @action(detail=False, methods=['post'])
     def generate(self, request):
         limit = int(request.data.get('limit', 5))
         aisle = request.data.get('aisle', None)
-        result = InventoryService.create_cycle_count(aisle, limit)
+        stratify = str(request.data.get('stratify', 'true')).lower() not in ('false', '0')
+        result = InventoryService.create_cycle_count(aisle, limit, stratify)
         if "error" in result:
             return Response(result, status=400)
         return Response(result)
@@ -282,7 +452,19 @@ class CycleCountViewSet(viewsets.ModelViewSet):
         
         result = InventoryService.submit_count(task_id, qty)
         if "error" in result:
-            return Response(result, status=400)
+            return Response(result, status=error_status(result))
+        return Response(result)
+
+    @action(detail=True, methods=['post'], url_path='submit/batch')
+    def submit_batch(self, request, pk=None):
+        # Whole scanner upload for this session: {"counts": [{"task_id", "qty"}, ...]}
+        counts = request.data.get('counts', [])
+        if not isinstance(counts, list) or not counts:
+            return Response({'error': 'No counts provided'}, status=400)
+
+        result = InventoryService.submit_counts(pk, counts)
+        if "error" in result:
+            return Response(result, status=error_status(result))
         return Response(result)
 
 
@@ -303,14 +485,73 @@ def current_user(request):
 
 @api_view(['GET'])
 def dashboard_stats(request):
-    total_stock = Inventory.objects.aggregate(sum=Sum('quantity'))['sum'] or 0
-    total_locations = Inventory.objects.count()
-    low_stock = Inventory.objects.filter(quantity__lt=10).count()
-    recent_moves = TransactionLog.objects.count()
+    # Served from the incrementally maintained counters; no scan of Inventory or TransactionLog
+    counters = stats.read()
 
     return Response({
-        "total_stock": total_stock,
-        "total_locations": total_locations,
-        "low_stock": low_stock,
-        "recent_moves": recent_moves
-    })
\ No newline at end of file
+        "total_stock": counters['total_stock'],
+        "total_locations": counters['total_locations'],
+        "low_stock": counters['low_stock'],
+        "recent_moves": counters['transactions']
+    })
+
+@api_view(['GET', 'DELETE'])
+def contention_stats(request):
+    """
+    Per-method conflict/retry/give-up counters and the hottest rows for this worker process.
+    DELETE resets them.
+    """
+    if request.method == 'DELETE':
+        contention_metrics.reset()
+    return Response(contention_metrics.snapshot())
+
+@api_view(['GET', 'DELETE'])
+def catalog_stats(request):
+    """
+    Item catalog cache size and hit/miss counters for this worker process.
+    DELETE resets the counters.
+    """
+    if request.method == 'DELETE':
+        catalog.items.reset_stats()
+    return Response(catalog.items.snapshot())
+
+@api_view(['GET'])
+def sync_changes(request):
+    """
+    Delta sync for handhelds. ?cursor=<from the previous response> returns
+    {"cursor", "more", "reset": false, "changed": {table: [rows]}, "deleted": {table: [ids]}} for the
+    tables in changefeed.TABLES; keep calling with the new cursor while "more" is true.
+    Without a cursor, or with one the feed no longer covers, the answer is {"reset": true, "cursor": n}:
+    download the full lists, then sync from n.
+    """
+    try:
+        cursor = request.query_params.get('cursor')
+        cursor = int(cursor) if cursor else None
+        limit = int(request.query_params.get('limit', 0))
+    except ValueError:
+        return Response({'error': 'cursor and limit must be numbers'}, status=400)
+
+    page_size = changefeed.get_config()['PAGE_SIZE']
+    result = None
+    if cursor is not None:
+        result = changefeed.changes_since(cursor, min(limit, page_size) if limit > 0 else page_size)
+    if result is None:
+        return Response({"reset": True, "cursor": changefeed.head()})
+    return Response({"reset": False, **result})
+
+@api_view(['POST'])
+def ingest_scans(request):
+    """
+    Offline scan upload from a handheld: {"device_id", "scans": [{"key", "type", ...}, ...]}, in the
+    order they were scanned. Safe to resend: keys already ingested are not applied again.
+    See InventoryService.ingest_scans for the scan shapes.
+    """
+    scans = request.data.get('scans', [])
+    if not isinstance(scans, list) or not scans:
+        return Response({'error': 'No scans provided'}, status=400)
+    max_scans = getattr(settings, 'WMS_SCAN_INGEST', {}).get('MAX_SCANS', 5000)
+    if len(scans) > max_scans:
+        return Response({'error': f'At most {max_scans} scans per upload'}, status=400)
+
+    device_id = request.data.get('device_id')
+    return Response(InventoryService.ingest_scans(scans, str(device_id)[:50] if device_id else None))
@@ -2,8 +2,11 @@
 Django settings for wms_backend project.
 """
 
+import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -72,6 +75,29 @@ DATABASES = {
     }
 }
 
+# Local PostgreSQL (e.g. for `manage.py benchmark_services`): export WMS_POSTGRES_DB=<name>
+if os.environ.get('WMS_POSTGRES_DB'):
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ['WMS_POSTGRES_DB'],
+        'USER': os.environ.get('WMS_POSTGRES_USER', 'postgres'),
+        'PASSWORD': os.environ.get('WMS_POSTGRES_PASSWORD', ''),
+        'HOST': os.environ.get('WMS_POSTGRES_HOST', 'localhost'),
+        'PORT': os.environ.get('WMS_POSTGRES_PORT', '5432'),
+    }
+
+# Holds the catalog and API change generations and cached responses, which every worker must see.
+# Without WMS_REDIS_URL each process gets its own LocMem cache and conditional GET stays off
+# (see WMS_CONDITIONAL_GET['ALLOW_PROCESS_LOCAL'] and the inventory.W00x checks).
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+if os.environ.get('WMS_REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['WMS_REDIS_URL'],
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -96,10 +122,103 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CORS_ALLOW_ALL_ORIGINS = True 
+# Conditional GETs: the frontend sends If-None-Match and needs to read ETag
+CORS_ALLOW_HEADERS = (*default_headers, 'if-none-match')
+CORS_EXPOSE_HEADERS = ['ETag', 'X-Skipped-Ids']
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
-}
\ No newline at end of file
+    'DEFAULT_PAGINATION_CLASS': 'inventory.pagination.StandardPagination',
+}
+
+# --- WMS TUNING ---
+WMS_WAVE_PICK_CHUNK_SIZE = 200  # Pick confirmations applied per transaction when completing a wave
+
+# TransactionLog rows are flushed once per transaction on commit. Enabling the buffer additionally
+# group-commits them across requests from a background thread (flushed on normal shutdown).
+WMS_TXLOG_BUFFER = {
+    'ENABLED': False,
+    'MAX_SIZE': 10000,       # Rows held in memory before callers flush inline
+    'FLUSH_SIZE': 500,       # Rows per bulk insert
+    'FLUSH_INTERVAL': 0.5,   # Seconds between background flushes
+}
+WMS_EXPORT_CHUNK_SIZE = 2000  # Rows fetched per round trip by the streaming export endpoints
+WMS_STATS_SHARDS = 8  # Rows per dashboard counter; run rebuild_dashboard_stats after changing
+WMS_RETRY = {
+    'MAX_ATTEMPTS': 5,    # Tries per service call on version conflicts, deadlocks and "database is locked"
+    'BASE_DELAY': 0.01,   # Seconds; backoff doubles per attempt with full jitter
+    'MAX_DELAY': 0.2,
+}
+WMS_REPLENISHMENT = {
+    'DEFAULT_MIN': 10,   # Reorder point for SKUs without a ReplenishmentRule
+    'DEFAULT_MAX': 50,   # Order-up-to level for SKUs without a ReplenishmentRule
+    'DEFAULT_SUPPLIER': "Global Supplies Inc.",
+    'DEFAULT_SUPPLIER_EMAIL': "orders@globalsupplies.com",
+}
+WMS_CYCLE_COUNT = {
+    'ACTIVITY_DAYS': 90,                                # Pick history used for ABC ranking (manage.py classify_abc, run nightly)
+    'ABC_SPLIT': (0.8, 0.95),                           # Cumulative share of picks ending class A, then B
+    'FREQUENCY_DAYS': {'A': 30, 'B': 90, 'C': 180},     # Every bin is due again after this many days
+    'SAMPLE_WEIGHTS': {'A': 0.6, 'B': 0.3, 'C': 0.1},   # How spare count capacity is spread once nothing is due
+}
+WMS_PUTAWAY = {
+    'DEFAULT_CAPACITY': 100,  # Units per bin for location codes without a Location row
+    'REFRESH_SECONDS': 300,   # Free-slot index reload interval; also picks up other processes' writes
+}
+WMS_PICK_LAYOUT = {
+    'PATTERN': r'^(?P<aisle>[A-Z]{1,2})-(?P<bay>\d+)(?:-(?P<level>\d+))?$',  # e.g. A-01-2
+    'AISLE_PITCH': 3.0,     # Metres between aisle centre lines
+    'BAY_WIDTH': 1.0,       # Metres per bay
+    'BAYS_PER_AISLE': 40,   # Cross aisles at the front and back of every aisle
+    'LEVEL_COST': 0.5,      # Metre-equivalent per level between stops
+    'DEPOT': 'A-00',        # Pick walks start and end here
+    'TIME_BUDGET_MS': 50,   # Upper bound on route improvement per wave
+}
+
+# Network label printers for batch jobs: name -> (host, raw TCP port)
+WMS_LABEL_PRINTERS = {
+    # 'dock-1': ('10.0.0.51', 9100),
+}
+WMS_LABEL_PRINTER_TIMEOUT = 10  # Seconds per connect/send
+# Replace a built-in ZPL template ('bin', 'shipping', 'pick') with {field} placeholders
+WMS_LABEL_TEMPLATES = {}
+WMS_ITEM_CATALOG = {
+    'MAX_ENTRIES': 20000,     # SKUs kept per worker process (LRU)
+    'CHECK_SECONDS': 1.0,     # How often a worker checks the shared generation for other processes' edits
+    'CACHE_ALIAS': 'default', # Must be a shared backend (Redis/Memcached) for cross-process invalidation
+}
+# ETags on the inventory/items/orders read endpoints, validated against per-table change generations
+WMS_CONDITIONAL_GET = {
+    'CACHE_ALIAS': 'default',                # Holds the generations and rendered responses; share it across workers
+    'RESPONSE_TIMEOUT': 300,                 # Seconds a rendered list/detail response is kept
+    'MAX_RESPONSE_BYTES': 2 * 1024 * 1024,   # Bigger responses are served but not stored
+    'ALLOW_PROCESS_LOCAL': False,            # Keep ETags on with a LocMem cache; only correct with a single worker process
+}
+# Async read endpoints under /api/async/ (run under ASGI)
+WMS_ASYNC_API = {
+    'LOOKUP_LIMIT': 200,          # Bins returned per inventory lookup
+    'LONG_POLL_MAX_SECONDS': 30,  # Longest a dashboard long-poll is held open
+    'LONG_POLL_INTERVAL': 1.0,    # Seconds between change checks while holding
+}
+# Change events streamed at /api/async/events/ (server-sent events, ASGI only)
+WMS_EVENTS = {
+    'BROKER': 'inventory.events.InProcessBroker',  # Swap for a shared broker when running several ASGI workers
+    'HISTORY': 1000,          # Recent events kept for Last-Event-ID resume
+    'QUEUE_SIZE': 1000,       # Undelivered events per client before it is told it lagged
+    'HEARTBEAT_SECONDS': 15,  # Keepalive comment interval on idle streams
+}
+# Delta sync for handhelds at /api/sync/ (see inventory/changefeed.py)
+WMS_SYNC = {
+    'PAGE_SIZE': 5000,      # Feed entries read per sync request
+    'SETTLE_SECONDS': 10,   # Cursors stay behind entries this young; keep above the longest write transaction
+    'RETENTION_DAYS': 14,   # prune_sync_changes drops older entries; devices offline longer resync fully
+}
+# Offline scan uploads at /api/scans/ (see InventoryService.ingest_scans)
+WMS_SCAN_INGEST = {
+    'MAX_SCANS': 5000,          # Scans accepted per upload
+    'CHUNK_SIZE': 200,          # Scans applied per transaction
+    'KEY_RETENTION_DAYS': 30,   # prune_scan_keys forgets older idempotency keys; keep above the longest device outage
+}
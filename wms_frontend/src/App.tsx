@@ -10,6 +10,18 @@ import {
 // --- API CONFIG ---
 const API_URL = 'http://127.0.0.1:8000/api';
 
+// List endpoints are paginated; follow `next` so screens see every row, not just the first page
+const fetchAllPages = async (path: string) => {
+  const rows: any[] = [];
+  let url: string | null = `${API_URL}${path}?page_size=1000`;
+  while (url) {
+    const page: any = await fetch(url).then(r=>r.json());
+    rows.push(...page.results);
+    url = page.next;
+  }
+  return rows;
+};
+
 // --- TYPES ---
 interface InventoryItem { id: number; item_sku: string; item_name: string; location_code: string; quantity: number; available_quantity: number; reserved_quantity: number; }
 interface ItemMaster { id: number; sku: string; name: string; }
@@ -553,19 +565,20 @@ export default function App() {
   const fetchAll = async () => {
     try {
       const [inv, ord, rm, hist, stat, cnt, po, itm] = await Promise.all([
-        fetch(`${API_URL}/inventory/`).then(r=>r.json()),
-        fetch(`${API_URL}/orders/`).then(r=>r.json()),
-        fetch(`${API_URL}/rmas/`).then(r=>r.json()),
+        fetchAllPages('/inventory/'),
+        fetchAllPages('/orders/'),
+        fetchAllPages('/rmas/'),
+        // The log is unbounded; the history view shows the newest page
         fetch(`${API_URL}/history/`).then(r=>r.json()),
         fetch(`${API_URL}/dashboard/stats/`).then(r=>r.json()),
-        fetch(`${API_URL}/cycle-counts/`).then(r=>r.json()),
-        fetch(`${API_URL}/purchase-orders/`).then(r=>r.json()),
-        fetch(`${API_URL}/items/`).then(r=>r.json()),
+        fetchAllPages('/cycle-counts/'),
+        fetchAllPages('/purchase-orders/'),
+        fetchAllPages('/items/'),
       ]);
       setInventory(inv);
       setOrders(ord);
       setRmas(rm);
-      setHistory(hist);
+      setHistory(hist.results);
       setStats(stat);
       setCounts(cnt);
       setPos(po);
@@ -660,7 +673,7 @@ export default function App() {
           method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({ task_id: taskId, qty })
       });
       if(res.ok) {
-          const updatedCounts = await fetch(`${API_URL}/cycle-counts/`).then(r=>r.json());
+          const updatedCounts = await fetchAllPages('/cycle-counts/');
           setCounts(updatedCounts);
           const current = updatedCounts.find((c:any) => c.id === activeCount?.id);
           setActiveCount(current);
@@ -673,7 +686,7 @@ export default function App() {
           method: 'POST', headers: {'Content-Type': 'application/json'}, body: JSON.stringify({ sku: item.sku, location: loc, qty: qty })
       });
       if(res.ok) {
-          const updatedPos = await fetch(`${API_URL}/purchase-orders/`).then(r=>r.json());
+          const updatedPos = await fetchAllPages('/purchase-orders/');
           setPos(updatedPos);
           const current = updatedPos.find((p:any) => p.id === activePO.id);
           setActivePO(current);